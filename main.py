@@ -1,29 +1,52 @@
 import os
-from scripts import normal_run, do_run, moea_run
+from scripts import normal_run, do_run, moea_run, pipeline
+from scripts.pipeline import Stage, model_inputs
 
-def main():
+def main(force=False):
     # Prepare the results directory
-    # You might want to delete the results files between runs?
+    # Stages whose inputs have not changed since the last run are skipped; use force=True
+    # to run everything again
     if not os.path.exists("working_directory/results"):
         os.mkdir("working_directory/results")
 
-    # Do a normal run, producing the run.csv file in the results directory
-    print("Running normal model...")
-    normal_run.run("working_directory/inputs/run.json",
-                   "working_directory/results/run.csv")
+    stages = [
+        # Do a normal run, producing the run.csv file in the results directory
+        Stage("normal",
+              normal_run.run,
+              dict(json_path="working_directory/inputs/run.json",
+                   csv_path="working_directory/results/run.csv",
+                   stats_csv_path="working_directory/results/run_stats.csv"),
+              inputs=model_inputs("working_directory/inputs/run.json"),
+              outputs=["working_directory/results/run.csv",
+                       "working_directory/results/run_stats.csv"]),
+        # Run the "DO" PyWr model, generating the DO_run.csv output file
+        Stage("DO",
+              do_run.run,
+              dict(json_path="working_directory/inputs/run_DO.json",
+                   csv_path="working_directory/results/DO_run.csv",
+                   output_csv_path="working_directory/results/DO_outputs.csv",
+                   stats_csv_path="working_directory/results/DO_stats.csv"),
+              inputs=model_inputs("working_directory/inputs/run_DO.json"),
+              outputs=["working_directory/results/DO_run.csv",
+                       "working_directory/results/DO_outputs.csv",
+                       "working_directory/results/DO_stats.csv"]),
+        # Run the "MOEA" PyWr model, generating the archive.db database file
+        # This can take a few minutes and 100% CPU, so it runs after the others
+        Stage("MOEA",
+              moea_run.run,
+              dict(json_path="working_directory/inputs/run_MOEA.json",
+                   db_path="working_directory/results/archive.db",
+                   iterations=1),
+              inputs=model_inputs("working_directory/inputs/run_MOEA.json"),
+              outputs=["working_directory/results/archive.db"],
+              depends=["normal", "DO"]),
+    ]
 
-    # Run the "DO" PyWr model, generating the DO_run.csv output file
-    print("Running DO model...")
-    do_run.run("working_directory/inputs/run_DO.json",
-                   "working_directory/results/DO_run.csv",
-                   "working_directory/results/DO_outputs.csv")
-
-    # Run the "MOEA" PyWr model, generating the archive.db database file
-    print("Running MOEA model...")
-    print("This can take a few minutes and 100% CPU!")
-    moea_run.run("working_directory/inputs/run_MOEA.json",
-                 "working_directory/results/archive.db",
-                 iterations=1)
+    report = pipeline.run(stages, "working_directory/results/pipeline_cache.json", force=force)
+    report.to_csv("working_directory/results/pipeline.csv")
+    print(report)
+    if (report["status"] == "failed").any():
+        raise RuntimeError("Some stages of the pipeline failed.")
 
     print("The end!")
 
@@ -12,11 +12,20 @@ from pywr_model.lobwood_abstraction_licence import GrimwithReleaseMax, LobwoodAb
 from pywr.parameters import ConstantParameter
 from pywr_model.lobwood_abstraction_licence import LobwoodRiverIntake
 from pywr_model.level_of_service import ForecastCrossingIndexParameter, StickyIndexParameter, EventCountIndexParameterRecorder
+from pywr_model.compact_recorders import CompactNumpyArrayIndexParameterRecorder
 from .flood_profile import patch_nidd_flood_curve
+import functools
 import json
 
 
-def patch_model(model):
+def patch_model(model, index_dtype=None):
+    # index_dtype: store the TUBs/NEUBs recorders compactly, e.g. "int8" or "bits"
+    # (see pywr_model.compact_recorders); by default they are pywr's int32 recorders
+    if index_dtype is None:
+        index_recorder = NumpyArrayIndexParameterRecorder
+    else:
+        index_recorder = functools.partial(CompactNumpyArrayIndexParameterRecorder, dtype=index_dtype)
+
     # ======Load nodes for custom parameters===========
     # river node (where the river gauge for lobwood is)
     river_node = model.nodes["Addingham"]
@@ -75,11 +84,11 @@ def patch_model(model):
     ### Create level of service parameters ###
     tubs_forecast_param = ForecastCrossingIndexParameter(model, model.nodes["Group Storage"],
                                                          model.parameters["Group line7"],
-                                                         rolling_window=4 * 7, forecast_window=6 * 7,
+                                                         rolling_days=4 * 7, forecast_window=6 * 7,
                                                          name="Group TUBs forecast")
     tubs_param = StickyIndexParameter(model, tubs_forecast_param, minimum_days=12 * 7, name="Group TUBs active")
-    NumpyArrayIndexParameterRecorder(model, tubs_forecast_param, name="Group TUBs forecast recorder")
-    NumpyArrayIndexParameterRecorder(model, tubs_param, name="Group TUBs active recorder")
+    index_recorder(model, tubs_forecast_param, name="Group TUBs forecast recorder")
+    index_recorder(model, tubs_param, name="Group TUBs active recorder")
 
     tubs_count = EventCountIndexParameterRecorder(model, tubs_param, threshold=1, name="Group TUBs Annual Count",
                                                    constraint_upper_bounds=95 // 25)
@@ -89,8 +98,8 @@ def patch_model(model):
                                                       name="Group NEUBs crossed")
     neubs_param = StickyIndexParameter(model, neubs_crossing_param, minimum_days=12 * 7, name="Group NEUBs active")
 
-    NumpyArrayIndexParameterRecorder(model, neubs_crossing_param, name="Group NEUBs crossing recorder")
-    NumpyArrayIndexParameterRecorder(model, neubs_param, name="Group NEUBs active recorder")
+    index_recorder(model, neubs_crossing_param, name="Group NEUBs crossing recorder")
+    index_recorder(model, neubs_param, name="Group NEUBs active recorder")
 
     neubs_count = EventCountIndexParameterRecorder(model, neubs_param, threshold=1, name="Group NEUBs Annual Count",
                                                     constraint_upper_bounds=95 // 80)
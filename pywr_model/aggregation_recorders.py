@@ -0,0 +1,209 @@
+import json
+import os
+import numpy as np
+import pandas
+from pywr.recorders import NodeRecorder, StorageRecorder, ParameterRecorder
+
+STATISTICS = ('mean', 'min', 'max', 'sum')
+
+
+class PeriodStatisticsRecorderMixin:
+    """Keep running statistics per period (e.g. month or year) instead of the daily series.
+
+    Each time-step updates the sum, minimum and maximum of its period (the period its
+    start falls in), so memory and output scale with the number of periods rather than
+    time-steps. `period` is a pandas period frequency, e.g. "M" (monthly) or "Y"
+    (annual), and `stats` the statistics written by `to_dataframe`: the "mean" and "sum"
+    are weighted by the length of each time-step in days, so they are a mean daily value
+    and a total over the period.
+
+    `values` aggregates over the whole run with `temporal_agg_func`, which must be one of
+    `STATISTICS`; the result is the same as pywr's numpy array recorders for daily models.
+    Sub-classes define `current_values` to return the values of the current time-step.
+    """
+    _state_attributes = ('_sum', '_min', '_max', '_days')
+
+    def __init__(self, *args, **kwargs):
+        self.period = kwargs.pop('period', 'M')
+        self.stats = list(kwargs.pop('stats', STATISTICS))
+        self.temporal_agg_func = kwargs.pop('temporal_agg_func', 'mean')
+        super().__init__(*args, **kwargs)
+        for stat in self.stats + [self.temporal_agg_func]:
+            if stat not in STATISTICS:
+                raise ValueError(f'Statistic "{stat}" is not one of {STATISTICS}.')
+        self._periods = None
+        self._period_index = None
+        self._sum = None
+        self._min = None
+        self._max = None
+        self._days = None
+
+    def _period_codes(self):
+        index = self.model.timestepper.datetime_index.asfreq(self.period, how='start')
+        codes, periods = pandas.factorize(index)
+        return codes, periods
+
+    def memory_estimate(self, nts, ncomb):
+        """Return the shape, dtype and bytes of the running statistics."""
+        nperiods = len(self._period_codes()[1])
+        return (nperiods, 3 * ncomb + 1), 'float64', nperiods * (3 * ncomb + 1) * 8
+
+    def setup(self):
+        ncomb = len(self.model.scenarios.combinations)
+        self._period_index, self._periods = self._period_codes()
+        nperiods = len(self._periods)
+        self._sum = np.zeros((nperiods, ncomb))
+        self._min = np.zeros((nperiods, ncomb))
+        self._max = np.zeros((nperiods, ncomb))
+        self._days = np.zeros(nperiods)
+
+    def reset(self):
+        self._sum[...] = 0.0
+        self._min[...] = np.inf
+        self._max[...] = -np.inf
+        self._days[...] = 0.0
+
+    def after(self):
+        ts = self.model.timestepper.current
+        i = self._period_index[ts.index]
+        values = np.asarray(self.current_values(), dtype=np.float64)
+        self._sum[i, :] += values * ts.days
+        self._days[i] += ts.days
+        np.minimum(self._min[i, :], values, out=self._min[i, :])
+        np.maximum(self._max[i, :], values, out=self._max[i, :])
+
+    def period_values(self, stat):
+        """Return a `(nperiods, ncomb)` array of `stat` for each period simulated so far."""
+        n = np.count_nonzero(self._days)
+        if stat == 'mean':
+            return self._sum[:n] / self._days[:n, np.newaxis]
+        return {'sum': self._sum, 'min': self._min, 'max': self._max}[stat][:n]
+
+    def values(self):
+        """Compute a value for each scenario over the whole run using `temporal_agg_func`."""
+        if self.temporal_agg_func == 'mean':
+            return self._sum.sum(axis=0) / self._days.sum()
+        if self.temporal_agg_func == 'sum':
+            return self._sum.sum(axis=0)
+        if self.temporal_agg_func == 'min':
+            return self.period_values('min').min(axis=0)
+        return self.period_values('max').max(axis=0)
+
+    def to_dataframe(self):
+        """Return a DataFrame of the `stats` per period; the columns are (statistic, scenario)."""
+        sc_index = self.model.scenarios.multiindex
+        n = np.count_nonzero(self._days)
+        dfs = {stat: pandas.DataFrame(self.period_values(stat), index=self._periods[:n], columns=sc_index)
+               for stat in self.stats}
+        return pandas.concat(dfs, axis=1, names=['Statistic'])
+
+
+class PeriodStatisticsNodeRecorder(PeriodStatisticsRecorderMixin, NodeRecorder):
+    """Running statistics per period of the flow of a node."""
+    def __init__(self, *args, **kwargs):
+        self.factor = kwargs.pop('factor', 1.0)
+        super().__init__(*args, **kwargs)
+
+    def current_values(self):
+        return np.asarray(self.node.flow) * self.factor
+
+
+PeriodStatisticsNodeRecorder.register()
+
+
+class PeriodStatisticsStorageRecorder(PeriodStatisticsRecorderMixin, StorageRecorder):
+    """Running statistics per period of the volume (or proportional volume) of a storage node."""
+    def __init__(self, *args, **kwargs):
+        self.proportional = kwargs.pop('proportional', False)
+        super().__init__(*args, **kwargs)
+
+    def current_values(self):
+        return self.node.current_pc if self.proportional else self.node.volume
+
+
+PeriodStatisticsStorageRecorder.register()
+
+
+class PeriodStatisticsParameterRecorder(PeriodStatisticsRecorderMixin, ParameterRecorder):
+    """Running statistics per period of the value of a parameter."""
+    def current_values(self):
+        return self.parameter.get_all_values()
+
+
+PeriodStatisticsParameterRecorder.register()
+
+
+# The period statistics replacement for each daily recorder type
+AGGREGATION_RECORDER_TYPES = {
+    'numpyarraynoderecorder': 'PeriodStatisticsNodeRecorder',
+    'numpyarraystoragerecorder': 'PeriodStatisticsStorageRecorder',
+    'numpyarrayparameterrecorder': 'PeriodStatisticsParameterRecorder',
+    'compactnumpyarraynoderecorder': 'PeriodStatisticsNodeRecorder',
+    'compactnumpyarraystoragerecorder': 'PeriodStatisticsStorageRecorder',
+    'compactnumpyarrayparameterrecorder': 'PeriodStatisticsParameterRecorder',
+}
+
+
+def patch_json_data_aggregate(data, period='M', stats=STATISTICS):
+    """Replace the daily node, storage and parameter recorders in `data` with period statistics."""
+    for recorder in data.get("recorders", {}).values():
+        kind = recorder.get("type", "").lower()
+        if not kind.endswith("recorder"):
+            kind += "recorder"
+        if kind not in AGGREGATION_RECORDER_TYPES:
+            continue
+        recorder["type"] = AGGREGATION_RECORDER_TYPES[kind]
+        recorder.pop("dtype", None)
+        recorder["period"] = period
+        recorder["stats"] = list(stats)
+    return data
+
+
+def patch_json_aggregate(input_fn, output_fn, period='M', stats=STATISTICS):
+    """Write a copy of the model in `input_fn` that records period statistics instead of daily series.
+
+    The output should be written to the same directory as `input_fn` so that any relative
+    paths in the model still resolve.
+    """
+    with open(input_fn) as fh:
+        data = json.load(fh)
+
+    data = patch_json_data_aggregate(data, period=period, stats=stats)
+
+    with open(output_fn, mode="w") as fh:
+        json.dump(data, fh, indent=2)
+
+
+def aggregated_dataframe(model):
+    """Return the period statistics of all the `PeriodStatisticsRecorderMixin` recorders of `model`.
+
+    The columns are (recorder, statistic, scenario).
+    """
+    dfs = {r.name: r.to_dataframe() for r in model.recorders if isinstance(r, PeriodStatisticsRecorderMixin)}
+    df = pandas.concat(dfs, axis=1)
+    df.columns.set_names('Recorder', level=0, inplace=True)
+    return df
+
+
+def daily_dataframe(model):
+    """Return the time-series of the recorders of `model` that are not period statistics, or None."""
+    dfs = {r.name: r.to_dataframe() for r in model.recorders
+           if hasattr(r, 'to_dataframe') and not isinstance(r, PeriodStatisticsRecorderMixin)}
+    if len(dfs) == 0:
+        return None
+    df = pandas.concat(dfs, axis=1)
+    df.columns.set_names('Recorder', level=0, inplace=True)
+    return df
+
+
+def write_aggregated_results(model, csv_path):
+    """Write the period statistics of `model` to `csv_path`.
+
+    The time-series of any other recorders are written to the same path with a `_daily`
+    suffix.
+    """
+    root, ext = os.path.splitext(str(csv_path))
+    aggregated_dataframe(model).to_csv(csv_path)
+    df = daily_dataframe(model)
+    if df is not None:
+        df.to_csv(f'{root}_daily{ext}')
@@ -0,0 +1,36 @@
+import json
+from pywr_model.replay import check_replay_timestepper
+
+
+def patch_json_data_coarse(data, timestep=7, start=None, end=None):
+    """Change the model in `data` to a coarser time-step and/or a shorter record.
+
+    Time-series inputs (e.g. `dataframe` parameters) are resampled to the new time-step
+    by pywr when the model is loaded; the level of service parameters added by
+    `patch_model` define their periods in days and are converted to time-steps. A model
+    whose parameters have already been replayed can not be changed (see
+    `pywr_model.replay.check_replay_timestepper`).
+    """
+    timestepper = data["timestepper"]
+    timestepper["timestep"] = timestep
+    if start is not None:
+        timestepper["start"] = start
+    if end is not None:
+        timestepper["end"] = end
+    check_replay_timestepper(data)
+    return data
+
+
+def patch_json_coarse(input_fn, output_fn, timestep=7, start=None, end=None):
+    """Write a coarse time-step and/or short record copy of the model in `input_fn`.
+
+    The output should be written to the same directory as `input_fn` so that any relative
+    paths in the model still resolve.
+    """
+    with open(input_fn) as fh:
+        data = json.load(fh)
+
+    data = patch_json_data_coarse(data, timestep=timestep, start=start, end=end)
+
+    with open(output_fn, mode="w") as fh:
+        json.dump(data, fh, indent=2)
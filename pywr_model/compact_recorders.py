@@ -0,0 +1,200 @@
+import json
+import numpy as np
+import pandas
+from pywr.recorders import Aggregator, NodeRecorder, StorageRecorder, ParameterRecorder, IndexParameterRecorder
+
+# Store 0/1 values as one bit per scenario
+BITS = 'bits'
+
+
+def array_nbytes(shape, dtype):
+    """Return the bytes of a `(nts, ncomb)` array of `dtype`, which may be `BITS`."""
+    nts, ncomb = shape
+    if dtype == BITS:
+        return nts * ((ncomb + 7) // 8)
+    return nts * ncomb * np.dtype(dtype).itemsize
+
+
+class CompactArray:
+    """A `(nts, ncomb)` time-series array stored with a compact dtype.
+
+    `dtype` is any numpy dtype (e.g. float32, or int8 for small indices) or `BITS`, which
+    packs non-zero values as one bit per scenario. Rows are set per time-step and the
+    whole array is returned as float64.
+    """
+    def __init__(self, nts, ncomb, dtype):
+        self.ncomb = ncomb
+        self.dtype = dtype
+        if dtype == BITS:
+            self._data = np.zeros((nts, (ncomb + 7) // 8), np.uint8)
+        else:
+            self._data = np.zeros((nts, ncomb), dtype)
+
+    @property
+    def nbytes(self):
+        return self._data.nbytes
+
+    def __copy__(self):
+        # Snapshots copy the array; its data must not be shared with the original
+        other = CompactArray.__new__(CompactArray)
+        other.ncomb = self.ncomb
+        other.dtype = self.dtype
+        other._data = self._data.copy()
+        return other
+
+    def reset(self):
+        self._data[...] = 0
+
+    def set_row(self, index, values):
+        if self.dtype == BITS:
+            self._data[index, :] = np.packbits(np.asarray(values) != 0)
+        else:
+            self._data[index, :] = values
+
+    def to_array(self):
+        if self.dtype == BITS:
+            return np.unpackbits(self._data, axis=1, count=self.ncomb).astype(np.float64)
+        return self._data.astype(np.float64)
+
+
+class CompactArrayRecorderMixin:
+    """Record a value per time-step and scenario in a `CompactArray`.
+
+    This is the storage of pywr's `NumpyArray*Recorder`s with a configurable `dtype`;
+    sub-classes define `current_values` to return the values of the current time-step.
+    The array is listed in `_state_attributes` so that model snapshots capture it.
+    """
+    _state_attributes = ('_array',)
+    default_dtype = 'float32'
+
+    def __init__(self, *args, **kwargs):
+        self.dtype = kwargs.pop('dtype', self.default_dtype)
+        temporal_agg_func = kwargs.pop('temporal_agg_func', 'mean')
+        super().__init__(*args, **kwargs)
+        self._temporal_aggregator = Aggregator(temporal_agg_func)
+        self._array = None
+
+    def memory_estimate(self, nts, ncomb):
+        """Return the shape, dtype and bytes the recorder allocates."""
+        return (nts, ncomb), self.dtype, array_nbytes((nts, ncomb), self.dtype)
+
+    def setup(self):
+        self._array = CompactArray(len(self.model.timestepper), len(self.model.scenarios.combinations), self.dtype)
+
+    def reset(self):
+        self._array.reset()
+
+    def after(self):
+        self._array.set_row(self.model.timestepper.current.index, self.current_values())
+
+    @property
+    def data(self):
+        return self._array.to_array()
+
+    def values(self):
+        """Compute a value for each scenario using `temporal_agg_func`."""
+        return self._temporal_aggregator.aggregate_2d(self.data, axis=0, ignore_nan=self.ignore_nan)
+
+    def to_dataframe(self):
+        index = self.model.timestepper.datetime_index
+        sc_index = self.model.scenarios.multiindex
+        return pandas.DataFrame(data=self.data, index=index, columns=sc_index)
+
+
+class CompactNumpyArrayNodeRecorder(CompactArrayRecorderMixin, NodeRecorder):
+    """A `NumpyArrayNodeRecorder` that stores the flow with a compact `dtype` (default float32)."""
+    def __init__(self, *args, **kwargs):
+        self.factor = kwargs.pop('factor', 1.0)
+        super().__init__(*args, **kwargs)
+
+    def current_values(self):
+        return np.asarray(self.node.flow) * self.factor
+
+
+CompactNumpyArrayNodeRecorder.register()
+
+
+class CompactNumpyArrayStorageRecorder(CompactArrayRecorderMixin, StorageRecorder):
+    """A `NumpyArrayStorageRecorder` that stores the volume with a compact `dtype` (default float32)."""
+    def __init__(self, *args, **kwargs):
+        self.proportional = kwargs.pop('proportional', False)
+        super().__init__(*args, **kwargs)
+
+    def current_values(self):
+        return self.node.current_pc if self.proportional else self.node.volume
+
+
+CompactNumpyArrayStorageRecorder.register()
+
+
+class CompactNumpyArrayParameterRecorder(CompactArrayRecorderMixin, ParameterRecorder):
+    """A `NumpyArrayParameterRecorder` that stores the value with a compact `dtype` (default float32)."""
+    def current_values(self):
+        return self.parameter.get_all_values()
+
+
+CompactNumpyArrayParameterRecorder.register()
+
+
+class CompactNumpyArrayIndexParameterRecorder(CompactArrayRecorderMixin, IndexParameterRecorder):
+    """A `NumpyArrayIndexParameterRecorder` that stores the index with a compact `dtype` (default int8).
+
+    Use `BITS` for parameters that are only ever 0 or 1.
+    """
+    default_dtype = 'int8'
+
+    def current_values(self):
+        return self.parameter.get_all_indices()
+
+
+CompactNumpyArrayIndexParameterRecorder.register()
+
+
+# The compact replacement and its dtype option for each pywr recorder type
+COMPACT_RECORDER_TYPES = {
+    'numpyarraynoderecorder': ('CompactNumpyArrayNodeRecorder', 'node_dtype'),
+    'numpyarraystoragerecorder': ('CompactNumpyArrayStorageRecorder', 'storage_dtype'),
+    'numpyarrayparameterrecorder': ('CompactNumpyArrayParameterRecorder', 'parameter_dtype'),
+    'numpyarrayindexparameterrecorder': ('CompactNumpyArrayIndexParameterRecorder', 'index_dtype'),
+}
+
+
+def patch_json_data_compact(data, node_dtype='float32', storage_dtype='float32', parameter_dtype='float32',
+                            index_dtype='int8'):
+    """Replace the numpy array recorders in `data` with their compact versions.
+
+    A dtype of None leaves that kind of recorder unchanged.
+    """
+    dtypes = {
+        'node_dtype': node_dtype,
+        'storage_dtype': storage_dtype,
+        'parameter_dtype': parameter_dtype,
+        'index_dtype': index_dtype,
+    }
+    for recorder in data.get("recorders", {}).values():
+        kind = recorder.get("type", "").lower()
+        if not kind.endswith("recorder"):
+            kind += "recorder"
+        if kind not in COMPACT_RECORDER_TYPES:
+            continue
+        compact_type, option = COMPACT_RECORDER_TYPES[kind]
+        if dtypes[option] is None:
+            continue
+        recorder["type"] = compact_type
+        recorder["dtype"] = dtypes[option]
+    return data
+
+
+def patch_json_compact(input_fn, output_fn, **dtypes):
+    """Write a copy of the model in `input_fn` with compact numpy array recorders.
+
+    `dtypes` are passed to `patch_json_data_compact`. The output should be written to the
+    same directory as `input_fn` so that any relative paths in the model still resolve.
+    """
+    with open(input_fn) as fh:
+        data = json.load(fh)
+
+    data = patch_json_data_compact(data, **dtypes)
+
+    with open(output_fn, mode="w") as fh:
+        json.dump(data, fh, indent=2)
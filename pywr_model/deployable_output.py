@@ -0,0 +1,216 @@
+import json
+import logging
+import numpy as np
+import pandas
+from pywr.core import Model
+from pywr.parameters import Parameter
+from pywr.utils.bisect import BisectionSearchModel
+from pywr_model.run_statistics import RunStatisticsMixin
+
+logger = logging.getLogger(__name__)
+
+# The percentiles of the DO distribution summary
+DISTRIBUTION_PERCENTILES = [5, 10, 25, 50, 75, 90, 95]
+
+
+class ScenarioConstantParameter(Parameter):
+    """A constant that can be set separately for each scenario combination.
+
+    Setting the double variable sets the value of every scenario, so the parameter can
+    stand in for a `ConstantParameter` (e.g. the "Demand Scaling Factor"); the variable
+    read back is the mean over the scenarios. `set_scenario_values` sets one value per
+    scenario combination for `VectorBisectionSearchModel`.
+    """
+    def __init__(self, model, value, lower_bounds=0.0, upper_bounds=np.inf, **kwargs):
+        is_variable = kwargs.pop('is_variable', False)
+        super().__init__(model, **kwargs)
+        self.is_variable = is_variable
+        self.double_size = 1
+        self._value = float(value)
+        self._lower_bounds = float(lower_bounds)
+        self._upper_bounds = float(upper_bounds)
+        self._values = None
+
+    def setup(self):
+        super().setup()
+        self._values = np.full(len(self.model.scenarios.combinations), self._value)
+
+    def value(self, ts, si):
+        return self._values[si.global_id]
+
+    @property
+    def scenario_values(self):
+        return np.array(self._values)
+
+    def set_scenario_values(self, values):
+        self._values[...] = values
+
+    def set_double_variables(self, values):
+        self._value = float(values[0])
+        if self._values is not None:
+            self._values[...] = self._value
+
+    def get_double_variables(self):
+        if self._values is None:
+            return np.array([self._value])
+        return np.array([self._values.mean()])
+
+    def get_double_lower_bounds(self):
+        return np.array([self._lower_bounds])
+
+    def get_double_upper_bounds(self):
+        return np.array([self._upper_bounds])
+
+    @classmethod
+    def load(cls, model, data):
+        return cls(model, **data)
+
+
+ScenarioConstantParameter.register()
+
+
+def scenario_feasibility(model):
+    """Return a boolean array of whether each scenario combination satisfies every constraint of `model`.
+
+    This is `Recorder.is_constraint_violated` applied to the value of each scenario
+    rather than the value aggregated over the scenarios.
+    """
+    feasible = np.ones(len(model.scenarios.combinations), dtype=bool)
+    for r in model.constraints:
+        values = np.asarray(r.values())
+        if r.constraint_lower_bounds is not None:
+            feasible &= values >= r.constraint_lower_bounds
+        if r.constraint_upper_bounds is not None:
+            feasible &= values <= r.constraint_upper_bounds
+    return feasible
+
+
+class VectorBisectionSearchModel(BisectionSearchModel):
+    """A bisection search for the largest feasible value of a parameter in each scenario combination.
+
+    `BisectionSearchModel` finds one value for the whole ensemble. Here every scenario
+    combination keeps its own bracket between the bounds of `bisect_parameter`, which
+    must be a `ScenarioConstantParameter`, and every simulation tries the midpoint of
+    each bracket in its scenario. Feasibility is judged per scenario (see
+    `scenario_feasibility`), so each scenario's search is the same as a
+    `BisectionSearchModel` of that scenario alone.
+
+    The model is finally re-run at the best feasible value of each scenario, which is
+    kept in `deployable_output` (NaN for scenarios without a feasible value when
+    `error_on_infeasible` is False; they are re-run at the lower bound). The values tried
+    and their feasibility are kept in `bisection_history`.
+    """
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.deployable_output = None
+        self.bisection_history = []
+
+    def run(self):
+        if self.bisect_epsilon is None:
+            raise ValueError("Bisection epsilon is not defined.")
+        if self.bisect_parameter is None:
+            raise ValueError("Bisection parameter is not defined.")
+        if self.bisect_epsilon <= 0.0:
+            raise ValueError("Bisection epsilon value must be greater than zero.")
+        self.setup()
+        param = self.parameters[self.bisect_parameter]
+        if not isinstance(param, ScenarioConstantParameter):
+            raise ValueError(f'The vector bisection parameter "{self.bisect_parameter}" must be a '
+                             f'ScenarioConstantParameter.')
+
+        ncomb = len(self.scenarios.combinations)
+        min_value = np.full(ncomb, param.get_double_lower_bounds()[0])
+        max_value = np.full(ncomb, param.get_double_upper_bounds()[0])
+        if np.any(min_value >= max_value):
+            raise ValueError("Minimum bounds of the bisection parameter must be strictly greater than its "
+                             "maximum bounds.")
+
+        best_feasible = np.full(ncomb, -np.inf)
+        self.bisection_history = []
+        active = (max_value - min_value) > self.bisect_epsilon
+        while np.any(active):
+            # Scenarios whose bracket has closed are simulated at their lower bound and ignored
+            current_value = np.where(active, (max_value + min_value) / 2, min_value)
+            param.set_scenario_values(current_value)
+            Model.run(self)
+            feasible = scenario_feasibility(self)
+            self.bisection_history.append({'value': current_value.copy(), 'feasible': feasible & active})
+
+            tighten = active & feasible
+            min_value[tighten] = current_value[tighten]
+            best_feasible[tighten] = np.maximum(best_feasible[tighten], current_value[tighten])
+            loosen = active & ~feasible
+            max_value[loosen] = current_value[loosen]
+            active = (max_value - min_value) > self.bisect_epsilon
+
+        infeasible = np.isneginf(best_feasible)
+        self.deployable_output = np.where(infeasible, np.nan, best_feasible)
+        if np.any(infeasible):
+            if self.error_on_infeasible:
+                raise ValueError(f"No feasible solutions found during bisection for {infeasible.sum()} of {ncomb} "
+                                 f"scenarios. Trying lowering the bounds on the bisection parameter.")
+            best_feasible[infeasible] = min_value[infeasible]
+
+        # Re-run at the best feasible values so the recorders hold their results
+        param.set_scenario_values(best_feasible)
+        ret = Model.run(self)
+        logger.info(f'Vector bisection complete after {len(self.bisection_history)} simulations; the median highest '
+                    f'feasible value of "{self.bisect_parameter}" is {np.nanmedian(self.deployable_output):.4f}')
+        return ret
+
+
+class StatisticsVectorBisectionSearchModel(RunStatisticsMixin, VectorBisectionSearchModel):
+    pass
+
+
+def patch_json_data_vector_bisection(data, parameter="Demand Scaling Factor"):
+    """Make the constant bisection `parameter` in `data` a `ScenarioConstantParameter`."""
+    param = data["parameters"][parameter]
+    if param.get("type", "").lower() not in ("constant", "constantparameter"):
+        raise ValueError(f'The bisection parameter "{parameter}" must be a constant parameter.')
+    param["type"] = "ScenarioConstantParameter"
+    return data
+
+
+def patch_json_vector_bisection(input_fn, output_fn, parameter="Demand Scaling Factor"):
+    """Write a copy of the model in `input_fn` whose bisection parameter can be set per scenario.
+
+    The output should be written to the same directory as `input_fn` so that any relative
+    paths in the model still resolve.
+    """
+    with open(input_fn) as fh:
+        data = json.load(fh)
+
+    data = patch_json_data_vector_bisection(data, parameter=parameter)
+
+    with open(output_fn, mode="w") as fh:
+        json.dump(data, fh, indent=2)
+
+
+def deployable_output_table(model, recorders=None):
+    """Return the DO of each scenario combination of a `VectorBisectionSearchModel` that has been run.
+
+    The table is indexed by scenario and has the DO, whether it is feasible and the
+    value at the DO of each of the `recorders`, a dict of column name to recorder name
+    (e.g. the TUBs and NEUBs counts).
+    """
+    df = pandas.DataFrame(index=model.scenarios.multiindex)
+    df["DO Scaling Factor"] = model.deployable_output
+    df["feasible"] = ~np.isnan(model.deployable_output)
+    for column, name in (recorders or {}).items():
+        df[column] = np.asarray(model.recorders[name].values())
+    return df
+
+
+def deployable_output_distribution(table):
+    """Summarise the DO of every scenario in a `deployable_output_table`.
+
+    Returns the number of scenarios, the number of them with a feasible DO and the mean,
+    standard deviation, minimum, `DISTRIBUTION_PERCENTILES` and maximum of the feasible DOs.
+    """
+    do = table["DO Scaling Factor"].dropna()
+    data = {'scenarios': len(table), 'feasible': len(do), 'mean': do.mean(), 'std': do.std(), 'min': do.min()}
+    for q in DISTRIBUTION_PERCENTILES:
+        data[f'p{q}'] = do.quantile(q / 100) if len(do) else np.nan
+    data['max'] = do.max()
+    return pandas.Series(data, name="DO Scaling Factor")
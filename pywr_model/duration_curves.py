@@ -0,0 +1,290 @@
+import json
+import numpy as np
+import pandas
+from pywr.recorders import Aggregator, Recorder
+
+EXACT, SKETCH = 'exact', 'sketch'
+
+
+def percentiles_from_sorted(data, percentiles):
+    """Return the `percentiles` (0-100) of each column of `data`, which is sorted along axis 0.
+
+    This is numpy's default (linear) interpolation, so the result is the same as
+    `np.percentile(data, percentiles, axis=0)` but any number of percentiles only
+    costs the one sort.
+    """
+    n = data.shape[0]
+    position = np.asarray(percentiles, dtype=np.float64) / 100 * (n - 1)
+    lower = np.floor(position).astype(int)
+    upper = np.minimum(lower + 1, n - 1)
+    fraction = (position - lower)[:, np.newaxis]
+    return data[lower] + (data[upper] - data[lower]) * fraction
+
+
+class QuantileSketch:
+    """A bounded memory streaming quantile sketch of a column of values per scenario.
+
+    New rows fill a buffer of `size` rows. When a buffer (level) is full it is sorted and
+    every other row is promoted to the next level, where each row stands for twice as
+    many values; the offset of the kept rows alternates to avoid bias. Memory is
+    `size` rows per level, i.e. O(size * log2(n / size)) for n rows, and the rank error
+    of a quantile is roughly `log2(n / size) / size`.
+    """
+    def __init__(self, ncomb, size=256):
+        if size < 2 or size % 2:
+            raise ValueError('The sketch size must be an even number of at least 2.')
+        self.ncomb = ncomb
+        self.size = size
+        self._levels = []
+        self._counts = []
+        self._offset = 0
+        self._min = np.full(ncomb, np.inf)
+        self._max = np.full(ncomb, -np.inf)
+
+    def __copy__(self):
+        other = QuantileSketch(self.ncomb, self.size)
+        other._levels = [level.copy() for level in self._levels]
+        other._counts = list(self._counts)
+        other._offset = self._offset
+        other._min = self._min.copy()
+        other._max = self._max.copy()
+        return other
+
+    @property
+    def nbytes(self):
+        return sum(level.nbytes for level in self._levels)
+
+    def _level(self, i):
+        while len(self._levels) <= i:
+            self._levels.append(np.empty((self.size, self.ncomb)))
+            self._counts.append(0)
+        return self._levels[i]
+
+    def _push(self, i, rows):
+        level = self._level(i)
+        n = self._counts[i]
+        level[n:n + len(rows)] = rows
+        self._counts[i] = n + len(rows)
+        if self._counts[i] == self.size:
+            level.sort(axis=0)
+            kept = level[self._offset::2].copy()
+            self._offset = 1 - self._offset
+            self._counts[i] = 0
+            self._push(i + 1, kept)
+
+    def add(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        np.minimum(self._min, values, out=self._min)
+        np.maximum(self._max, values, out=self._max)
+        self._push(0, values[np.newaxis, :])
+
+    def percentiles(self, percentiles):
+        """Return the estimated `percentiles` (0-100) of each scenario."""
+        values = np.concatenate([level[:n] for level, n in zip(self._levels, self._counts)])
+        weights = np.concatenate([np.full(n, 2.0**i) for i, n in enumerate(self._counts)])
+        total = weights.sum()
+        # The rank of each sorted value is the centre of the values it stands for, scaled
+        # to match the linear interpolation of `np.percentile`. The exact minimum and
+        # maximum anchor the ends of the curve.
+        target = np.asarray(percentiles, dtype=np.float64) / 100 * (total - 1)
+        result = np.empty((len(target), self.ncomb))
+        for j in range(self.ncomb):
+            order = np.argsort(values[:, j], kind='stable')
+            w = weights[order]
+            ranks = np.concatenate([[0.0], np.cumsum(w) - (w + 1) / 2, [total - 1]])
+            column = np.concatenate([[self._min[j]], values[order, j], [self._max[j]]])
+            result[:, j] = np.interp(target, ranks, column)
+        return result
+
+
+def sketch_rows(nts, size):
+    """Return the maximum number of rows a `QuantileSketch` of `size` keeps for `nts` values."""
+    levels = 1
+    while size * 2**(levels - 1) < nts:
+        levels += 1
+    return size * levels
+
+
+class DurationCurveEngine(Recorder):
+    """Record the flow or storage of a node once for all of its duration curves.
+
+    Created by `DurationCurveEngine.get` for each node, quantity and mode; the duration
+    curve recorders of that node subscribe to it. In "exact" mode the whole series is
+    kept and sorted once when the run finishes, serving every requested percentile. In
+    "sketch" mode a `QuantileSketch` of `sketch_size` keeps the memory bounded
+    regardless of the length of the run.
+    """
+    _state_attributes = ('_data', '_n', '_sketch')
+
+    def __init__(self, model, node, quantity, mode=EXACT, sketch_size=256, **kwargs):
+        if mode not in (EXACT, SKETCH):
+            raise ValueError(f'Unknown duration curve mode "{mode}".')
+        super().__init__(model, **kwargs)
+        self.node = node
+        self.quantity = quantity
+        self.mode = mode
+        self.sketch_size = sketch_size
+        self.children.add(node)
+        self._data = None
+        self._sketch = None
+        self._sorted = None
+
+    @classmethod
+    def get(cls, model, node, quantity, mode=EXACT, sketch_size=256):
+        """Return the engine of `node` and `quantity` ("flow", "volume" or "proportional")."""
+        name = f'__duration curve engine__ {node.name} {quantity} {mode} {sketch_size}'
+        for recorder in model.recorders:
+            if recorder.name == name:
+                return recorder
+        return cls(model, node, quantity, mode=mode, sketch_size=sketch_size, name=name)
+
+    def memory_estimate(self, nts, ncomb):
+        """Return the shape, dtype and bytes of the recorded series or sketch."""
+        rows = nts if self.mode == EXACT else min(nts, sketch_rows(nts, self.sketch_size))
+        return (rows, ncomb), 'float64', rows * ncomb * 8
+
+    def setup(self):
+        self._ncomb = len(self.model.scenarios.combinations)
+        if self.mode == EXACT:
+            self._data = np.zeros((len(self.model.timestepper), self._ncomb))
+
+    def reset(self):
+        self._sorted = None
+        self._n = 0
+        if self.mode == SKETCH:
+            self._sketch = QuantileSketch(self._ncomb, self.sketch_size)
+
+    def _current_values(self):
+        if self.quantity == 'flow':
+            return self.node.flow
+        if self.quantity == 'proportional':
+            return self.node.current_pc
+        return self.node.volume
+
+    def after(self):
+        if self.mode == EXACT:
+            self._data[self._n, :] = self._current_values()
+        else:
+            self._sketch.add(self._current_values())
+        self._n += 1
+
+    def finish(self):
+        if self.mode == EXACT:
+            self._sorted = np.sort(self._data[:self._n], axis=0)
+
+    def percentiles(self, percentiles):
+        """Return a `(len(percentiles), ncomb)` array of the duration curve at `percentiles`."""
+        if self.mode == EXACT:
+            if self._sorted is None:
+                self.finish()
+            return percentiles_from_sorted(self._sorted, percentiles)
+        return self._sketch.percentiles(percentiles)
+
+
+class DurationCurveRecorderMixin:
+    """A duration curve (e.g. a FDC) served by the node's shared `DurationCurveEngine`.
+
+    The interface matches pywr's `FlowDurationCurveRecorder` and
+    `StorageDurationCurveRecorder`: `values` aggregates the curve over the
+    percentiles with `temporal_agg_func` and `to_dataframe` is indexed by percentile.
+    """
+    quantity = 'flow'
+
+    def __init__(self, model, node, percentiles, **kwargs):
+        for key in ('fdc_agg_func', 'sdc_agg_func'):
+            if key in kwargs:
+                kwargs['temporal_agg_func'] = kwargs.pop(key)
+        temporal_agg_func = kwargs.pop('temporal_agg_func', 'mean')
+        mode = kwargs.pop('mode', EXACT)
+        sketch_size = kwargs.pop('sketch_size', 256)
+        quantity = self.quantity
+        if kwargs.pop('proportional', False):
+            quantity = 'proportional'
+        super().__init__(model, **kwargs)
+        self.node = node
+        self._percentiles = np.asarray(percentiles, dtype=np.float64)
+        self._temporal_aggregator = Aggregator(temporal_agg_func)
+        self.engine = DurationCurveEngine.get(model, node, quantity, mode=mode, sketch_size=sketch_size)
+        self.children.add(self.engine)
+
+    @property
+    def percentiles(self):
+        return np.array(self._percentiles)
+
+    @property
+    def curve(self):
+        return self.engine.percentiles(self._percentiles)
+
+    def values(self):
+        """Compute a value for each scenario using `temporal_agg_func`."""
+        return self._temporal_aggregator.aggregate_2d(self.curve, axis=0, ignore_nan=self.ignore_nan)
+
+    def to_dataframe(self):
+        sc_index = self.model.scenarios.multiindex
+        return pandas.DataFrame(data=self.curve, index=self.percentiles, columns=sc_index)
+
+    @classmethod
+    def load(cls, model, data):
+        node = model.nodes[data.pop('node')]
+        return cls(model, node, **data)
+
+
+class SharedFlowDurationCurveRecorder(DurationCurveRecorderMixin, Recorder):
+    """A flow duration curve of a node; see `DurationCurveRecorderMixin`."""
+    quantity = 'flow'
+
+    @property
+    def fdc(self):
+        return self.curve
+
+
+SharedFlowDurationCurveRecorder.register()
+
+
+class SharedStorageDurationCurveRecorder(DurationCurveRecorderMixin, Recorder):
+    """A storage duration curve of a storage node; see `DurationCurveRecorderMixin`."""
+    quantity = 'volume'
+
+    @property
+    def sdc(self):
+        return self.curve
+
+
+SharedStorageDurationCurveRecorder.register()
+
+
+# The shared engine replacement for each of pywr's duration curve recorders
+DURATION_CURVE_TYPES = {
+    'flowdurationcurverecorder': 'SharedFlowDurationCurveRecorder',
+    'storagedurationcurverecorder': 'SharedStorageDurationCurveRecorder',
+}
+
+
+def patch_json_data_duration_curves(data, mode=EXACT, sketch_size=256):
+    """Replace pywr's flow and storage duration curve recorders in `data` with the shared engine."""
+    for recorder in data.get("recorders", {}).values():
+        kind = recorder.get("type", "").lower()
+        if not kind.endswith("recorder"):
+            kind += "recorder"
+        if kind not in DURATION_CURVE_TYPES:
+            continue
+        recorder["type"] = DURATION_CURVE_TYPES[kind]
+        recorder["mode"] = mode
+        if mode == SKETCH:
+            recorder["sketch_size"] = sketch_size
+    return data
+
+
+def patch_json_duration_curves(input_fn, output_fn, mode=EXACT, sketch_size=256):
+    """Write a copy of the model in `input_fn` with its duration curves served by the shared engine.
+
+    The output should be written to the same directory as `input_fn` so that any relative
+    paths in the model still resolve.
+    """
+    with open(input_fn) as fh:
+        data = json.load(fh)
+
+    data = patch_json_data_duration_curves(data, mode=mode, sketch_size=sketch_size)
+
+    with open(output_fn, mode="w") as fh:
+        json.dump(data, fh, indent=2)
@@ -3,6 +3,12 @@ import numpy as np
 
 
 class FloodProfileParameter(Parameter):
+    """A flood control curve that is only drawn down outside of a window of the year.
+
+    Between `end_doy` and `start_doy` (exclusive) the curve is above the reservoir
+    (1.01) and otherwise it is given by `draw_down_pc`. Whether the time-step is in the
+    window is the same for every scenario so it is found once per time-step in `before`.
+    """
     def __init__(self, *args, **kwargs):
         draw_down_pc = kwargs.pop('draw_down_pc')
         start_doy = kwargs.pop('start_doy')
@@ -13,9 +19,13 @@ class FloodProfileParameter(Parameter):
         self.start_doy = start_doy
         self.end_doy = end_doy
         self.integer_size = 2
+        self._in_window = False
+
+    def before(self):
+        self._in_window = self.end_doy < self.model.timestepper.current.dayofyear < self.start_doy
 
     def value(self, ts, si):
-        if self.end_doy < ts.dayofyear < self.start_doy:
+        if self._in_window:
             return 1.01
         else:
             return self.draw_down_pc.get_value(si)
@@ -10,24 +10,51 @@ class ForecastCrossingIndexParameter(IndexParameter):
     a value of 1, otherwise it returns a value of 0. It is intended to be
     used to trigger drought actions by projecting recent drawdown rates in
     to the future.
+
+    The rolling window is either a number of time-steps (`rolling_window`) or of days
+    (`rolling_days`), which is converted to time-steps in `setup`. The forecast window
+    is in days because the storage flow is a daily rate. Only the flows of the rolling
+    window are kept, in `memory_dtype` (default float64).
     """
-    def __init__(self, model, storage_node, control_curve, rolling_window, forecast_window, **kwargs):
+    _state_attributes = ('_forecast_volume', '_memory', '_position')
+
+    def __init__(self, model, storage_node, control_curve, rolling_window=None, forecast_window=None,
+                 rolling_days=None, memory_dtype='float64', **kwargs):
         super().__init__(model, **kwargs)
         self.storage_node = storage_node
         self.control_curve = control_curve
         self.children.add(control_curve)
-        self.rolling_window = rolling_window
+
+        if not rolling_window and not rolling_days:
+            raise ValueError("Either `rolling_window` or `rolling_days` must be specified.")
+        self.rolling_window = int(rolling_window) if rolling_window else 0
+        self.rolling_days = int(rolling_days) if rolling_days else 0
         self.forecast_window = forecast_window
+        self.memory_dtype = memory_dtype
         self._forecast_volume = None
         self._memory = None
         self._position = None
 
+    def _rolling_timesteps(self):
+        if self.rolling_days > 0:
+            try:
+                return max(self.rolling_days // self.model.timestepper.delta, 1)
+            except TypeError:
+                raise TypeError('A rolling window defined as a number of days is only valid '
+                                'with daily time-steps.')
+        return self.rolling_window
+
+    def memory_estimate(self, nts, ncomb):
+        """Return the shape, dtype and bytes of the rolling window memory."""
+        shape = (self._rolling_timesteps(), ncomb)
+        return shape, self.memory_dtype, shape[0] * ncomb * np.dtype(self.memory_dtype).itemsize
+
     def setup(self):
         super().setup()
+        self.rolling_window = self._rolling_timesteps()
         ncomb = len(self.model.scenarios.combinations)
-        nts = len(self.model.timestepper)
         self._forecast_volume = np.empty(ncomb, np.float64)
-        self._memory = np.empty((nts, ncomb,), np.float64)
+        self._memory = np.empty((self.rolling_window, ncomb,), self.memory_dtype)
         self._position = 0
 
     def reset(self):
@@ -80,6 +107,8 @@ class ForecastCrossingIndexParameter(IndexParameter):
 
 
 class StickyIndexParameter(IndexParameter):
+    _state_attributes = ('_timestep_off',)
+
     def __init__(self, model, index_parameter, minimum_timesteps=None, minimum_days=None, **kwargs):
         super().__init__(model, **kwargs)
         self.index_parameter = index_parameter
@@ -148,6 +177,8 @@ class EventCountIndexParameterRecorder(IndexParameterRecorder):
     threshold : int
         The threshold to compare the parameter to
     """
+    _state_attributes = ('_count', '_previous_value')
+
     def __init__(self, model, parameter, threshold: int, *args, **kwargs):
         super().__init__(model, parameter, *args, **kwargs)
         self.threshold = threshold
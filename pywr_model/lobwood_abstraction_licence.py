@@ -252,21 +252,22 @@ class GrimwithCompensationRelease(Parameter):
         self.grimwith_comp = grimwith_comp
         self.grimwith_comp = [15.1, 15.1, 15.1, 10.72, 3.8, 3.8, 3.8, 3.8, 3.8,
                               9.625, 15.1, 15.1]
+        self._current_comp = None
         self.river_gauge = river_gauge
         self.children.add(river_gauge)
         self.children.add(grimwith_comp)
 
-    def value(self, timestep, scenario_index):
-        sid = scenario_index.global_id
+    def before(self):
+        # The monthly compensation is the same for every scenario so it is found once per time-step
+        self._current_comp = self.grimwith_comp[self.model.timestepper.current.month - 1]
 
+    def value(self, timestep, scenario_index):
         current_flow = self.river_gauge.get_value(scenario_index)
 
-        idx = timestep.month - 1
-
         if current_flow < 252:
-            new_comp = self.grimwith_comp[idx] + 22.7
+            new_comp = self._current_comp + 22.7
         else:
-            new_comp = self.grimwith_comp[idx]
+            new_comp = self._current_comp
 
         return new_comp
 
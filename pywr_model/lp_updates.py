@@ -0,0 +1,118 @@
+import numpy as np
+import pandas
+from pywr.core import Model
+from pywr._core import BaseInput, BaseLink, BaseOutput
+from pywr_model.run_statistics import RunStatisticsMixin
+
+# Solver arguments that make pywr's GLPK solvers write the bounds and costs that cannot
+# change to the LP once per simulation instead of every time-step.
+FIXED_ONCE_SOLVER_ARGS = {
+    'set_fixed_flows_once': True,
+    'set_fixed_costs_once': True,
+    'set_fixed_factors_once': True,
+}
+
+
+def lp_update_nodes(model):
+    """Return the nodes whose flow bounds and whose costs the solver of `model` writes every time-step.
+
+    This follows the classification in the `setup` of pywr's GLPK solvers: every input,
+    link and output node has a row of flow bounds and every node a cost, and with
+    `set_fixed_flows_once` (or `set_fixed_costs_once`) those whose bounds (or cost) are
+    constant are only written once per simulation. Returns the `(bounds, costs)` lists.
+    """
+    fixed_flows = getattr(model.solver, 'set_fixed_flows_once', False)
+    fixed_costs = getattr(model.solver, 'set_fixed_costs_once', False)
+    bounds, costs = [], []
+    for node in model.graph.nodes():
+        if isinstance(node, (BaseInput, BaseLink, BaseOutput)) and not (fixed_flows and node.has_constant_flows):
+            bounds.append(node)
+        try:
+            fixed_cost = node.has_fixed_cost
+        except AttributeError:
+            fixed_cost = False
+        if not (fixed_costs and fixed_cost):
+            costs.append(node)
+    return bounds, costs
+
+
+class UpdateAuditMixin:
+    """Audit the flow bound and cost updates the solver writes to the LP each time-step.
+
+    This measures, it does not skip anything: pywr's compiled GLPK solvers write the
+    bounds and cost of every node returned by `lp_update_nodes` for every scenario and
+    time-step, and the only updates they can be told to skip are those of
+    `FIXED_ONCE_SOLVER_ARGS`. Before every solve the values about to be written are
+    compared, per scenario, with those written at the previous time-step, so
+    `update_statistics` reports how many of the writes repeat the previous value
+    alongside how many pywr already skips.
+    """
+    def __init__(self, *args, **kwargs):
+        # `Model.__init__` resets the model
+        self._audit_bounds = []
+        self._audit_costs = []
+        super().__init__(*args, **kwargs)
+
+    def setup(self, *args, **kwargs):
+        super().setup(*args, **kwargs)
+        self._audit_bounds, self._audit_costs = lp_update_nodes(self)
+        self._audit_nodes = {
+            'bounds': sum(1 for n in self.graph.nodes() if isinstance(n, (BaseInput, BaseLink, BaseOutput))),
+            'cost': len(self.graph.nodes()),
+        }
+        self._reset_audit()
+
+    def reset(self, *args, **kwargs):
+        super().reset(*args, **kwargs)
+        self._reset_audit()
+
+    def _reset_audit(self):
+        self._previous_bounds = [None] * len(self._audit_bounds)
+        self._previous_costs = [None] * len(self._audit_costs)
+        self._audit_counts = {'bounds': np.zeros(2, np.int64), 'cost': np.zeros(2, np.int64)}
+        self._audit_timesteps = 0
+
+    def _audit(self, kind, previous, i, values):
+        counts = self._audit_counts[kind]
+        counts[0] += len(values)
+        if previous[i] is not None:
+            counts[1] += np.count_nonzero(np.all(values == previous[i], axis=1))
+        previous[i] = values
+
+    def solve(self):
+        for i, node in enumerate(self._audit_bounds):
+            # Both bounds are written to the node's row together
+            values = np.array([node.get_all_min_flow(), node.get_all_max_flow()])
+            self._audit('bounds', self._previous_bounds, i, values.T)
+        for i, node in enumerate(self._audit_costs):
+            self._audit('cost', self._previous_costs, i, np.array(node.get_all_cost())[:, None])
+        self._audit_timesteps += 1
+        return super().solve()
+
+    def update_statistics(self):
+        """Return the bound and cost updates of the simulation.
+
+        For the flow bounds and the costs: the number of nodes, how many of them pywr
+        writes once per simulation (`set_once`), the writes it skipped as a result
+        (`skipped`), the writes it made (`updates`) and how many of those repeated the
+        value written at the previous time-step (`unchanged`).
+        """
+        ncomb = len(self.scenarios.combinations)
+        rows = {}
+        for kind, dynamic in (('bounds', self._audit_bounds), ('cost', self._audit_costs)):
+            total, unchanged = self._audit_counts[kind]
+            set_once = self._audit_nodes[kind] - len(dynamic)
+            rows[kind] = {
+                'nodes': self._audit_nodes[kind],
+                'set_once': set_once,
+                'skipped': int(set_once * ncomb * self._audit_timesteps),
+                'updates': int(total),
+                'unchanged': int(unchanged),
+            }
+        df = pandas.DataFrame.from_dict(rows, orient='index')
+        df['unchanged_fraction'] = df['unchanged'] / df['updates'].where(df['updates'] > 0)
+        return df
+
+
+class UpdateAuditModel(UpdateAuditMixin, RunStatisticsMixin, Model):
+    pass
@@ -0,0 +1,78 @@
+import warnings
+import numpy as np
+import pandas
+from pywr.recorders import NumpyArrayNodeRecorder, NumpyArrayAbstractStorageRecorder, NumpyArrayParameterRecorder, \
+    NumpyArrayIndexParameterRecorder, NumpyArrayDailyProfileParameterRecorder
+from pywr_model.compact_recorders import array_nbytes
+
+# The arrays pywr's own recorders allocate: rows (None for one per time-step) and dtype
+PYWR_ARRAYS = (
+    (NumpyArrayNodeRecorder, None, np.float64),
+    (NumpyArrayAbstractStorageRecorder, None, np.float64),
+    (NumpyArrayParameterRecorder, None, np.float64),
+    (NumpyArrayIndexParameterRecorder, None, np.int32),
+    (NumpyArrayDailyProfileParameterRecorder, 366, np.float64),
+)
+
+
+class MemoryBudgetWarning(UserWarning):
+    pass
+
+
+def _estimate(component, nts, ncomb):
+    if hasattr(component, 'memory_estimate'):
+        return component.memory_estimate(nts, ncomb)
+    for klass, rows, dtype in PYWR_ARRAYS:
+        if isinstance(component, klass):
+            shape = (nts if rows is None else rows, ncomb)
+            return shape, np.dtype(dtype).name, array_nbytes(shape, dtype)
+    return None
+
+
+def memory_budget(model, limit=None):
+    """Estimate the memory the recorders and parameters of `model` allocate for a run.
+
+    The estimate is made before the model is set up, from the length of the timestepper
+    and the number of scenario combinations. Components report their own allocation
+    with a `memory_estimate(nts, ncomb)` method returning `(shape, dtype, bytes)`;
+    pywr's numpy array recorders are estimated from `PYWR_ARRAYS`. Other components
+    are assumed to allocate no more than a value per scenario.
+
+    Returns a DataFrame with the shape, dtype and bytes of each component, largest first.
+    If `limit` (bytes) is given and the total exceeds it a `MemoryBudgetWarning` is issued.
+    """
+    model.timestepper.setup()
+    model.scenarios.setup()
+    nts = len(model.timestepper)
+    ncomb = len(model.scenarios.combinations)
+
+    rows = []
+    for kind, components in (('recorder', model.recorders), ('parameter', model.parameters)):
+        for component in components:
+            estimate = _estimate(component, nts, ncomb)
+            if estimate is None:
+                continue
+            shape, dtype, nbytes = estimate
+            rows.append({
+                'component': component.name,
+                'kind': kind,
+                'type': component.__class__.__name__,
+                'shape': shape,
+                'dtype': dtype,
+                'bytes': nbytes,
+            })
+
+    df = pandas.DataFrame(rows, columns=['component', 'kind', 'type', 'shape', 'dtype', 'bytes'])
+    df = df.sort_values('bytes', ascending=False).reset_index(drop=True)
+    total = int(df['bytes'].sum())
+    if limit is not None and total > limit:
+        warnings.warn(f'The model is estimated to allocate {total:,} bytes for {nts} time-steps and {ncomb} '
+                      f'scenarios, which exceeds the limit of {int(limit):,} bytes.', MemoryBudgetWarning)
+    return df
+
+
+def write_memory_budget(model, csv_path, limit=None):
+    """Write the memory budget of `model` to `csv_path` and return the total in bytes."""
+    df = memory_budget(model, limit=limit)
+    df.to_csv(csv_path, index=False)
+    return int(df['bytes'].sum())
@@ -0,0 +1,141 @@
+import json
+import os
+from pywr.core import Model
+from pywr_model.aggregation_recorders import patch_json_data_aggregate
+from pywr_model.coarse import patch_json_data_coarse
+from pywr_model.compact_recorders import patch_json_data_compact
+from pywr_model.deployable_output import patch_json_data_vector_bisection
+from pywr_model.duration_curves import patch_json_data_duration_curves
+from pywr_model.reduction import patch_json_data_reduce
+from pywr_model.replay import patch_json_data_replay
+
+
+def _reduce(data, path, **options):
+    data, _ = patch_json_data_reduce(data, **options)
+    return data
+
+
+def _replay(data, path, exclude=("Demand Scaling Factor", )):
+    # The trajectories are evaluated by the model as patched so far, written to `path` so
+    # that its relative paths resolve as they will in the final copy
+    with open(path, mode="w") as fh:
+        json.dump(data, fh, indent=2)
+    return patch_json_data_replay(data, Model.load(path), exclude=exclude)
+
+
+def _data_patch(func):
+    def patch(data, path, **options):
+        return func(data, **options)
+    return patch
+
+
+# The patches `write_patched_json` can apply: the suffix they add to the file name, the
+# function that applies them and the option that may be given on its own as a string.
+PATCHES = {
+    'reduce': ('reduced', _reduce, None),
+    'replay': ('replay', _replay, None),
+    'compact': ('compact', _data_patch(patch_json_data_compact), None),
+    'aggregate': ('aggregated', _data_patch(patch_json_data_aggregate), 'period'),
+    'duration_curves': ('duration_curves', _data_patch(patch_json_data_duration_curves), 'mode'),
+    'vector': ('vector', _data_patch(patch_json_data_vector_bisection), 'parameter'),
+    'coarse': ('coarse', _data_patch(patch_json_data_coarse), None),
+}
+
+
+def patch_options(patches):
+    """Return a dict of the keyword options of each of `patches` that is enabled, in order.
+
+    Each patch is the name of one of `PATCHES` or a `(name, options)` pair. The options
+    are True (the defaults), a dict of keyword arguments for the patch or, for the
+    patches that have one, the value of their main option as a string (e.g.
+    `('aggregate', 'Y')` for annual statistics). Patches whose options are false or None
+    are disabled.
+    """
+    result = {}
+    for patch in patches:
+        name, options = (patch, True) if isinstance(patch, str) else patch
+        if name not in PATCHES:
+            raise ValueError(f'Unknown model patch "{name}".')
+        if not options:
+            continue
+        key = PATCHES[name][2]
+        if isinstance(options, dict):
+            result[name] = dict(options)
+        elif isinstance(options, str) and key is not None:
+            result[name] = {key: options}
+        else:
+            result[name] = {}
+    return result
+
+
+def compact_index_dtype(patches):
+    """Return the dtype of the compact index recorders of `patches`, or None if 'compact' is not enabled.
+
+    `pywr_model.patch_model` needs it to add the TUBs and NEUBs recorders to match.
+    """
+    options = patch_options(patches)
+    return options['compact'].get('index_dtype', 'int8') if 'compact' in options else None
+
+
+def relocate_paths(data, source_dir, target_dir):
+    """Rewrite the relative paths in `data` so that they resolve from `target_dir` as they did from `source_dir`.
+
+    Pywr resolves the `url` of parameters, tables and recorders, and the `includes` of
+    the model, relative to the directory of the model's JSON file.
+    """
+    def relocate(path):
+        if os.path.isabs(path):
+            return path
+        path = os.path.join(source_dir, path)
+        try:
+            return os.path.relpath(path, target_dir or os.curdir)
+        except ValueError:
+            # On a different drive
+            return os.path.abspath(path)
+
+    def find(obj):
+        if isinstance(obj, dict):
+            for key, value in obj.items():
+                if key == 'url' and isinstance(value, str):
+                    obj[key] = relocate(value)
+                else:
+                    find(value)
+        elif isinstance(obj, list):
+            for value in obj:
+                find(value)
+
+    find(data)
+    if "includes" in data:
+        data["includes"] = [relocate(filename) for filename in data["includes"]]
+    return data
+
+
+def write_patched_json(json_path, output_dir, patches, name=None):
+    """Write a copy of the model in `json_path` to `output_dir` with `patches` applied in order.
+
+    `patches` are as in `patch_options`. The copy is named after `json_path` with the
+    suffix of each enabled patch (e.g. `run_DO_reduced_replay.json`), or `name`, and its
+    relative paths are rewritten so that they still resolve (see `relocate_paths`); the
+    model's own directory (e.g. `working_directory/inputs`) is left untouched. Returns
+    the path of the copy, or `json_path` itself if no patch is enabled.
+    """
+    options = patch_options(patches)
+    if not options:
+        return json_path
+
+    with open(json_path) as fh:
+        data = json.load(fh)
+    data = relocate_paths(data, os.path.dirname(json_path), output_dir)
+
+    if name is None:
+        root, ext = os.path.splitext(os.path.basename(json_path))
+        name = root + ''.join(f'_{PATCHES[patch][0]}' for patch in options) + ext
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    output_path = os.path.join(output_dir, name)
+    for patch, kwargs in options.items():
+        data = PATCHES[patch][1](data, output_path, **kwargs)
+
+    with open(output_path, mode="w") as fh:
+        json.dump(data, fh, indent=2)
+    return output_path
@@ -0,0 +1,163 @@
+import json
+from pywr_model.replay import _references
+
+# Nodes that `patch_model` looks up by name and must therefore be kept.
+PATCH_MODEL_NODES = (
+    "Addingham",
+    "Grimwith Release",
+    "Lobwood Constraint",
+    "Lobwood Licence",
+    "Wharfe2In",
+    "Grimwith Compensation",
+    "Lobwood River Intake",
+    "Group Storage",
+)
+
+# Node keys that do not constrain or cost the flow through a link.
+PASSIVE_KEYS = ("name", "type", "comment", "position")
+
+# Recorders that only record the flow of their `node`; they can record a link that
+# carries the same flow instead.
+FLOW_RECORDER_TYPES = (
+    "numpyarraynode",
+    "totalflownode",
+    "meanflownode",
+    "rollingmeanflownode",
+    "flowdurationcurve",
+)
+
+
+def _is_flow_recorder(recorder):
+    kind = recorder.get("type", "").lower()
+    if kind.endswith("recorder"):
+        kind = kind[:-len("recorder")]
+    return kind in FLOW_RECORDER_TYPES
+
+
+def _is_pass_through(node):
+    if node["type"].lower() != "link":
+        return False
+    for key, value in node.items():
+        if key in PASSIVE_KEYS:
+            continue
+        if key == "cost" and value == 0:
+            continue
+        return False
+    return True
+
+
+def find_removable_links(data, exclude=PATCH_MODEL_NODES):
+    """Return the names of the links that carry no flow constraints or costs and are not referenced.
+
+    A link is referenced if its name appears in any parameter, other node (e.g. an
+    aggregated node) or recorder, other than as the `node` of a flow recorder, or in
+    `exclude`.
+    """
+    candidates = set(n["name"] for n in data["nodes"] if _is_pass_through(n)) - set(exclude)
+    referenced = _references(data.get("parameters", {}), candidates)
+    for recorder in data.get("recorders", {}).values():
+        if _is_flow_recorder(recorder):
+            recorder = {k: v for k, v in recorder.items() if k != "node"}
+        referenced |= _references(recorder, candidates)
+    for node in data["nodes"]:
+        referenced |= _references({k: v for k, v in node.items() if k != "name"}, candidates)
+    return candidates - referenced
+
+
+def patch_json_data_reduce(data, exclude=PATCH_MODEL_NODES):
+    """Merge chains of pass-through links in to single links.
+
+    A removable link (see `find_removable_links`) with one incoming and one outgoing
+    edge carries the same flow as its upstream neighbour if that is a link with a single
+    outgoing edge, or as its downstream neighbour if that is a link with a single
+    incoming edge. Such a link is removed and its neighbours connected directly, which
+    leaves the LP solution unchanged. This is repeated until no more links can be removed.
+    Flow recorders of a removed link record the link that replaced it instead.
+
+    Returns the reduced data and a dict mapping each removed link to the remaining link
+    that carries its flow. The mapping is also stored in the model's metadata under
+    `reduced_nodes`.
+    """
+    removable = find_removable_links(data, exclude=exclude)
+    links = set(n["name"] for n in data["nodes"] if n["type"].lower() == "link")
+    edges = [list(e) for e in data["edges"]]
+    mapping = {}
+
+    changed = True
+    while changed:
+        changed = False
+        for name in sorted(removable - set(mapping)):
+            incoming = [e for e in edges if e[1] == name]
+            outgoing = [e for e in edges if e[0] == name]
+            if len(incoming) != 1 or len(outgoing) != 1 or len(incoming[0]) != 2 or len(outgoing[0]) != 2:
+                continue
+            upstream, downstream = incoming[0][0], outgoing[0][1]
+            if upstream == downstream or [upstream, downstream] in edges:
+                continue
+
+            if upstream in links and sum(1 for e in edges if e[0] == upstream) == 1:
+                mapping[name] = upstream
+            elif downstream in links and sum(1 for e in edges if e[1] == downstream) == 1:
+                mapping[name] = downstream
+            else:
+                continue
+            edges.remove(incoming[0])
+            edges.remove(outgoing[0])
+            edges.append([upstream, downstream])
+            changed = True
+
+    # Resolve chains of removed links to the link that remains
+    for name in mapping:
+        target = mapping[name]
+        while target in mapping:
+            target = mapping[target]
+        mapping[name] = target
+
+    data["nodes"] = [n for n in data["nodes"] if n["name"] not in mapping]
+    for recorder in data.get("recorders", {}).values():
+        if _is_flow_recorder(recorder) and recorder.get("node") in mapping:
+            recorder["node"] = mapping[recorder["node"]]
+    data["edges"] = edges
+    data.setdefault("metadata", {})["reduced_nodes"] = mapping
+    return data, mapping
+
+
+def patch_json_reduce(input_fn, output_fn, exclude=PATCH_MODEL_NODES):
+    """Write a copy of the model in `input_fn` with its pass-through link chains merged.
+
+    Returns the mapping of removed links to the links that carry their flow. The output
+    should be written to the same directory as `input_fn` so that any relative paths in
+    the model still resolve.
+    """
+    with open(input_fn) as fh:
+        data = json.load(fh)
+
+    data, mapping = patch_json_data_reduce(data, exclude=exclude)
+
+    with open(output_fn, mode="w") as fh:
+        json.dump(data, fh, indent=2)
+    return mapping
+
+
+def node_flows(model, mapping):
+    """Return the current flow of every node of the original network of a reduced model.
+
+    `mapping` is the mapping returned by `patch_json_data_reduce`; removed links are
+    given the flow of the link that replaced them.
+    """
+    flows = {node.name: node.flow for node in model.nodes}
+    for name, target in mapping.items():
+        flows[name] = flows[target]
+    return flows
+
+
+def expand_node_results(df, mapping):
+    """Add a copy of the column of the remaining link for each removed link in `df`.
+
+    `df` has a column per node name, e.g. a table of node flows from a reduced model.
+    """
+    df = df.copy()
+    for name, target in mapping.items():
+        if target in df.columns:
+            df[name] = df[target]
+    return df
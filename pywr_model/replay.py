@@ -0,0 +1,153 @@
+import json
+import numpy as np
+import pandas
+from pywr.core import Model
+
+# Parameters whose values only depend on the time-step and their children.
+DATA_PARAMETER_CLASSES = (
+    'ConstantParameter',
+    'ConstantScenarioParameter',
+    'MonthlyProfileParameter',
+    'WeeklyProfileParameter',
+    'DailyProfileParameter',
+    'ScenarioMonthlyProfileParameter',
+    'UniformDrawdownProfileParameter',
+    'DataFrameParameter',
+    'TablesArrayParameter',
+    'ArrayIndexedParameter',
+    'AggregatedParameter',
+    'NegativeParameter',
+    'MaxParameter',
+    'MinParameter',
+)
+
+
+def find_data_parameters(model, exclude=()):
+    """Return the names of the parameters that do not depend on the model state or any variable.
+
+    A parameter is data-only if its class only depends on the time-step, it is not a
+    variable, it is not named in `exclude` (e.g. the bisection parameter) and all of its
+    children are data-only.
+    """
+    cache = {}
+
+    def is_data(param):
+        if param in cache:
+            return cache[param]
+        result = (
+            param.__class__.__name__ in DATA_PARAMETER_CLASSES
+            and not param.is_variable
+            and param.name not in exclude
+            and all(is_data(child) for child in param.children)
+        )
+        cache[param] = result
+        return result
+
+    return [p.name for p in model.parameters if p.name is not None and is_data(p)]
+
+
+def evaluate_trajectories(model, names):
+    """Evaluate the value of each named parameter for every time-step without solving the LP.
+
+    Returns a dict of `(nts, ncomb)` arrays.
+    """
+    if model.dirty:
+        model.setup()
+    model.reset()
+    params = [model.parameters[name] for name in names]
+    nts = len(model.timestepper)
+    ncomb = len(model.scenarios.combinations)
+    trajectories = {name: np.empty((nts, ncomb), np.float64) for name in names}
+
+    for timestep in model.timestepper:
+        model.timestep = timestep
+        model.before()
+        for name, param in zip(names, params):
+            trajectories[name][timestep.index, :] = param.get_all_values()
+    model.reset()
+    return trajectories
+
+
+def _references(obj, names):
+    """Return the subset of `names` that appear as a string anywhere in `obj`."""
+    found = set()
+    if isinstance(obj, str):
+        if obj in names:
+            found.add(obj)
+    elif isinstance(obj, dict):
+        for value in obj.values():
+            found |= _references(value, names)
+    elif isinstance(obj, (list, tuple)):
+        for value in obj:
+            found |= _references(value, names)
+    return found
+
+
+def patch_json_data_replay(data, model, exclude=()):
+    """Replace the data-only parameters of `data` with their precomputed trajectories.
+
+    Data-only parameters that are used by a node, recorder or a parameter that still
+    depends on the model state become `arrayindexed` parameters holding their full
+    trajectory. Data-only parameters only used by other data-only parameters are no
+    longer needed and are removed. Parameters that vary by scenario are left as they are.
+    """
+    names = [n for n in find_data_parameters(model, exclude=exclude) if n in data["parameters"]]
+    trajectories = evaluate_trajectories(model, names)
+    names = set(n for n in names if np.all(trajectories[n] == trajectories[n][:, :1]))
+
+    # Data-only parameters referenced by the nodes, recorders or the remaining parameters.
+    used = _references(data["nodes"], names) | _references(data.get("recorders", {}), names)
+    for name, param_data in data["parameters"].items():
+        if name not in names:
+            used |= _references(param_data, names)
+
+    for name in names:
+        if name in used:
+            data["parameters"][name] = {
+                "type": "arrayindexed",
+                "values": trajectories[name][:, 0].tolist(),
+            }
+        else:
+            data["parameters"].pop(name)
+
+    # The trajectories only apply to the time-steps they were evaluated on
+    data.setdefault("metadata", {})["replay_timestepper"] = {
+        "start": model.timestepper.start.strftime("%Y-%m-%d"),
+        "end": model.timestepper.end.strftime("%Y-%m-%d"),
+        "timestep": model.timestepper.delta,
+    }
+    return data
+
+
+def _timestepper_key(timestepper):
+    return (pandas.Timestamp(timestepper["start"]), pandas.Timestamp(timestepper["end"]),
+            str(timestepper.get("timestep", 1)))
+
+
+def check_replay_timestepper(data):
+    """Raise a ValueError if `data` replays trajectories evaluated on a different timestepper.
+
+    The `arrayindexed` parameters written by `patch_json_data_replay` hold one value per
+    time-step of the model they were evaluated on, so patches that change the timestepper
+    (e.g. `pywr_model.coarse.patch_json_data_coarse`) must be applied before the replay.
+    """
+    replayed = data.get("metadata", {}).get("replay_timestepper")
+    if replayed is not None and _timestepper_key(replayed) != _timestepper_key(data["timestepper"]):
+        raise ValueError(f'The model replays parameters evaluated with the timestepper {replayed}, not '
+                         f'{data["timestepper"]}; change the timestepper before the replay.')
+
+
+def patch_json_replay(input_fn, output_fn, exclude=("Demand Scaling Factor", )):
+    """Write a copy of the model in `input_fn` whose data-only parameters replay precomputed arrays.
+
+    The output should be written to the same directory as `input_fn` so that any relative
+    paths in the model still resolve.
+    """
+    with open(input_fn) as fh:
+        data = json.load(fh)
+
+    model = Model.load(input_fn)
+    data = patch_json_data_replay(data, model, exclude=exclude)
+
+    with open(output_fn, mode="w") as fh:
+        json.dump(data, fh, indent=2)
@@ -0,0 +1,150 @@
+import os
+import time
+import numpy as np
+import pandas
+from pywr.core import Model
+from pywr.utils.bisect import BisectionSearchModel
+
+
+class RunStatisticsMixin:
+    """Record where the wall time of each simulation is spent.
+
+    Every time-step is split in to the Python time spent calculating parameters
+    (`Model.before`), the time spent inside the solver (split again in to
+    updating and solving the LP using the solver's own statistics where it
+    provides them) and the Python time spent in recorders (`Model.after`).
+
+    Each call to `Model.run` (including every iteration of a bisection search) is
+    summarised in `simulation_statistics`. The per time-step timings of the most
+    recent simulation are kept in `timestep_statistics`. If `telemetry` is set to a
+    `scripts.telemetry.TelemetryWriter` each summary is also emitted as a `simulation`
+    event.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.telemetry = None
+        self.simulation_statistics = []
+        self.timestep_statistics = None
+        self._timings = None
+        self._simulation_start = None
+
+    def reset_statistics(self):
+        self.simulation_statistics = []
+        self.timestep_statistics = None
+
+    def run(self):
+        self.reset_statistics()
+        return super().run()
+
+    def _solver_times(self):
+        try:
+            stats = self.solver.stats
+        except AttributeError:
+            return None
+        return stats.get('total', 0.0), stats.get('lp_solve', 0.0)
+
+    def setup(self, *args, **kwargs):
+        super().setup(*args, **kwargs)
+        self._start_timings()
+
+    def reset(self, *args, **kwargs):
+        super().reset(*args, **kwargs)
+        self._start_timings()
+
+    def _start_timings(self):
+        self._timings = {
+            'python_parameters': [],
+            'lp_update': [],
+            'lp_solve': [],
+            'python_recorders': [],
+        }
+        self._simulation_start = time.perf_counter()
+
+    def before(self):
+        t0 = time.perf_counter()
+        super().before()
+        self._timings['python_parameters'].append(time.perf_counter() - t0)
+
+    def solve(self):
+        before = self._solver_times()
+        t0 = time.perf_counter()
+        ret = super().solve()
+        elapsed = time.perf_counter() - t0
+        after = self._solver_times()
+        if before is None or after is None:
+            # Solver does not report its internal timings
+            lp_solve = elapsed
+        else:
+            lp_solve = after[1] - before[1]
+        self._timings['lp_update'].append(max(elapsed - lp_solve, 0.0))
+        self._timings['lp_solve'].append(lp_solve)
+        return ret
+
+    def after(self):
+        t0 = time.perf_counter()
+        super().after()
+        self._timings['python_recorders'].append(time.perf_counter() - t0)
+
+    def finish(self):
+        ret = super().finish()
+        wall_time = time.perf_counter() - self._simulation_start
+
+        nts = len(self._timings['lp_solve'])
+        timings = {k: np.array(v[:nts]) for k, v in self._timings.items()}
+        self.timestep_statistics = pandas.DataFrame(timings, index=self.timestepper.datetime_index[:nts])
+
+        summary = {
+            'simulation': len(self.simulation_statistics),
+            'solver': self.solver.name,
+            'timesteps': nts,
+            'scenarios': len(self.scenarios.combinations),
+            'wall_time': wall_time,
+        }
+        for key, values in timings.items():
+            summary[key] = values.sum()
+        summary['other'] = wall_time - sum(summary[k] for k in timings.keys())
+        summary['feasible'] = all(not r.is_constraint_violated() for r in self.constraints)
+        bisect_parameter = getattr(self, 'bisect_parameter', None)
+        if bisect_parameter is not None:
+            summary['bisect_value'] = self.parameters[bisect_parameter].get_double_variables()[0]
+        self.simulation_statistics.append(summary)
+        if self.telemetry is not None:
+            self.telemetry.emit('simulation', **summary)
+        return ret
+
+    def statistics_to_dataframe(self):
+        """Return one row of timings per simulation performed since the last reset."""
+        return pandas.DataFrame(self.simulation_statistics).set_index('simulation')
+
+    def aggregated_statistics(self):
+        """Return the total timings across all simulations and the infeasible simulation count."""
+        df = self.statistics_to_dataframe()
+        data = {
+            'solver': self.solver.name,
+            'simulations': len(df),
+            'infeasible_simulations': int((~df['feasible']).sum()),
+        }
+        for key in ('wall_time', 'python_parameters', 'lp_update', 'lp_solve', 'python_recorders', 'other'):
+            data[key] = float(df[key].sum())
+        data['timesteps'] = int(df['timesteps'].sum())
+        data['time_per_timestep'] = data['wall_time'] / max(data['timesteps'], 1)
+        return data
+
+
+class StatisticsModel(RunStatisticsMixin, Model):
+    pass
+
+
+class StatisticsBisectionSearchModel(RunStatisticsMixin, BisectionSearchModel):
+    pass
+
+
+def write_statistics(model, csv_path):
+    """Write the per-simulation and per time-step statistics next to `csv_path`.
+
+    The per-simulation table is written to `csv_path` and the per time-step table of the
+    final simulation to the same path with a `_timesteps` suffix.
+    """
+    root, ext = os.path.splitext(str(csv_path))
+    model.statistics_to_dataframe().to_csv(csv_path)
+    model.timestep_statistics.to_csv(f'{root}_timesteps{ext}')
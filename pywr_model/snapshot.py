@@ -0,0 +1,255 @@
+import copy
+import time
+import warnings
+import numpy as np
+import pywr
+from pywr._component import Component
+from pywr.core import Model
+from pywr.model import ModelResult
+from pywr.utils.bisect import BisectionSearchModel
+
+
+def _inplace_array(component, attr):
+    """Return the array behind `component.attr` if writing to it updates the component.
+
+    Pywr exposes some of its per-scenario state as views (`np.asarray`) and some as
+    copies (`np.array`); only the former can be restored in place.
+    """
+    try:
+        a, b = getattr(component, attr), getattr(component, attr)
+    except AttributeError:
+        return None
+    if not isinstance(a, np.ndarray) or not np.shares_memory(a, b):
+        return None
+    return a
+
+
+def uncaptured_components(model):
+    """Return the names of the parameters and recorders of `model` whose state a snapshot can not restore.
+
+    A component keeps state between time-steps if it implements `after` (pywr's totals,
+    means and minimums, licences, rolling means, etc.). That state is only restored if
+    the component lists it in `_state_attributes` or, for recorders, if it is a 2-D
+    `data` array that can be written in place. The arrays of pywr's numpy recorders are
+    copies, so they are listed too: `ResumableMixin.recorder_data` stitches their data
+    together but anything aggregated from them only covers the resumed period.
+    """
+    names = []
+    for component in list(model.parameters) + list(model.recorders):
+        if getattr(component, '_state_attributes', None) is not None:
+            continue
+        owner = next(cls for cls in type(component).__mro__ if 'after' in cls.__dict__)
+        if owner is Component:
+            continue
+        if _inplace_array(component, 'data') is not None and component.data.ndim == 2:
+            continue
+        names.append(component.name)
+    return names
+
+
+class ModelSnapshot:
+    """The full state of a model at the end of a time-step.
+
+    The snapshot contains the storage volumes and flows of every node, the internal
+    buffers of any component that lists them in a `_state_attributes` tuple (e.g.
+    `ForecastCrossingIndexParameter._memory`) and the arrays of the recorders. A
+    model restored from the snapshot continues from the following time-step.
+
+    It is only valid to resume from a snapshot if none of the variables that affect
+    the model before the snapshot have changed since it was taken.
+
+    Capturing a model with components whose state can not be restored (see
+    `uncaptured_components`) raises a `TypeError` unless `allow_partial` is True, in
+    which case a warning is given.
+    """
+    def __init__(self, timestep_index, nodes, components, recorders):
+        self.timestep_index = timestep_index
+        self.nodes = nodes
+        self.components = components
+        self.recorders = recorders
+
+    @classmethod
+    def capture(cls, model, allow_partial=False):
+        uncaptured = uncaptured_components(model)
+        if uncaptured:
+            message = (f'The state of {len(uncaptured)} components can not be restored from a snapshot so their '
+                       f'results would only include the resumed period: {", ".join(sorted(uncaptured))}.')
+            if not allow_partial:
+                raise TypeError(message)
+            warnings.warn(message)
+
+        nodes = {}
+        for node in model.nodes:
+            state = {'flow': np.array(node.flow)}
+            for attr in ('volume', 'current_pc'):
+                if hasattr(node, attr):
+                    state[attr] = np.array(getattr(node, attr))
+            nodes[node.name] = state
+
+        components = {}
+        for component in list(model.parameters) + list(model.recorders):
+            attrs = getattr(component, '_state_attributes', None)
+            if attrs is None:
+                continue
+            components[component.name] = {attr: copy.copy(getattr(component, attr)) for attr in attrs}
+
+        recorders = {}
+        for recorder in model.recorders:
+            if getattr(recorder, '_state_attributes', None) is not None:
+                continue
+            data = getattr(recorder, 'data', None)
+            if isinstance(data, np.ndarray) and data.ndim == 2:
+                recorders[recorder.name] = np.array(data)
+
+        return cls(model.timestepper.current.index, nodes, components, recorders)
+
+    def restore(self, model):
+        """Restore the state of a freshly reset `model`.
+
+        Returns the names of the recorders whose arrays could not be written in place;
+        the time-steps before the snapshot are stitched back in to their output by
+        `ResumableMixin.recorder_data`.
+        """
+        timestep = model.timestepper.current
+
+        for node in model.nodes:
+            # The previous flow is taken from the current flow at the end of a time-step.
+            node.commit_all(self.nodes[node.name]['flow'])
+            node.after(timestep)
+
+        aggregated = []
+        for node in model.nodes:
+            state = self.nodes[node.name]
+            for attr in ('volume', 'current_pc'):
+                if attr not in state:
+                    continue
+                arr = _inplace_array(node, attr)
+                if arr is not None:
+                    arr[...] = state[attr]
+                elif hasattr(node, 'storage_nodes'):
+                    aggregated.append(node)
+                else:
+                    raise TypeError(f'The {attr} of node "{node.name}" can not be restored in place.')
+        for node in aggregated:
+            # Aggregated storage volumes are recalculated from their (restored) storage nodes.
+            node.after(timestep)
+
+        for name, state in self.components.items():
+            try:
+                component = model.parameters[name]
+            except KeyError:
+                component = model.recorders[name]
+            for attr, value in state.items():
+                current = getattr(component, attr)
+                if isinstance(current, np.ndarray):
+                    current[...] = value
+                else:
+                    setattr(component, attr, copy.copy(value))
+
+        not_restored = []
+        for name, data in self.recorders.items():
+            arr = _inplace_array(model.recorders[name], 'data')
+            if arr is None:
+                not_restored.append(name)
+            else:
+                arr[:self.timestep_index + 1, ...] = data[:self.timestep_index + 1, ...]
+        return not_restored
+
+
+class ResumableMixin:
+    """Take snapshots of the model state during a run and resume later runs from them.
+
+    Snapshots are taken at the end of the time-steps listed in `snapshot_timesteps` and
+    are stored in `snapshots` keyed by time-step index. Setting `resume_snapshot`
+    makes the following runs start from the snapshot instead of from the first
+    time-step.
+
+    Snapshots of models with components whose state can not be restored raise a
+    `TypeError` unless `allow_partial_snapshots` is True (see `ModelSnapshot`).
+    """
+    def __init__(self, *args, **kwargs):
+        self.snapshot_timesteps = set(kwargs.pop('snapshot_timesteps', []))
+        self.allow_partial_snapshots = kwargs.pop('allow_partial_snapshots', False)
+        super().__init__(*args, **kwargs)
+        self.snapshots = {}
+        self.resume_snapshot = None
+        self._not_restored = []
+
+    def after(self):
+        super().after()
+        index = self.timestepper.current.index
+        if index in self.snapshot_timesteps:
+            self.snapshots[index] = ModelSnapshot.capture(self, allow_partial=self.allow_partial_snapshots)
+
+    def run(self):
+        if self.resume_snapshot is None:
+            self._not_restored = []
+            return super().run()
+        return self._run_from(self.resume_snapshot)
+
+    def _run_from(self, snapshot):
+        # As `Model.run` but the time-steps up to the snapshot are restored instead of simulated
+        t0 = time.time()
+        timestep = None
+        try:
+            if self.dirty or self.timestepper.dirty:
+                self.setup()
+            else:
+                self.reset()
+            t1 = time.time()
+            for timestep in self.timestepper:
+                self.timestep = timestep
+                if timestep.index == snapshot.timestep_index:
+                    self._not_restored = snapshot.restore(self)
+                elif timestep.index > snapshot.timestep_index:
+                    self.before()
+                    self.solve()
+                    self.after()
+            t2 = time.time()
+        finally:
+            self.finish()
+        t3 = time.time()
+
+        if timestep is None:
+            raise RuntimeError("Nothing to run! Timestepper length is {}".format(len(self.timestepper)))
+
+        time_taken = t2 - t1
+        num_scenarios = len(self.scenarios.combinations)
+        try:
+            speed = ((timestep.index - snapshot.timestep_index) * num_scenarios) / time_taken
+        except ZeroDivisionError:
+            speed = float('nan')
+        return ModelResult(
+            num_scenarios=num_scenarios,
+            timestep=timestep,
+            time_taken=time_taken,
+            time_taken_before=self._time_before,
+            time_taken_after=self._time_after,
+            time_taken_with_overhead=t3 - t0,
+            speed=speed,
+            solver_name=self.solver.name,
+            solver_settings=self.solver.settings,
+            solver_stats=self.solver.stats,
+            version=pywr.__version__,
+        )
+
+    def recorder_data(self, name):
+        """Return the array of recorder `name` including any time-steps before the resumed snapshot."""
+        data = np.array(self.recorders[name].data)
+        if name in self._not_restored:
+            n = self.resume_snapshot.timestep_index + 1
+            data[:n, ...] = self.resume_snapshot.recorders[name][:n, ...]
+        return data
+
+
+class ResumableModel(ResumableMixin, Model):
+    pass
+
+
+class ResumableBisectionSearchModel(BisectionSearchModel, ResumableModel):
+    """A `BisectionSearchModel` whose bisection iterations resume from `resume_snapshot`.
+
+    `ResumableMixin` comes between `BisectionSearchModel` and `Model` in the MRO, so each
+    simulation of the bisection loop (its `super().run()`) takes or resumes from snapshots.
+    """
+    pass
@@ -0,0 +1,377 @@
+import json
+import sqlite3
+import zlib
+import numpy as np
+import pandas as pd
+
+CREATE_DB_SQL = """
+        CREATE TABLE IF NOT EXISTS solutions (
+            id INTEGER PRIMARY KEY,
+            ts TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            vars JSON,
+            objs JSON,
+            cons JSON,
+            metrics JSON,
+            profiles JSON,
+            stats JSON,
+            feasible INTEGER,
+            pareto INTEGER DEFAULT 0,
+            metrics_layout INTEGER REFERENCES layouts (id),
+            metrics_blob BLOB,
+            profiles_layout INTEGER REFERENCES layouts (id),
+            profiles_blob BLOB
+            );
+
+        CREATE TABLE IF NOT EXISTS layouts (
+            id INTEGER PRIMARY KEY,
+            kind TEXT,
+            definition JSON
+            );
+
+        CREATE TABLE IF NOT EXISTS objectives (
+            solution_id INTEGER REFERENCES solutions (id),
+            name TEXT,
+            value REAL,
+            score REAL
+            );
+
+        CREATE TABLE IF NOT EXISTS constraints (
+            solution_id INTEGER REFERENCES solutions (id),
+            name TEXT,
+            value REAL,
+            violated INTEGER
+            );
+    """
+
+CREATE_INDEX_SQL = """
+        CREATE INDEX IF NOT EXISTS solutions_feasible ON solutions (feasible);
+        CREATE INDEX IF NOT EXISTS solutions_pareto ON solutions (pareto);
+        CREATE INDEX IF NOT EXISTS objectives_name_score ON objectives (name, score);
+        CREATE INDEX IF NOT EXISTS objectives_solution ON objectives (solution_id);
+        CREATE INDEX IF NOT EXISTS constraints_name_value ON constraints (name, value);
+        CREATE INDEX IF NOT EXISTS constraints_solution ON constraints (solution_id);
+    """
+
+# Columns added to the solutions table since the original archive layout
+SOLUTIONS_COLUMNS = {
+    'stats': 'JSON',
+    'feasible': 'INTEGER',
+    'pareto': 'INTEGER DEFAULT 0',
+    'metrics_layout': 'INTEGER',
+    'metrics_blob': 'BLOB',
+    'profiles_layout': 'INTEGER',
+    'profiles_blob': 'BLOB',
+}
+
+
+def objective_score(value, direction):
+    """Return an objective value as a score to be minimised."""
+    if direction in ('max', 'maximise', 'maximize'):
+        return -value
+    return value
+
+
+def non_dominated(scores):
+    """Return a boolean mask of the non-dominated rows of the `(n, m)` array of scores.
+
+    The rows are sorted lexicographically so that a row can only be dominated by a row
+    before it; each row is then checked against the current front only.
+    """
+    scores = np.asarray(scores, dtype=np.float64)
+    mask = np.zeros(scores.shape[0], dtype=bool)
+    if scores.shape[0] == 0:
+        return mask
+    order = np.lexsort(scores.T[::-1])
+    front = np.empty((0, scores.shape[1]))
+    for i in order:
+        s = scores[i]
+        if front.shape[0] > 0 and np.any(np.all(front <= s, axis=1)):
+            # Dominated (or duplicated) by a member of the current front
+            continue
+        mask[i] = True
+        front = np.vstack([front, s])
+    return mask
+
+
+def pack_arrays(arrays, dtype, compression=None):
+    """Concatenate `arrays` in to a single typed (and optionally zlib compressed) blob."""
+    data = np.concatenate([np.asarray(a, dtype=dtype).ravel() for a in arrays]).tobytes()
+    if compression == 'zlib':
+        data = zlib.compress(data)
+    elif compression is not None:
+        raise ValueError(f'Unknown compression "{compression}".')
+    return data
+
+
+def unpack_rows(blobs, dtype, width, compression=None):
+    """Decode blobs created by `pack_arrays` with the same layout in to an `(n, width)` array."""
+    if compression == 'zlib':
+        blobs = [zlib.decompress(b) for b in blobs]
+    return np.frombuffer(b''.join(blobs), dtype=dtype).reshape(len(blobs), width)
+
+
+class Archive:
+    """A query layer over the MOEA archive database.
+
+    The objectives and constraints of every solution are stored in typed and indexed
+    tables as well as the JSON columns. The `pareto` flag of the feasible non-dominated
+    solutions is maintained incrementally as rows are inserted, so querying the front
+    does not require reading the whole archive.
+
+    With `binary` storage the metrics and daily profiles are stored as typed NumPy blobs
+    (optionally zlib compressed) instead of JSON. The names and sizes of the arrays are
+    the same for every solution of a run, so they are stored once in the `layouts`
+    table; `load_metrics` and `load_profiles` decode a whole archive in one pass.
+    """
+    def __init__(self, path, binary=True, dtype='float64', compression=None):
+        self.path = path
+        self.binary = binary
+        self.dtype = dtype
+        self.compression = compression
+        self._layouts = {}
+        with self.connect() as conn:
+            conn.executescript(CREATE_DB_SQL)
+            existing = [r[1] for r in conn.execute("PRAGMA table_info(solutions);")]
+            for column, column_type in SOLUTIONS_COLUMNS.items():
+                if column not in existing:
+                    conn.execute(f"ALTER TABLE solutions ADD COLUMN {column} {column_type};")
+            conn.executescript(CREATE_INDEX_SQL)
+
+    def connect(self):
+        return sqlite3.connect(str(self.path), timeout=60)
+
+    def insert(self, variables, objectives, constraints, metrics=None, profiles=None, stats=None):
+        """Insert a solution and update the Pareto front. Returns the new solution id.
+
+        `objectives` and `constraints` are the dicts created by `YWWrapper.objectives_to_dict`
+        and `YWWrapper.constraints_to_dict`.
+        """
+        feasible = not any(c['is_constraint_violated'] for c in constraints.values())
+        names = sorted(objectives.keys())
+        scores = np.array([objective_score(objectives[n]['value'], objectives[n]['direction']) for n in names])
+
+        conn = self.connect()
+        try:
+            # Lock the database so the front is updated consistently by concurrent evaluators
+            conn.execute("BEGIN IMMEDIATE;")
+            c = conn.execute(
+                "INSERT INTO solutions (vars, objs, cons, stats, feasible)"
+                " VALUES (?, ?, ?, ?, ?);",
+                [
+                    json.dumps(variables),
+                    json.dumps(objectives),
+                    json.dumps(constraints),
+                    json.dumps(stats),
+                    int(feasible),
+                ]
+            )
+            solution_id = c.lastrowid
+            if self.binary:
+                self._insert_arrays(conn, solution_id, metrics, profiles)
+            else:
+                conn.execute(
+                    "UPDATE solutions SET metrics = ?, profiles = ? WHERE id = ?;",
+                    (json.dumps(metrics), json.dumps(profiles), solution_id)
+                )
+            conn.executemany(
+                "INSERT INTO objectives (solution_id, name, value, score) VALUES (?, ?, ?, ?);",
+                [(solution_id, n, objectives[n]['value'], s) for n, s in zip(names, scores)]
+            )
+            conn.executemany(
+                "INSERT INTO constraints (solution_id, name, value, violated) VALUES (?, ?, ?, ?);",
+                [(solution_id, n, c['value'], int(c['is_constraint_violated'])) for n, c in constraints.items()]
+            )
+            if feasible:
+                self._update_front(conn, solution_id, names, scores)
+            conn.commit()
+        finally:
+            conn.close()
+        return solution_id
+
+    def _layout_id(self, conn, kind, definition):
+        key = json.dumps(definition)
+        try:
+            return self._layouts[(kind, key)]
+        except KeyError:
+            pass
+        row = conn.execute("SELECT id FROM layouts WHERE kind = ? AND definition = ?;", (kind, key)).fetchone()
+        if row is None:
+            layout_id = conn.execute("INSERT INTO layouts (kind, definition) VALUES (?, ?);", (kind, key)).lastrowid
+        else:
+            layout_id = row[0]
+        self._layouts[(kind, key)] = layout_id
+        return layout_id
+
+    def _insert_arrays(self, conn, solution_id, metrics, profiles):
+        if metrics:
+            names = list(metrics.keys())
+            definition = {
+                'names': names,
+                'types': [metrics[n]['type'] for n in names],
+                'dtype': self.dtype,
+                'compression': self.compression,
+            }
+            layout_id = self._layout_id(conn, 'metrics', definition)
+            blob = pack_arrays([[metrics[n]['value'] for n in names]], self.dtype, self.compression)
+            conn.execute("UPDATE solutions SET metrics_layout = ?, metrics_blob = ? WHERE id = ?;",
+                         (layout_id, blob, solution_id))
+        if profiles:
+            names = list(profiles.keys())
+            definition = {
+                'names': names,
+                'lengths': [len(profiles[n]) for n in names],
+                'dtype': self.dtype,
+                'compression': self.compression,
+            }
+            layout_id = self._layout_id(conn, 'profiles', definition)
+            blob = pack_arrays([profiles[n] for n in names], self.dtype, self.compression)
+            conn.execute("UPDATE solutions SET profiles_layout = ?, profiles_blob = ? WHERE id = ?;",
+                         (layout_id, blob, solution_id))
+
+    def _load_rows(self, kind, where="1"):
+        """Return a list of `(definition, ids, (n, width) array)` for each layout of `kind`.
+
+        Rows stored as JSON are returned with a `None` definition and a list of dicts.
+        """
+        with self.connect() as conn:
+            layouts = {i: json.loads(d) for i, d in
+                       conn.execute("SELECT id, definition FROM layouts WHERE kind = ?;", (kind, ))}
+            rows = conn.execute(
+                f"SELECT id, {kind}_layout, {kind}_blob, {kind} FROM solutions WHERE {where} ORDER BY id;"
+            ).fetchall()
+
+        groups = []
+        json_rows = [(r[0], json.loads(r[3])) for r in rows if r[1] is None and r[3] is not None]
+        if json_rows:
+            groups.append((None, [r[0] for r in json_rows], [r[1] for r in json_rows]))
+        for layout_id, definition in layouts.items():
+            selected = [r for r in rows if r[1] == layout_id]
+            if not selected:
+                continue
+            width = len(definition['names']) if kind == 'metrics' else sum(definition['lengths'])
+            data = unpack_rows([r[2] for r in selected], definition['dtype'], width, definition['compression'])
+            groups.append((definition, [r[0] for r in selected], data))
+        return groups
+
+    def load_metrics(self, where="1"):
+        """Return the metric values of every solution as a wide DataFrame indexed by solution id."""
+        dfs = []
+        for definition, ids, data in self._load_rows('metrics', where=where):
+            if definition is None:
+                data = {i: {n: m['value'] for n, m in d.items()} for i, d in zip(ids, data)}
+                dfs.append(pd.DataFrame.from_dict(data, orient='index'))
+            else:
+                dfs.append(pd.DataFrame(data, index=ids, columns=definition['names']))
+        if not dfs:
+            return pd.DataFrame()
+        return pd.concat(dfs).sort_index()
+
+    def load_profiles(self, where="1"):
+        """Return a dict of `(n_solutions, n_days)` DataFrames of the daily profiles indexed by solution id."""
+        profiles = {}
+        for definition, ids, data in self._load_rows('profiles', where=where):
+            if definition is None:
+                for name in data[0].keys():
+                    values = [d[name] for d in data]
+                    profiles.setdefault(name, []).append(pd.DataFrame(values, index=ids))
+                continue
+            offsets = np.cumsum([0] + definition['lengths'])
+            for name, start, end in zip(definition['names'], offsets[:-1], offsets[1:]):
+                profiles.setdefault(name, []).append(pd.DataFrame(data[:, start:end], index=ids))
+        return {name: pd.concat(dfs).sort_index() for name, dfs in profiles.items()}
+
+    def _scores(self, conn, names, where):
+        """Return the ids and `(n, m)` objective scores of the solutions matching `where`."""
+        columns = ", ".join(f"o{i}.score" for i in range(len(names)))
+        joins = " ".join(
+            f"JOIN objectives o{i} ON o{i}.solution_id = s.id AND o{i}.name = ?" for i in range(len(names))
+        )
+        rows = conn.execute(f"SELECT s.id, {columns} FROM solutions s {joins} WHERE {where};", names).fetchall()
+        if not rows:
+            return np.zeros(0, dtype=np.int64), np.zeros((0, len(names)))
+        rows = np.array(rows, dtype=np.float64)
+        return rows[:, 0].astype(np.int64), rows[:, 1:]
+
+    def _update_front(self, conn, solution_id, names, scores):
+        ids, front = self._scores(conn, names, "s.pareto = 1")
+        if front.shape[0] > 0 and np.any(np.all(front <= scores, axis=1)):
+            return  # Dominated by (or equal to) the current front
+        dominated = ids[np.all(scores <= front, axis=1) & np.any(scores < front, axis=1)]
+        conn.executemany("UPDATE solutions SET pareto = 0 WHERE id = ?;", [(int(i), ) for i in dominated])
+        conn.execute("UPDATE solutions SET pareto = 1 WHERE id = ?;", (solution_id, ))
+
+    def objective_names(self):
+        with self.connect() as conn:
+            return [r[0] for r in conn.execute("SELECT DISTINCT name FROM objectives ORDER BY name;")]
+
+    def rebuild(self):
+        """Rebuild the typed tables and the Pareto front from the JSON columns.
+
+        This is needed for archives written before the typed tables existed.
+        """
+        conn = self.connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE;")
+            conn.execute("DELETE FROM objectives;")
+            conn.execute("DELETE FROM constraints;")
+            for solution_id, objs, cons in conn.execute("SELECT id, objs, cons FROM solutions;").fetchall():
+                objs, cons = json.loads(objs), json.loads(cons)
+                conn.executemany(
+                    "INSERT INTO objectives (solution_id, name, value, score) VALUES (?, ?, ?, ?);",
+                    [(solution_id, n, o['value'], objective_score(o['value'], o['direction'])) for n, o in objs.items()]
+                )
+                conn.executemany(
+                    "INSERT INTO constraints (solution_id, name, value, violated) VALUES (?, ?, ?, ?);",
+                    [(solution_id, n, c['value'], int(c['is_constraint_violated'])) for n, c in cons.items()]
+                )
+                feasible = not any(c['is_constraint_violated'] for c in cons.values())
+                conn.execute("UPDATE solutions SET feasible = ? WHERE id = ?;", (int(feasible), solution_id))
+
+            names = [r[0] for r in conn.execute("SELECT DISTINCT name FROM objectives ORDER BY name;")]
+            ids, scores = self._scores(conn, names, "s.feasible = 1")
+            front = ids[non_dominated(scores)]
+            conn.execute("UPDATE solutions SET pareto = 0;")
+            conn.executemany("UPDATE solutions SET pareto = 1 WHERE id = ?;", [(int(i), ) for i in front])
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _objectives_frame(self, conn, where, params=(), order=""):
+        df = pd.read_sql_query(
+            f"SELECT s.id, o.name, o.value FROM solutions s JOIN objectives o ON o.solution_id = s.id"
+            f" WHERE {where} {order};", conn, params=params
+        )
+        return df.pivot(index='id', columns='name', values='value')
+
+    def pareto_front(self):
+        """Return the objective values of the feasible non-dominated solutions."""
+        with self.connect() as conn:
+            return self._objectives_frame(conn, "s.pareto = 1")
+
+    def feasible(self):
+        """Return the objective values of all feasible solutions."""
+        with self.connect() as conn:
+            return self._objectives_frame(conn, "s.feasible = 1")
+
+    def top_k(self, objective, k, feasible_only=True):
+        """Return the objective values of the `k` best solutions by `objective`."""
+        where = "name = ?"
+        if feasible_only:
+            where += " AND solution_id IN (SELECT id FROM solutions WHERE feasible = 1)"
+        with self.connect() as conn:
+            ids = [r[0] for r in conn.execute(
+                f"SELECT solution_id FROM objectives WHERE {where} ORDER BY score LIMIT ?;", (objective, k)
+            )]
+            placeholders = ", ".join("?" for _ in ids)
+            df = self._objectives_frame(conn, f"s.id IN ({placeholders})", ids)
+        return df.loc[ids]
+
+    def solutions(self, ids, columns=('vars', 'objs', 'cons')):
+        """Return the decoded JSON columns of the given solution ids."""
+        ids = [int(i) for i in ids]
+        placeholders = ", ".join("?" for _ in ids)
+        with self.connect() as conn:
+            rows = conn.execute(
+                f"SELECT id, {', '.join(columns)} FROM solutions WHERE id IN ({placeholders});", ids
+            ).fetchall()
+        return {r[0]: {c: json.loads(v) for c, v in zip(columns, r[1:])} for r in rows}
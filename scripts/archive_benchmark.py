@@ -0,0 +1,66 @@
+import os
+import time
+import numpy as np
+import pandas
+from scripts.archive import Archive
+
+LAYOUTS = {
+    'json': dict(binary=False),
+    'binary': dict(binary=True),
+    'binary-float32': dict(binary=True, dtype='float32'),
+    'binary-zlib': dict(binary=True, compression='zlib'),
+}
+
+
+def _random_solution(rng, n_metrics, n_days):
+    objectives = {
+        'Total Demand Recorder': {'value': rng.random(), 'type': 'AggregatedRecorder', 'direction': 'maximise'},
+        'Nidd Group total FDC Q01': {'value': rng.random(), 'type': 'FlowDurationCurveRecorder',
+                                     'direction': 'minimise'},
+    }
+    constraints = {
+        'Group TUBs Annual Count': {'value': 1.0, 'type': 'EventCountIndexParameterRecorder',
+                                    'is_constraint_violated': False},
+    }
+    metrics = {f'Recorder {i}': {'value': rng.random(), 'type': 'NumpyArrayNodeRecorder'} for i in range(n_metrics)}
+    profiles = {'Nidd Group line0 Recorder': rng.random(n_days).tolist()}
+    return {}, objectives, constraints, metrics, profiles
+
+
+def run(directory, csv_path, n_solutions=2000, n_metrics=190, n_days=366):
+    """Compare the size and load time of the JSON and binary archive layouts on a synthetic archive."""
+    rows = []
+    for name, kwargs in LAYOUTS.items():
+        path = os.path.join(directory, f'archive-benchmark-{name}.db')
+        if os.path.exists(path):
+            os.unlink(path)
+        archive = Archive(path, **kwargs)
+
+        rng = np.random.default_rng(0)
+        t0 = time.perf_counter()
+        for _ in range(n_solutions):
+            variables, objectives, constraints, metrics, profiles = _random_solution(rng, n_metrics, n_days)
+            archive.insert(variables, objectives, constraints, metrics=metrics, profiles=profiles)
+        write_time = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        metrics = archive.load_metrics()
+        profiles = archive.load_profiles()
+        load_time = time.perf_counter() - t0
+        assert metrics.shape == (n_solutions, n_metrics)
+        assert profiles['Nidd Group line0 Recorder'].shape == (n_solutions, n_days)
+
+        rows.append({
+            'layout': name,
+            'size_mb': os.path.getsize(path) / 1024**2,
+            'write_time': write_time,
+            'load_time': load_time,
+        })
+
+    df = pandas.DataFrame(rows).set_index('layout')
+    df.to_csv(csv_path)
+    return df
+
+
+if __name__ == "__main__":
+    print(run("working_directory/results", "working_directory/results/archive_benchmark.csv"))
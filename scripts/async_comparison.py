@@ -0,0 +1,128 @@
+import os
+import time
+import numpy as np
+import pandas
+import platypus
+from pywr.optimisation.platypus import PywrRandomGenerator
+from pywr_model.run_statistics import StatisticsBisectionSearchModel
+from scripts.async_moea import AsyncEpsMOEA, TimedJob, submit_job
+from scripts.moea_run import YWWrapper
+
+
+class TimedEvaluator(platypus.Evaluator):
+    """Wrap an evaluator to record the time spent evaluating each job on the workers."""
+    def __init__(self, evaluator):
+        super().__init__()
+        self.evaluator = evaluator
+        self.busy_time = 0.0
+
+    def evaluate_all(self, jobs, **kwargs):
+        results = self.evaluator.evaluate_all([TimedJob(job.solution) for job in jobs], **kwargs)
+        self.busy_time += sum(job.end - job.start for job in results)
+        return results
+
+    def submit(self, job):
+        # Used by the asynchronous MOEA, which records its own busy time
+        return submit_job(self.evaluator, job)
+
+    def close(self):
+        self.evaluator.close()
+
+
+class Trace:
+    """A callback recording the archive's objectives against wall clock time."""
+    def __init__(self):
+        self.t0 = time.perf_counter()
+        self.rows = []
+
+    def __call__(self, alg):
+        objectives = [list(s.objectives) for s in alg.archive if s.feasible]
+        self.rows.append((time.perf_counter() - self.t0, alg.nfe, objectives))
+
+
+def _hypervolume(objectives, directions, minimum, maximum):
+    if len(objectives) == 0:
+        return 0.0
+    problem = platypus.Problem(0, len(directions))
+    problem.directions[:] = directions
+    solutions = []
+    for values in objectives:
+        s = platypus.Solution(problem)
+        s.objectives[:] = values
+        s.constraint_violation = 0.0
+        s.evaluated = True
+        solutions.append(s)
+    return platypus.Hypervolume(minimum=minimum, maximum=maximum).calculate(solutions)
+
+
+def run(json_path, csv_path, evaluations, n_workers=None, population_size=128, epsilons=(0.1, 0.1)):
+    """Compare the generational and asynchronous MOEA modes on the same evaluation budget.
+
+    Both modes use a process pool of `n_workers` processes. The hypervolume of each
+    mode's archive is recorded against wall clock time and written to `csv_path`; the
+    wall time, core utilisation (busy time / (wall time x workers)) and final
+    hypervolume of each mode are written to `<root>_summary<ext>`. All hypervolumes are
+    normalised by the range of the feasible objectives found by either mode.
+    """
+    n_workers = n_workers if n_workers is not None else os.cpu_count()
+    traces = {}
+    summary = []
+    directions = None
+    for mode in ('generational', 'async'):
+        wrapper = YWWrapper(json_path, model_klass=StatisticsBisectionSearchModel)
+        directions = wrapper.problem.directions[:]
+        generator = PywrRandomGenerator(wrapper=wrapper, use_current=True)
+        evaluator = TimedEvaluator(platypus.ProcessPoolEvaluator(n_workers))
+        trace = Trace()
+
+        with evaluator:
+            if mode == 'generational':
+                algorithm = platypus.EpsNSGAII(wrapper.problem, evaluator=evaluator,
+                                               population_size=population_size, epsilons=list(epsilons),
+                                               generator=generator)
+                algorithm.run(evaluations, callback=trace)
+                busy_time = evaluator.busy_time
+            else:
+                algorithm = AsyncEpsMOEA(wrapper.problem, evaluator=evaluator, n_workers=n_workers,
+                                         population_size=population_size, epsilons=list(epsilons),
+                                         generator=generator, callback_frequency=n_workers)
+                algorithm.run(evaluations, callback=trace)
+                busy_time = algorithm.busy_time
+
+        wall_time = trace.rows[-1][0]
+        traces[mode] = trace.rows
+        summary.append({
+            'mode': mode,
+            'evaluations': algorithm.nfe,
+            'wall_time': wall_time,
+            'utilisation': busy_time / (wall_time * n_workers),
+            'evaluations_per_second': algorithm.nfe / wall_time,
+        })
+
+    values = np.array([o for rows in traces.values() for _, _, objectives in rows for o in objectives])
+    if values.size == 0:
+        values = np.zeros((1, len(directions)))
+    minimum, maximum = values.min(axis=0), values.max(axis=0)
+    maximum = np.where(maximum > minimum, maximum, minimum + 1.0)
+
+    rows = []
+    for mode, trace in traces.items():
+        for elapsed, nfe, objectives in trace:
+            rows.append({
+                'mode': mode,
+                'wall_time': elapsed,
+                'nfe': nfe,
+                'hypervolume': _hypervolume(objectives, directions, minimum, maximum),
+            })
+    trace = pandas.DataFrame(rows)
+    trace.to_csv(csv_path, index=False)
+
+    summary = pandas.DataFrame(summary).set_index('mode')
+    summary['hypervolume'] = trace.groupby('mode')['hypervolume'].last()
+    root, ext = os.path.splitext(csv_path)
+    summary.to_csv(f'{root}_summary{ext}')
+    return summary, trace
+
+
+if __name__ == "__main__":
+    print(run("working_directory/inputs/run_MOEA.json", "working_directory/results/async_comparison.csv", 2048)[0])
@@ -0,0 +1,145 @@
+import concurrent.futures
+import gc
+import os
+import random
+import time
+import platypus
+from platypus.evaluator import run_job
+
+
+class TimedJob(platypus.Job):
+    """Evaluate a solution, recording when the evaluation started and finished on the worker."""
+    def __init__(self, solution):
+        super().__init__()
+        self.solution = solution
+        self.start = None
+        self.end = None
+
+    def run(self):
+        self.start = time.time()
+        self.solution.evaluate()
+        self.end = time.time()
+
+
+def submit_job(evaluator, job):
+    """Submit a single job to `evaluator` and return a `concurrent.futures.Future` of the evaluated job.
+
+    Evaluators with a `submit` method (e.g. `scripts.distributed.SocketEvaluator`) and
+    platypus' submit-function evaluators (e.g. `ProcessPoolEvaluator`) run the job
+    asynchronously; any other evaluator runs it before returning.
+    """
+    if hasattr(evaluator, 'submit'):
+        return evaluator.submit(job)
+    if hasattr(evaluator, 'submit_func'):
+        return evaluator.submit_func(run_job, job)
+    future = concurrent.futures.Future()
+    future.set_result(evaluator.evaluate_all([job])[0])
+    return future
+
+
+class AsyncEpsMOEA(platypus.EpsMOEA):
+    """A steady-state ε-MOEA without generation barriers.
+
+    Up to `n_workers` evaluations are kept in flight. As soon as any evaluation completes
+    its solution is added to the population and the ε-archive, and a new offspring is
+    bred from the current population and archive and submitted in its place. A slow
+    evaluation therefore only occupies its own worker rather than holding up a whole
+    generation.
+
+    `callback` is called every `callback_frequency` evaluations (default: the population
+    size), so callbacks written for the generational algorithms (e.g.
+    `scripts.progress.ProgressCallback`) can be used unchanged. `busy_time` is the total
+    time spent evaluating on the workers.
+
+    The run stops submitting new evaluations once the termination condition is met and
+    then waits for the evaluations in flight.
+
+    Evaluators that run jobs asynchronously (e.g. platypus' `ProcessPoolEvaluator`) wait
+    for results on their own threads, which can trigger a garbage collection. GLPK aborts
+    if a pywr model is freed on a different thread to the one that built it, so `run`
+    collects the models that are no longer referenced before submitting any evaluations.
+    """
+    def __init__(self, problem, epsilons, population_size=100, n_workers=None, callback_frequency=None, **kwargs):
+        super().__init__(problem, epsilons, population_size=population_size, **kwargs)
+        self.n_workers = n_workers if n_workers is not None else os.cpu_count()
+        self.callback_frequency = callback_frequency if callback_frequency is not None else population_size
+        self.busy_time = 0.0
+        self.wall_time = 0.0
+
+    def _next_solution(self, submitted):
+        if submitted < self.population_size or len(self.population) < 2:
+            return self.generator.generate(self.problem)
+
+        if len(self.archive) <= 1:
+            parents = self.selector.select(self.variator.arity, self.population)
+        else:
+            parents = self.selector.select(self.variator.arity - 1, self.population) + [random.choice(self.archive)]
+        random.shuffle(parents)
+        # The variator may breed several children; only the first is used to keep the loop steady-state.
+        return self.variator.evolve(parents)[0]
+
+    def _add(self, solution):
+        if len(self.population) < self.population_size:
+            self.population.append(solution)
+        else:
+            self._add_to_population(solution)
+        self.archive.add(solution)
+
+    def run(self, condition, callback=None):
+        """Run until `condition` (a maximum number of evaluations or a `TerminationCondition`) is met."""
+        max_evaluations = condition if isinstance(condition, int) else None
+        if max_evaluations is None:
+            condition.initialize(self)
+        if self.variator is None:
+            self.variator = platypus.PlatypusConfig.default_variator(self.problem)
+        if not hasattr(self, 'population'):
+            self.population = []
+
+        gc.collect()
+        t0 = time.perf_counter()
+        pending = {}
+        submitted = 0
+        last_callback = self.nfe
+
+        def stopped():
+            if max_evaluations is not None:
+                # Evaluations in flight count towards the budget
+                return submitted >= max_evaluations
+            return condition(self)
+
+        def submit():
+            nonlocal submitted
+            solution = self._next_solution(submitted)
+            pending[submit_job(self.evaluator, TimedJob(solution))] = solution
+            submitted += 1
+
+        while submitted < self.n_workers and not stopped():
+            submit()
+
+        while pending:
+            done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                solution = pending.pop(future)
+                job = future.result()
+                if job.solution is not solution:
+                    # Copy the results back so that the worker's copy of the problem is not kept
+                    solution.variables[:] = job.solution.variables[:]
+                    solution.objectives[:] = job.solution.objectives[:]
+                    solution.constraints[:] = job.solution.constraints[:]
+                    solution.constraint_violation = job.solution.constraint_violation
+                    solution.feasible = job.solution.feasible
+                    solution.evaluated = job.solution.evaluated
+                if job.start is not None:
+                    # Jobs that were not run (e.g. screened out by a surrogate) take no time
+                    self.busy_time += job.end - job.start
+                self.nfe += 1
+                self._add(solution)
+
+                if not stopped():
+                    submit()
+
+            self.result = self.archive
+            self.wall_time = time.perf_counter() - t0
+            if callback is not None and (self.nfe - last_callback >= self.callback_frequency or not pending):
+                callback(self)
+                last_callback = self.nfe
@@ -0,0 +1,291 @@
+import argparse
+import concurrent.futures
+import gc
+import itertools
+import logging
+import multiprocessing
+import multiprocessing.connection
+import os
+import pickle
+import queue
+import secrets
+import socket
+import threading
+import time
+import traceback
+import platypus
+
+logger = logging.getLogger(__name__)
+
+# Errors that mean the other end of a connection has gone
+CONNECTION_ERRORS = (OSError, EOFError, pickle.UnpicklingError)
+
+
+def _authkey_bytes(authkey):
+    return authkey.encode('utf-8') if isinstance(authkey, str) else authkey
+
+
+class SocketEvaluator(platypus.Evaluator):
+    """A platypus evaluator that distributes jobs to worker processes over TCP.
+
+    Workers (see `run_worker`) connect to the coordinator and are sent one job at a time,
+    so faster workers simply complete more jobs. Each worker process keeps its model
+    resident between jobs (pywr caches it by the wrapper's uid). If a worker disconnects,
+    or does not reply within `job_timeout` seconds, its job is re-queued for another
+    worker. If no worker is connected for `worker_timeout` seconds while jobs are
+    pending, the pending jobs fail with a `RuntimeError` instead of waiting forever.
+
+    Workers do not write to the archive; their archive rows are returned with the
+    evaluated job and inserted in to `archive` by the coordinator.
+
+    Besides `evaluate_all`, single jobs can be submitted with `submit`, which returns a
+    `concurrent.futures.Future` of the evaluated job.
+
+    Every connection must prove it knows `authkey` (the HMAC challenge of
+    `multiprocessing.connection`) before any message is unpickled. A random key is
+    generated if none is given; workers on other hosts must be given `authkey`. The
+    coordinator only listens on `localhost` unless another `host` is given.
+
+    GLPK aborts if a pywr model is freed on a different thread to the one that built it,
+    and the coordinator's threads can trigger a garbage collection. The evaluator should
+    be created and closed on the thread that builds the models, and collects the models
+    that are no longer referenced when it is; models must stay referenced while it runs.
+    """
+    def __init__(self, host='localhost', port=5555, authkey=None, job_timeout=None, worker_timeout=60,
+                 archive=None):
+        super().__init__()
+        self.authkey = authkey if authkey else secrets.token_hex(16)
+        self.job_timeout = job_timeout
+        self.worker_timeout = worker_timeout
+        self.archive = archive
+        self.workers = {}
+        self._ids = itertools.count()
+        self._jobs = queue.Queue()
+        self._futures = {}
+        self._lock = threading.Lock()
+        self._connected = 0
+        self._closed = threading.Event()
+        self._listener = multiprocessing.connection.Listener((host, port), family='AF_INET')
+        self.address = self._listener.address
+        gc.collect()
+        threading.Thread(target=self._accept, daemon=True).start()
+        threading.Thread(target=self._watch, daemon=True).start()
+
+    def _accept(self):
+        listener = self._listener
+        while not self._closed.is_set():
+            try:
+                conn = listener.accept()
+                address = listener.last_accepted
+            except OSError:
+                break  # The listener has been closed
+            threading.Thread(target=self._serve, args=(conn, address), daemon=True).start()
+
+    def _authenticate(self, conn):
+        # The same handshake as `Listener(authkey=...)`, but in the connection's own thread so
+        # that a client that never answers can not hold up other connections.
+        authkey = _authkey_bytes(self.authkey)
+        try:
+            multiprocessing.connection.deliver_challenge(conn, authkey)
+            multiprocessing.connection.answer_challenge(conn, authkey)
+            kind, name = conn.recv()
+        except (multiprocessing.AuthenticationError, ValueError, TypeError) + CONNECTION_ERRORS:
+            return None
+        return name if kind == 'hello' else None
+
+    def _serve(self, conn, address):
+        name = self._authenticate(conn)
+        if name is None:
+            logger.warning(f'Rejected connection from {address[0]}:{address[1]}.')
+            conn.close()
+            return
+
+        name = f'{name}@{address[0]}:{address[1]}'
+        stats = {'jobs': 0, 'busy_time': 0.0, 'lost_jobs': 0, 'connected': time.time(), 'disconnected': None}
+        self.workers[name] = stats
+        with self._lock:
+            self._connected += 1
+        logger.info(f'Worker {name} connected.')
+
+        while not self._closed.is_set():
+            try:
+                job_id, job = self._jobs.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            t0 = time.perf_counter()
+            try:
+                conn.send(('job', job_id, job))
+                if not conn.poll(self.job_timeout):
+                    raise TimeoutError(f'No reply within {self.job_timeout} seconds.')
+                reply = conn.recv()
+            except CONNECTION_ERRORS:
+                logger.warning(f'Worker {name} lost; re-queueing its job.')
+                stats['lost_jobs'] += 1
+                self._jobs.put((job_id, job))
+                break
+            stats['busy_time'] += time.perf_counter() - t0
+            with self._lock:
+                future = self._futures.pop(job_id, None)
+            if future is None:
+                continue  # The job has already failed (see `_watch`)
+            if reply[0] == 'result':
+                stats['jobs'] += 1
+                _, _, job, row = reply
+                if row is not None and self.archive is not None:
+                    self.archive.insert(**row)
+                future.set_result(job)
+            else:
+                future.set_exception(RuntimeError(f'Evaluation failed on a worker:\n{reply[2]}'))
+        else:
+            try:
+                conn.send(('stop', ))
+            except OSError:
+                pass
+
+        stats['disconnected'] = time.time()
+        with self._lock:
+            self._connected -= 1
+        conn.close()
+
+    def _watch(self):
+        # Fail the pending jobs once no worker has been connected for `worker_timeout` seconds
+        idle_since = None
+        while not self._closed.wait(0.5):
+            with self._lock:
+                waiting = self._connected == 0 and len(self._futures) > 0
+            if not waiting or self.worker_timeout is None:
+                idle_since = None
+            elif idle_since is None:
+                idle_since = time.monotonic()
+            elif time.monotonic() - idle_since > self.worker_timeout:
+                self._fail_pending(RuntimeError(f'No workers have been connected for {self.worker_timeout} '
+                                                f'seconds.'))
+                idle_since = None
+
+    def _fail_pending(self, error):
+        while True:
+            try:
+                self._jobs.get_nowait()
+            except queue.Empty:
+                break
+        with self._lock:
+            futures, self._futures = self._futures, {}
+        for future in futures.values():
+            future.set_exception(error)
+
+    def submit(self, job):
+        job_id = next(self._ids)
+        future = concurrent.futures.Future()
+        with self._lock:
+            self._futures[job_id] = future
+        self._jobs.put((job_id, job))
+        return future
+
+    def evaluate_all(self, jobs, **kwargs):
+        futures = [self.submit(job) for job in jobs]
+        return [f.result() for f in futures]
+
+    def close(self):
+        self._closed.set()
+        self._listener.close()
+        self._fail_pending(RuntimeError('The evaluator has been closed.'))
+        gc.collect()
+
+
+def run_worker(host, port, authkey, name=None, delay=0.0, connect_timeout=60):
+    """Connect to a `SocketEvaluator` and evaluate jobs until told to stop.
+
+    `delay` adds a pause to every job to emulate a slower host when testing.
+    """
+    if name is None:
+        name = f'{socket.gethostname()}-{os.getpid()}'
+
+    t0 = time.time()
+    while True:
+        try:
+            conn = multiprocessing.connection.Client((host, port), family='AF_INET',
+                                                     authkey=_authkey_bytes(authkey))
+            break
+        except OSError:
+            if time.time() - t0 > connect_timeout:
+                raise
+            time.sleep(0.5)
+
+    conn.send(('hello', name))
+    while True:
+        try:
+            message = conn.recv()
+        except CONNECTION_ERRORS:
+            break
+        if message[0] == 'stop':
+            break
+        _, job_id, job = message
+        try:
+            wrapper = getattr(job.solution.problem, 'wrapper', None)
+            if wrapper is not None:
+                wrapper.archive = None
+            job.run()
+            time.sleep(delay)
+            # Only rows of wrappers with an archive (e.g. not a coarse screening model) are stored
+            row = getattr(wrapper, 'last_archive_row', None) if getattr(wrapper, 'archive_fn', None) else None
+            reply = ('result', job_id, job, row)
+        except Exception:
+            reply = ('error', job_id, traceback.format_exc())
+        try:
+            conn.send(reply)
+        except CONNECTION_ERRORS:
+            break  # The coordinator has gone
+        except Exception:
+            # The result could not be pickled; nothing has been sent so send the error instead
+            try:
+                conn.send(('error', job_id, traceback.format_exc()))
+            except CONNECTION_ERRORS:
+                break
+    conn.close()
+
+
+class LocalCluster:
+    """Start worker processes on this machine for a `SocketEvaluator`.
+
+    This is a stand-in for a multi-host setup for testing on localhost; `delays` gives
+    each worker a different speed and `kill` emulates the loss of a worker.
+    """
+    def __init__(self, evaluator, n_workers, delays=None):
+        self.evaluator = evaluator
+        self.n_workers = n_workers
+        self.delays = delays if delays is not None else [0.0] * n_workers
+        self.processes = []
+
+    def __enter__(self):
+        port = self.evaluator.address[1]
+        for i in range(self.n_workers):
+            p = multiprocessing.Process(target=run_worker, args=('127.0.0.1', port, self.evaluator.authkey),
+                                        kwargs={'name': f'local{i}', 'delay': self.delays[i]}, daemon=True)
+            p.start()
+            self.processes.append(p)
+        return self
+
+    def kill(self, i):
+        self.processes[i].kill()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        for p in self.processes:
+            p.join(timeout=5)
+            if p.is_alive():
+                p.terminate()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run an MOEA evaluation worker.")
+    parser.add_argument("host")
+    parser.add_argument("port", type=int)
+    parser.add_argument("--authkey", required=True, help="The authkey of the coordinator.")
+    parser.add_argument("--workers", type=int, default=1, help="Number of worker processes to start.")
+    args = parser.parse_args()
+
+    processes = [multiprocessing.Process(target=run_worker, args=(args.host, args.port, args.authkey))
+                 for _ in range(args.workers)]
+    for p in processes:
+        p.start()
+    for p in processes:
+        p.join()
@@ -1,15 +1,56 @@
-from pywr.utils.bisect import BisectionSearchModel
+import os
 from pywr_model import patch_model
+from pywr_model.aggregation_recorders import PeriodStatisticsRecorderMixin, aggregated_dataframe
+from pywr_model.deployable_output import StatisticsVectorBisectionSearchModel, deployable_output_distribution, \
+    deployable_output_table
+from pywr_model.lp_updates import FIXED_ONCE_SOLVER_ARGS
+from pywr_model.memory_budget import write_memory_budget
+from pywr_model.patches import compact_index_dtype, patch_options, write_patched_json
+from pywr_model.run_statistics import StatisticsBisectionSearchModel, write_statistics
+from scripts.telemetry import TelemetryAggregator, TelemetryWriter
 import pandas
 
-def run(json_path, csv_path, output_csv_path):
-    model = BisectionSearchModel.load(json_path, solver='glpk-edge')
-    patch_model(model)
+def run(json_path, csv_path, output_csv_path, solver='glpk-edge', stats_csv_path=None, patches=(),
+        fixed_once=False, telemetry=None, memory_limit=None):
+    # patches: the `pywr_model.patches.PATCHES` to apply to the model (e.g. ['reduce', 'replay']);
+    # the patched model is written next to the outputs. With 'vector' the DO of each scenario
+    # combination is searched for in one ensemble run (see
+    # pywr_model.deployable_output.VectorBisectionSearchModel); output_csv_path is then the
+    # per-scenario DO table and its distribution is written with a _distribution suffix
+    options = patch_options(patches)
+    aggregate = 'aggregate' in options
+    vector = 'vector' in options
+    index_dtype = compact_index_dtype(patches)
+    json_path = write_patched_json(json_path, os.path.dirname(csv_path), patches)
+    model_klass = StatisticsVectorBisectionSearchModel if vector else StatisticsBisectionSearchModel
+
+    # Only update the LP bounds and costs that can change every time-step
+    solver_args = FIXED_ONCE_SOLVER_ARGS if fixed_once else {}
+    model = model_klass.load(json_path, solver=solver, solver_args=solver_args)
+    patch_model(model, index_dtype=index_dtype)
+
+    if memory_limit is not None:
+        # Warn before the run if the recorders would allocate more than `memory_limit` bytes
+        root, ext = os.path.splitext(csv_path)
+        write_memory_budget(model, f'{root}_memory{ext}', limit=memory_limit)
 
     model.bisect_epsilon = 0.0025
     model.bisect_parameter = "Demand Scaling Factor"
 
-    stats = model.run()
+    if telemetry:
+        # Emit an event per bisection iteration and keep a rolling summary next to the outputs
+        root, ext = os.path.splitext(csv_path)
+        telemetry_path = f'{root}_telemetry.jsonl'
+        if os.path.exists(telemetry_path):
+            os.unlink(telemetry_path)
+        model.telemetry = TelemetryWriter(telemetry_path)
+        aggregator = TelemetryAggregator(telemetry_path, status_path=f'{root}_telemetry_status.json',
+                                         **(telemetry if isinstance(telemetry, dict) else {}))
+        with aggregator:
+            stats = model.run()
+        model.telemetry.close()
+    else:
+        stats = model.run()
 
     names = ["TUBS count", "NEUBs count", "Total Demand", "Total Cost",
              "DO Scaling Factor"]
@@ -19,11 +60,21 @@ def run(json_path, csv_path, output_csv_path):
               model.recorders['Total Cost Recorder'].aggregated_value(),
               model.parameters[model.bisect_parameter].get_double_variables()[0]
               ]
-    do_df = pandas.DataFrame()
-    do_df['item'] = names
-    do_df['value'] = values
-    do_df.index = do_df.item
-    do_df.drop(columns =['item'],inplace=True)
+    if vector:
+        do_df = deployable_output_table(model, recorders={
+            "TUBS count": 'Group TUBs Annual Count',
+            "NEUBs count": 'Group NEUBs Annual Count',
+            "Total Demand": 'Total Demand Recorder',
+            "Total Cost": 'Total Cost Recorder',
+        })
+        root, ext = os.path.splitext(output_csv_path)
+        deployable_output_distribution(do_df).to_csv(f'{root}_distribution{ext}')
+    else:
+        do_df = pandas.DataFrame()
+        do_df['item'] = names
+        do_df['value'] = values
+        do_df.index = do_df.item
+        do_df.drop(columns =['item'],inplace=True)
 
     do_values = {}
     for name, value in zip(names, values):
@@ -31,6 +82,8 @@ def run(json_path, csv_path, output_csv_path):
 
     dfs = {}
     for rec in model.recorders:
+        if isinstance(rec, PeriodStatisticsRecorderMixin):
+            continue
         if hasattr(rec, 'to_dataframe'):
             df = rec.to_dataframe()
             if isinstance(df.index, pandas.PeriodIndex):
@@ -39,5 +92,15 @@ def run(json_path, csv_path, output_csv_path):
     dfs = pandas.concat(dfs, axis=1)
     dfs.columns.set_names('Recorder', level=0, inplace=True)
 
-    dfs.to_csv(csv_path)
+    if aggregate:
+        # The period statistics replace the daily outputs; the remaining daily series are
+        # written alongside
+        root, ext = os.path.splitext(csv_path)
+        aggregated_dataframe(model).to_csv(csv_path)
+        dfs.to_csv(f'{root}_daily{ext}')
+    else:
+        dfs.to_csv(csv_path)
     do_df.to_csv(output_csv_path)
+
+    if stats_csv_path is not None:
+        write_statistics(model, stats_csv_path)
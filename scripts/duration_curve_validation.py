@@ -0,0 +1,102 @@
+import json
+import os
+import numpy as np
+import pandas
+from pywr.core import Model
+from pywr_model.duration_curves import QuantileSketch, SKETCH, patch_json_data_duration_curves, \
+    percentiles_from_sorted
+
+PERCENTILES = [0, 1, 5, 10, 25, 50, 75, 90, 95, 99, 100]
+
+
+def _curves(model):
+    return {r.name: r.to_dataframe().values for r in model.recorders if r.__class__.__name__.endswith('CurveRecorder')}
+
+
+def _load(json_path, data):
+    # Load from the directory of `json_path` so that relative paths in the model resolve
+    return Model.load(data, path=os.path.dirname(os.path.abspath(json_path)))
+
+
+def _errors(exact, estimate, scale):
+    error = np.abs(estimate - exact)
+    return {'max_abs_error': float(error.max()), 'max_rel_error': float(error.max() / scale) if scale > 0 else 0.0}
+
+
+def _rank_error(ordered, estimate):
+    # The largest difference between the requested percentile and that of the estimate
+    error = 0.0
+    for j in range(ordered.shape[1]):
+        rank = np.searchsorted(ordered[:, j], estimate[:, j]) / (ordered.shape[0] - 1)
+        error = max(error, float(np.max(np.abs(np.minimum(rank, 1.0) - np.array(PERCENTILES) / 100))))
+    return error
+
+
+def validate_model(json_path, sketch_sizes=(64, 256, 1024)):
+    """Compare the duration curves of the model in `json_path` in each mode of the shared engine.
+
+    The model is run with pywr's own duration curve recorders, the shared engine in exact
+    mode and the shared engine in sketch mode with each of `sketch_sizes`. Returns a
+    DataFrame of the maximum absolute error of each recorder and mode against pywr's
+    recorders, and that error relative to the range of the curve.
+    """
+    with open(json_path) as fh:
+        data = json.load(fh)
+
+    model = _load(json_path, data)
+    model.run()
+    reference = _curves(model)
+
+    modes = [('exact', {})] + [(f'sketch {size}', {'mode': SKETCH, 'sketch_size': size}) for size in sketch_sizes]
+    rows = []
+    for label, options in modes:
+        model = _load(json_path, patch_json_data_duration_curves(json.loads(json.dumps(data)), **options))
+        model.run()
+        for name, curve in _curves(model).items():
+            scale = np.ptp(reference[name])
+            rows.append({'recorder': name, 'mode': label, **_errors(reference[name], curve, scale)})
+    return pandas.DataFrame(rows).set_index(['recorder', 'mode'])
+
+
+def validate_synthetic(lengths=(3650, 36500, 365000), sketch_sizes=(64, 256, 1024), ncomb=10, seed=0):
+    """Compare the sketch with the exact percentiles of long synthetic stochastic flow series.
+
+    The series are autocorrelated lognormal flows with a seasonal cycle, i.e. the kind of
+    many-decade stochastic inputs the sketch is meant for. Returns a DataFrame of the
+    maximum absolute and relative (to the flow range) error over `PERCENTILES`, the
+    maximum error in the percentile of the estimates (the guarantee a sketch gives; the
+    value error of the extreme percentiles of a heavy-tailed series is much larger) and
+    the bytes kept by the sketch against those of the full series.
+    """
+    rng = np.random.default_rng(seed)
+    rows = []
+    for nts in lengths:
+        noise = rng.standard_normal((nts, ncomb))
+        log_flow = np.empty_like(noise)
+        log_flow[0] = noise[0]
+        for i in range(1, nts):
+            log_flow[i] = 0.9 * log_flow[i - 1] + np.sqrt(1 - 0.9**2) * noise[i]
+        season = np.sin(2 * np.pi * np.arange(nts) / 365.25)[:, np.newaxis]
+        flow = np.exp(log_flow + season)
+
+        ordered = np.sort(flow, axis=0)
+        exact = percentiles_from_sorted(ordered, PERCENTILES)
+        for size in sketch_sizes:
+            sketch = QuantileSketch(ncomb, size)
+            for row in flow:
+                sketch.add(row)
+            estimate = sketch.percentiles(PERCENTILES)
+            rows.append({
+                'length': nts,
+                'sketch_size': size,
+                **_errors(exact, estimate, np.ptp(flow)),
+                'max_rank_error': _rank_error(ordered, estimate),
+                'sketch_bytes': sketch.nbytes,
+                'exact_bytes': flow.nbytes,
+            })
+    return pandas.DataFrame(rows).set_index(['length', 'sketch_size'])
+
+
+if __name__ == "__main__":
+    print(validate_model("working_directory/inputs/run.json"))
+    print(validate_synthetic())
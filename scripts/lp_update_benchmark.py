@@ -0,0 +1,59 @@
+import pandas
+from pywr_model.lp_updates import FIXED_ONCE_SOLVER_ARGS, UpdateAuditModel
+from pywr_model.run_statistics import StatisticsModel
+
+
+def _run(json_path, solver, solver_args):
+    model = StatisticsModel.load(json_path, solver=solver, solver_args=solver_args)
+    model.run()
+    return model.aggregated_statistics()
+
+
+def run(json_path, csv_path, solver='glpk-edge', repeats=3):
+    """Benchmark the time spent updating the LP with and without `FIXED_ONCE_SOLVER_ARGS`.
+
+    The model is run with the solver's default updates and with `FIXED_ONCE_SOLVER_ARGS`,
+    which writes the bounds and costs that cannot change once per simulation. Each mode
+    is then run once with `UpdateAuditModel`; the audit tables (written next to
+    `csv_path`) count the updates the solver skipped and, of those it made, how many
+    repeated the previous time-step's value. Only the `fixed_once` updates are skipped;
+    the unchanged updates are still written to the LP.
+    """
+    rows = []
+    for repeat in range(repeats):
+        for mode, solver_args in (('default', {}), ('fixed_once', FIXED_ONCE_SOLVER_ARGS)):
+            row = _run(json_path, solver, solver_args)
+            row['mode'] = mode
+            row['repeat'] = repeat
+            rows.append(row)
+
+    df = pandas.DataFrame(rows).set_index(['mode', 'repeat'])
+    df.to_csv(csv_path)
+    means = df.groupby(level='mode').mean(numeric_only=True)
+
+    audits = {}
+    for mode, solver_args in (('default', {}), ('fixed_once', FIXED_ONCE_SOLVER_ARGS)):
+        model = UpdateAuditModel.load(json_path, solver=solver, solver_args=solver_args)
+        model.run()
+        audits[mode] = model.update_statistics()
+    audit = pandas.concat(audits, names=['mode', 'kind'])
+    audit.to_csv(csv_path.replace('.csv', '_audit.csv'))
+
+    fixed_once = audits['fixed_once']
+    lp_update = float(means.loc['default', 'lp_update'])
+    lp_update_fixed_once = float(means.loc['fixed_once', 'lp_update'])
+    summary = {
+        'updates_default': int(audits['default']['updates'].sum()),
+        'updates_fixed_once': int(fixed_once['updates'].sum()),
+        'skipped_fixed_once': int(fixed_once['skipped'].sum()),
+        'unchanged_written_fixed_once': int(fixed_once['unchanged'].sum()),
+        'lp_update_default': lp_update,
+        'lp_update_fixed_once': lp_update_fixed_once,
+        'lp_update_saved': lp_update - lp_update_fixed_once,
+    }
+    return means, audit, summary
+
+
+if __name__ == "__main__":
+    for result in run("working_directory/inputs/run.json", "working_directory/results/lp_update_benchmark.csv"):
+        print(result)
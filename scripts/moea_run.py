@@ -1,35 +1,38 @@
-import pathlib
-from pywr.utils.bisect import BisectionSearchModel
-import json
-import pandas as pd
 import numpy as np
-from pywr_model import patch_model, patch_json
+from pywr_model import patch_model
+from pywr_model.run_statistics import StatisticsBisectionSearchModel
+from pywr_model.lp_updates import FIXED_ONCE_SOLVER_ARGS
+from pywr_model.duration_curves import DurationCurveRecorderMixin
+from pywr_model.memory_budget import write_memory_budget
+from pywr_model.patches import compact_index_dtype, write_patched_json
+from scripts.archive import Archive
+from scripts.async_moea import AsyncEpsMOEA
+from scripts.progress import ConvergenceCallback, Convergence
+from scripts.surrogate import SurrogateEvaluator
+from scripts.multi_fidelity import MultiFidelityEvaluator
+from scripts.telemetry import TelemetryAggregator, TelemetryCallback, TelemetryWriter
 import platypus
 from pywr.optimisation.platypus import PlatypusWrapper, PywrRandomGenerator
 from pywr.recorders import NumpyArrayDailyProfileParameterRecorder, FlowDurationCurveRecorder, StorageDurationCurveRecorder
-import sqlite3
 import os
+import time
 from pathlib import Path
 
-CREATE_DB_SQL = """
-        CREATE TABLE IF NOT EXISTS solutions (
-            id INTEGER PRIMARY KEY,
-            ts TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            vars JSON,
-            objs JSON,
-            cons JSON,
-            metrics JSON,
-            profiles JSON
-            );
-    """
-
 class YWWrapper(PlatypusWrapper):
     def __init__(self, *args, **kwargs):
         self.archive_fn = kwargs.pop('archive_fn', None)
+        archive_compression = kwargs.pop('archive_compression', None)
+        telemetry_path = kwargs.pop('telemetry_path', None)
+        self.index_dtype = kwargs.pop('index_dtype', None)
         super().__init__(*args, **kwargs)
+        self.telemetry = TelemetryWriter(telemetry_path) if telemetry_path is not None else None
+        if self.archive_fn is not None:
+            self.archive = Archive(self.archive_fn, compression=archive_compression)
+        else:
+            self.archive = None
 
     def customise_model(self, model):
-        patch_model(model)
+        patch_model(model, index_dtype=self.index_dtype)
 
     def variables_to_dict(self):
         data = {}
@@ -81,7 +84,8 @@ class YWWrapper(PlatypusWrapper):
     def fdcs_to_dict(self):
         data = {}
         for r in self.model.recorders:
-            if not isinstance(r, (FlowDurationCurveRecorder, StorageDurationCurveRecorder)):
+            if not isinstance(r, (FlowDurationCurveRecorder, StorageDurationCurveRecorder,
+                                  DurationCurveRecorderMixin)):
                 continue
             data[r.name] = r.to_dataframe().to_dict(orient='records')
         return data
@@ -95,52 +99,175 @@ class YWWrapper(PlatypusWrapper):
                 daily_profiles[r.name] = profile.values.tolist()
         return daily_profiles
 
+    def archive_row(self):
+        return {
+            'variables': self.variables_to_dict(),
+            'objectives': self.objectives_to_dict(),
+            'constraints': self.constraints_to_dict(),
+            'metrics': self.metrics_to_dict(),
+            'profiles': self.profiles_to_dict(),
+            'stats': self.model.aggregated_statistics(),
+        }
+
     def evaluate(self, solution):
+        t0 = time.perf_counter()
+        self.model.telemetry = self.telemetry
         result = super().evaluate(solution)
+        duration = time.perf_counter() - t0
 
-        conn = sqlite3.connect(self.archive_fn)
-        c = conn.cursor()
-
-        c.execute(CREATE_DB_SQL)
-        c.execute(
-            "INSERT INTO solutions (vars, objs, cons, metrics, profiles)"
-            " VALUES (?, ?, ?, ?, ?);",
-            [
-                json.dumps(self.variables_to_dict()),
-                json.dumps(self.objectives_to_dict()),
-                json.dumps(self.constraints_to_dict()),
-                json.dumps(self.metrics_to_dict()),
-                json.dumps(self.profiles_to_dict()),
-                # json.dumps(self.fdcs_to_dict()),
-            ]
-        )
-        conn.commit()
+        # Remote workers have no archive; the row is returned to the coordinator instead
+        self.last_archive_row = self.archive_row()
+        archive_write = None
+        if self.archive is not None:
+            t0 = time.perf_counter()
+            self.archive.insert(**self.last_archive_row)
+            archive_write = time.perf_counter() - t0
 
+        if self.telemetry is not None:
+            self.telemetry.emit('evaluation', duration=duration, archive_write=archive_write,
+                                iterations=len(self.model.simulation_statistics),
+                                feasible=all(not r.is_constraint_violated() for r in self.model_constraints))
         return result
 
-def moea_callback(alg):
+def run(json_path, db_path, iterations, patches=(), archive_compression=None, evaluator=None,
+        mode='generational', n_workers=None, surrogate=None, convergence=None, fidelity=None,
+        fixed_once=False, telemetry=None, memory_limit=None):
+    """Run the MOEA.
+
+    `patches` are applied to the model before it is built (see
+    `pywr_model.patches.write_patched_json`) and the patched model is written next to the
+    archive database. For example 'reduce' merges the pass-through link chains of the
+    network, 'replay' replays the parameters that do not depend on the variables,
+    'compact' stores the recorded time-series in compact dtypes and ('duration_curves',
+    'sketch') serves the flow and storage duration curves of each node from one shared
+    recording of the node, bounded in memory by a streaming quantile sketch.
+
+    By default the evaluations are spread over the cores of this machine. Alternatively an
+    `evaluator` (e.g. `scripts.distributed.SocketEvaluator`) can be given; it is used for
+    the run and closed afterwards.
 
-    objectives = pd.DataFrame(data=np.array([s.objectives for s in alg.archive[:]]),
-                              columns=[o.name for o in alg.problem.wrapper.model_objectives])
+    `mode` is either 'generational' (EpsNSGAII) or 'async', a steady-state ε-MOEA that
+    breeds a new offspring as soon as any of its `n_workers` evaluations completes (see
+    `scripts.async_moea.AsyncEpsMOEA`).
 
-    variables = pd.DataFrame(data=np.array([s.variables for s in alg.archive[:]]))
-    objectives.to_csv(f'working_directory/results/objective-{alg.nfe:06d}.csv')
-    variables.to_csv(f'working_directory/results/variables-{alg.nfe:06d}.csv')
+    If `surrogate` is given (True, or a dict of `scripts.surrogate.SurrogateEvaluator`
+    options) candidates are pre-screened by a surrogate and only the promising or
+    uncertain ones are simulated. The screening of every candidate is written to
+    `surrogate.csv` next to the archive database.
 
+    The hypervolume and ε-progress of the archive are written to the progress log every
+    generation. If `convergence` is given (True, or a dict of `scripts.progress.Convergence`
+    options) the run stops early once the archive has stopped improving; `iterations` is
+    then the maximum number of evaluations.
 
-def run(json_path, db_path, iterations):
+    If `fidelity` is given (True, or a dict of `timestep`, `start` and `end` for
+    `pywr_model.coarse.patch_json_data_coarse` and `scripts.multi_fidelity.MultiFidelityEvaluator`
+    options) candidates are first simulated with a coarse (by default weekly) copy of the
+    model (with `patches` applied after the change of time-step) and only those that
+    survive the screen get the full simulation. The screening log and a report of the
+    agreement between the coarse and full objectives are written to `fidelity.csv` and
+    `fidelity_agreement.csv` next to the archive database.
+
+    If `fixed_once` is True the solver only sets the bounds and costs that are not
+    parameters once per simulation (see `pywr_model.lp_updates.FIXED_ONCE_SOLVER_ARGS`).
+
+    If `telemetry` is given (True, or a dict of `scripts.telemetry.TelemetryAggregator`
+    options, e.g. a `port` to serve the summary on) the workers and the coordinator emit
+    events to `telemetry.jsonl` next to the archive database and a rolling summary of the
+    run is kept in `telemetry_status.json`.
+
+    If `memory_limit` (bytes) is given the memory budget of the model in each worker is
+    written to `memory.csv` next to the archive database, with a warning if it exceeds
+    the limit.
+    """
     if os.path.exists(db_path):
         os.unlink(db_path)    
 
+    results_dir = os.path.dirname(db_path)
+    index_dtype = compact_index_dtype(patches)
+    source_path = json_path
+    json_path = write_patched_json(json_path, results_dir, patches)
+
+    telemetry_path = None
+    if telemetry:
+        telemetry_path = os.path.join(results_dir, 'telemetry.jsonl')
+        if os.path.exists(telemetry_path):
+            os.unlink(telemetry_path)
+
+    model_kwargs = {'solver_args': FIXED_ONCE_SOLVER_ARGS} if fixed_once else {}
     wrapper = YWWrapper(json_path,
-                        model_klass=BisectionSearchModel,
-                        archive_fn=Path(".") / db_path)
+                        model_klass=StatisticsBisectionSearchModel,
+                        model_kwargs=model_kwargs,
+                        archive_fn=Path(".") / db_path,
+                        archive_compression=archive_compression,
+                        telemetry_path=telemetry_path,
+                        index_dtype=index_dtype)
+    if memory_limit is not None:
+        write_memory_budget(wrapper.model, os.path.join(results_dir, 'memory.csv'), limit=memory_limit)
     generator = PywrRandomGenerator(wrapper=wrapper, use_current=True)
 
-    with platypus.ProcessPoolEvaluator() as evaluator:
-        algorithm = platypus.EpsNSGAII(wrapper.problem, evaluator=evaluator,
-                                       population_size=128, epsilons=[0.1, 0.1],
-                                       generator=generator)
+    if evaluator is None:
+        evaluator = platypus.ProcessPoolEvaluator()
+    elif hasattr(evaluator, 'archive') and evaluator.archive is None:
+        # Workers return their archive rows to the evaluator to be stored here
+        evaluator.archive = wrapper.archive
+
+    if fidelity:
+        options = dict(fidelity) if isinstance(fidelity, dict) else {}
+        coarse_options = {k: options.pop(k) for k in ('timestep', 'start', 'end') if k in options}
+        # The time-step is changed before the other patches, so that e.g. replayed parameters
+        # are evaluated on the coarse time-steps
+        coarse_path = write_patched_json(source_path, results_dir,
+                                         [('coarse', coarse_options or True)] + list(patches))
+        coarse_wrapper = YWWrapper(coarse_path, model_klass=StatisticsBisectionSearchModel,
+                                   model_kwargs=model_kwargs, index_dtype=index_dtype)
+        evaluator = fidelity_evaluator = MultiFidelityEvaluator(evaluator, coarse_wrapper, **options)
+
+    if surrogate:
+        evaluator = SurrogateEvaluator(evaluator, **(surrogate if isinstance(surrogate, dict) else {}))
+
+    aggregator = None
+    if telemetry:
+        aggregator = TelemetryAggregator(telemetry_path, status_path=os.path.join(results_dir, 'telemetry_status.json'),
+                                         **(telemetry if isinstance(telemetry, dict) else {}))
+        aggregator.start()
+
+    with evaluator:
+        if mode == 'generational':
+            algorithm = platypus.EpsNSGAII(wrapper.problem, evaluator=evaluator,
+                                           population_size=128, epsilons=[0.1, 0.1],
+                                           generator=generator)
+        elif mode == 'async':
+            algorithm = AsyncEpsMOEA(wrapper.problem, evaluator=evaluator, n_workers=n_workers,
+                                     population_size=128, epsilons=[0.1, 0.1],
+                                     generator=generator)
+        else:
+            raise ValueError(f'Unknown MOEA mode "{mode}".')
+
+        # Log the archive changes of each generation next to the archive database
+        progress_path = os.path.join(os.path.dirname(db_path), 'progress.log')
+        callback = ConvergenceCallback(progress_path)
+        if convergence:
+            condition = Convergence(callback, iterations, **(convergence if isinstance(convergence, dict) else {}))
+        else:
+            condition = iterations
+        if telemetry:
+            wrapper.telemetry.emit('start', mode=mode, iterations=iterations)
+            algorithm.run(condition, callback=TelemetryCallback(callback, wrapper.telemetry))
+            wrapper.telemetry.emit('end', nfe=algorithm.nfe)
+        else:
+            algorithm.run(condition, callback=callback)
+
+    if aggregator is not None:
+        aggregator.stop()
+        wrapper.telemetry.close()
+        print(aggregator.summary())
 
-        algorithm.run(iterations, callback=moea_callback)
+    if fidelity:
+        fidelity_evaluator.statistics_to_dataframe().to_csv(os.path.join(results_dir, 'fidelity.csv'))
+        fidelity_evaluator.agreement_report().to_csv(os.path.join(results_dir, 'fidelity_agreement.csv'))
+        print(fidelity_evaluator.summary())
 
+    if surrogate:
+        evaluator.statistics_to_dataframe().to_csv(os.path.join(results_dir, 'surrogate.csv'))
+        print(evaluator.summary())
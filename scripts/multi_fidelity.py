@@ -0,0 +1,217 @@
+import concurrent.futures
+import random
+import threading
+import numpy as np
+import pandas
+import platypus
+from scripts.archive import non_dominated
+from scripts.async_moea import TimedJob, submit_job
+from scripts.progress import objective_signs
+
+
+class CoarseJob(TimedJob):
+    """Evaluate a copy of a solution's variables with the coarse model's problem."""
+    def __init__(self, solution, problem):
+        coarse = platypus.Solution(problem)
+        coarse.variables[:] = solution.variables[:]
+        super().__init__(coarse)
+
+
+class MultiFidelityEvaluator(platypus.Evaluator):
+    """Wrap an evaluator to screen candidates with a coarse version of the model first.
+
+    Every candidate is first simulated with `coarse_wrapper` (e.g. a weekly time-step or
+    short record variant of the model, see `pywr_model.coarse.patch_json_coarse`) and
+    only the candidates that survive the screen get the full simulation. After the first
+    `min_fine` candidates a candidate is screened out, and keeps its coarse objectives
+    and constraints, if its coarse constraint violation exceeds `constraint_tolerance`
+    or if its coarse objectives, improved by `objective_tolerance` (a fraction of each
+    objective's range), are dominated by the coarse objectives of a feasible fully
+    simulated solution.
+
+    A random `audit_fraction` of the screened candidates are fully simulated anyway.
+    `statistics_to_dataframe` returns the log of every candidate, `summary` the savings
+    and `agreement_report` how well the coarse and full objectives agree.
+    """
+    def __init__(self, evaluator, coarse_wrapper, min_fine=64, objective_tolerance=0.05, constraint_tolerance=0.0,
+                 audit_fraction=0.1):
+        super().__init__()
+        self.evaluator = evaluator
+        self.coarse_wrapper = coarse_wrapper
+        self.min_fine = min_fine
+        self.objective_tolerance = objective_tolerance
+        self.constraint_tolerance = constraint_tolerance
+        self.audit_fraction = audit_fraction
+        self.coarse_busy_time = 0.0
+        self.log = []
+        # The coarse and full objectives of the fully simulated feasible candidates
+        self._coarse = []
+        self._fine = []
+        self._n_fine = 0
+        self._lock = threading.Lock()
+
+    def _screen(self, coarse):
+        """Return the reason to screen out the coarsely evaluated solution, or None."""
+        with self._lock:
+            if self._n_fine < self.min_fine:
+                return None
+            reference = np.array(self._coarse)
+
+        if coarse.constraint_violation > self.constraint_tolerance:
+            return 'infeasible'
+        if len(reference) == 0:
+            return None
+
+        signs = objective_signs(coarse.problem)
+        reference = reference * signs
+        reference = reference[non_dominated(reference)]
+        scale = np.ptp(reference, axis=0) if len(reference) > 1 else np.abs(reference[0])
+        optimistic = np.ravel(coarse.objectives) * signs - self.objective_tolerance * scale
+        if np.any(np.all(reference <= optimistic, axis=1) & np.any(reference < optimistic, axis=1)):
+            return 'dominated'
+        return None
+
+    def _coarse_entry(self, coarse, reason, simulated):
+        entry = {'screened': reason is not None, 'reason': reason, 'simulated': simulated,
+                 'coarse_feasible': coarse.feasible}
+        for i, v in enumerate(coarse.objectives):
+            entry[f'coarse_objective{i}'] = v
+        for i, v in enumerate(coarse.constraints):
+            entry[f'coarse_constraint{i}'] = v
+        return entry
+
+    def _apply_coarse(self, solution, coarse, reason):
+        solution.objectives[:] = coarse.objectives[:]
+        solution.constraints[:] = coarse.constraints[:]
+        solution.constraint_violation = coarse.constraint_violation
+        solution.feasible = coarse.feasible
+        solution.evaluated = True
+        with self._lock:
+            self.log.append(self._coarse_entry(coarse, reason, simulated=False))
+
+    def _finish(self, job, coarse, reason):
+        solution = job.solution
+        entry = self._coarse_entry(coarse, reason, simulated=True)
+        entry['fine_feasible'] = solution.feasible
+        for i, v in enumerate(solution.objectives):
+            entry[f'fine_objective{i}'] = v
+        for i, v in enumerate(solution.constraints):
+            entry[f'fine_constraint{i}'] = v
+        with self._lock:
+            if reason is not None:
+                # Audit of a screened candidate: was the screening right?
+                signs = objective_signs(solution.problem)
+                fine = np.array(self._fine).reshape(len(self._fine), len(signs)) * signs
+                objectives = np.ravel(solution.objectives) * signs
+                dominated = bool(np.any(np.all(fine <= objectives, axis=1) & np.any(fine < objectives, axis=1)))
+                entry['screening_correct'] = (not solution.feasible) or dominated
+            self.log.append(entry)
+            self._n_fine += 1
+            if solution.feasible:
+                self._coarse.append(list(coarse.objectives))
+                self._fine.append(list(solution.objectives))
+
+    def _record_coarse_time(self, job):
+        if job.start is not None:
+            with self._lock:
+                self.coarse_busy_time += job.end - job.start
+
+    def evaluate_all(self, jobs, **kwargs):
+        coarse_jobs = self.evaluator.evaluate_all([CoarseJob(job.solution, self.coarse_wrapper.problem)
+                                                   for job in jobs], **kwargs)
+        simulate = []
+        for job, coarse_job in zip(jobs, coarse_jobs):
+            self._record_coarse_time(coarse_job)
+            reason = self._screen(coarse_job.solution)
+            if reason is None or random.random() < self.audit_fraction:
+                simulate.append((job, coarse_job.solution, reason))
+            else:
+                self._apply_coarse(job.solution, coarse_job.solution, reason)
+
+        results = self.evaluator.evaluate_all([job for job, _, _ in simulate], **kwargs)
+        results = {id(job): result for (job, _, _), result in zip(simulate, results)}
+        for job, coarse, reason in simulate:
+            self._finish(results[id(job)], coarse, reason)
+        return [results.get(id(job), job) for job in jobs]
+
+    def submit(self, job):
+        outer = concurrent.futures.Future()
+
+        def fine_done(future, coarse, reason):
+            try:
+                result = future.result()
+                self._finish(result, coarse, reason)
+            except Exception as error:
+                outer.set_exception(error)
+            else:
+                outer.set_result(result)
+
+        def coarse_done(future):
+            try:
+                coarse_job = future.result()
+                self._record_coarse_time(coarse_job)
+                coarse = coarse_job.solution
+                reason = self._screen(coarse)
+                if reason is not None and random.random() >= self.audit_fraction:
+                    self._apply_coarse(job.solution, coarse, reason)
+                    outer.set_result(job)
+                    return
+                fine = submit_job(self.evaluator, job)
+            except Exception as error:
+                outer.set_exception(error)
+            else:
+                fine.add_done_callback(lambda f: fine_done(f, coarse, reason))
+
+        submit_job(self.evaluator, CoarseJob(job.solution, self.coarse_wrapper.problem)).add_done_callback(coarse_done)
+        return outer
+
+    def statistics_to_dataframe(self):
+        return pandas.DataFrame(self.log)
+
+    def summary(self):
+        """The savings in full simulations over the run."""
+        df = self.statistics_to_dataframe()
+        n = len(df)
+        summary = {
+            'candidates': n,
+            'simulated': int(df['simulated'].sum()) if n else 0,
+            'screened_out': int((df['screened'] & ~df['simulated']).sum()) if n else 0,
+            'coarse_busy_time': self.coarse_busy_time,
+        }
+        summary['savings'] = summary['screened_out'] / n if n else 0.0
+        if 'screening_correct' in df:
+            summary['screening_accuracy'] = float(df['screening_correct'].dropna().astype(float).mean())
+        return summary
+
+    def agreement_report(self):
+        """Compare the coarse and full objectives and constraints of the fully simulated candidates.
+
+        Returns a DataFrame with the number of candidates, Pearson and Spearman (rank)
+        correlations, bias (coarse - full) and RMSE of each objective and constraint,
+        and the fraction of candidates whose coarse and full feasibility agree.
+        """
+        df = self.statistics_to_dataframe()
+        if len(df) == 0 or 'fine_feasible' not in df:
+            return pandas.DataFrame()
+        df = df[df['simulated']]
+
+        rows = {}
+        names = [c[len('coarse_'):] for c in df.columns if c.startswith('coarse_objective') or
+                 c.startswith('coarse_constraint')]
+        for name in names:
+            coarse, fine = df[f'coarse_{name}'].astype(float), df[f'fine_{name}'].astype(float)
+            rows[name] = {
+                'n': len(df),
+                'pearson': coarse.corr(fine),
+                'spearman': coarse.rank().corr(fine.rank()),
+                'bias': (coarse - fine).mean(),
+                'rmse': np.sqrt(((coarse - fine)**2).mean()),
+            }
+        rows['feasibility'] = {
+            'n': len(df),
+            'agreement': (df['coarse_feasible'] == df['fine_feasible']).mean(),
+        }
+        return pandas.DataFrame.from_dict(rows, orient='index')
+
+    def close(self):
+        self.evaluator.close()
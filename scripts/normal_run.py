@@ -1,7 +1,31 @@
-from pywr.core import Model
+import os
+from pywr_model.aggregation_recorders import write_aggregated_results
+from pywr_model.lp_updates import FIXED_ONCE_SOLVER_ARGS
+from pywr_model.memory_budget import write_memory_budget
+from pywr_model.patches import patch_options, write_patched_json
+from pywr_model.run_statistics import StatisticsModel, write_statistics
+
+def run(json_path, csv_path, solver='glpk-edge', stats_csv_path=None, patches=(), fixed_once=False,
+        memory_limit=None):
+    # patches: the `pywr_model.patches.PATCHES` to apply to the model (e.g. ['reduce', 'compact',
+    # ('aggregate', 'Y')]); the patched model is written next to the outputs. With 'aggregate'
+    # the monthly or annual statistics are written instead of the daily series
+    aggregate = 'aggregate' in patch_options(patches)
+    json_path = write_patched_json(json_path, os.path.dirname(csv_path), patches)
+
+    # Only update the LP bounds and costs that can change every time-step
+    solver_args = FIXED_ONCE_SOLVER_ARGS if fixed_once else {}
+    model = StatisticsModel.load(json_path, solver=solver, solver_args=solver_args)
+    if memory_limit is not None:
+        # Warn before the run if the recorders would allocate more than `memory_limit` bytes
+        root, ext = os.path.splitext(csv_path)
+        write_memory_budget(model, f'{root}_memory{ext}', limit=memory_limit)
 
-def run(json_path, csv_path):
-    model = Model.load(json_path, solver='glpk-edge')
     model.run()
-    df = model.to_dataframe()
-    df.to_csv(csv_path)
+    if aggregate:
+        write_aggregated_results(model, csv_path)
+    else:
+        df = model.to_dataframe()
+        df.to_csv(csv_path)
+    if stats_csv_path is not None:
+        write_statistics(model, stats_csv_path)
@@ -0,0 +1,181 @@
+import concurrent.futures
+import glob
+import hashlib
+import json
+import os
+import time
+import pandas
+
+# Source files that every stage depends on; a change to the model code reruns everything.
+CODE_FILES = ('pywr_model/*.py', 'scripts/*.py')
+
+
+def file_hash(path):
+    """Return the SHA-256 of the contents of `path`, or None if it does not exist."""
+    if not os.path.exists(path):
+        return None
+    sha = hashlib.sha256()
+    with open(path, 'rb') as fh:
+        for chunk in iter(lambda: fh.read(1 << 20), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def model_inputs(json_path):
+    """Return the model JSON and the data files (e.g. the `YWNetwork` CSV and HDF5 files) it references.
+
+    The `url` of each parameter and table is resolved relative to the model's directory,
+    or to the working directory if it does not exist there.
+    """
+    with open(json_path) as fh:
+        data = json.load(fh)
+
+    urls = set()
+
+    def find(obj):
+        if isinstance(obj, dict):
+            for key, value in obj.items():
+                if key == 'url' and isinstance(value, str):
+                    urls.add(value)
+                else:
+                    find(value)
+        elif isinstance(obj, list):
+            for value in obj:
+                find(value)
+
+    find(data)
+    paths = [json_path]
+    for url in sorted(urls):
+        path = os.path.join(os.path.dirname(json_path), url)
+        paths.append(path if os.path.exists(path) else url)
+    return paths
+
+
+class Stage:
+    """A step of the pipeline: `func(**kwargs)` reads `inputs` and writes `outputs`.
+
+    `depends` are the names of the stages that must finish first. The stage is rerun
+    when the content of any input file, the `settings` (by default `kwargs`, e.g. the
+    options passed to `patch_json`) or the code of the model changes.
+    """
+    def __init__(self, name, func, kwargs=None, inputs=(), outputs=(), depends=(), settings=None):
+        self.name = name
+        self.func = func
+        self.kwargs = kwargs or {}
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.depends = list(depends)
+        self.settings = self.kwargs if settings is None else settings
+
+    def input_hash(self, code_hashes):
+        sha = hashlib.sha256()
+        sha.update(f'{self.func.__module__}.{self.func.__qualname__}'.encode())
+        sha.update(json.dumps(self.settings, sort_keys=True, default=str).encode())
+        for path in sorted(set(self.inputs)):
+            sha.update(f'{path}:{file_hash(path)}'.encode())
+        for path, digest in sorted(code_hashes.items()):
+            sha.update(f'{path}:{digest}'.encode())
+        return sha.hexdigest()
+
+
+def _run_stage(func, kwargs):
+    t0 = time.perf_counter()
+    func(**kwargs)
+    return time.perf_counter() - t0
+
+
+def _code_hashes():
+    paths = set()
+    for pattern in CODE_FILES:
+        paths.update(glob.glob(pattern))
+    return {path: file_hash(path) for path in sorted(paths)}
+
+
+def _load_cache(cache_path):
+    if not os.path.exists(cache_path):
+        return {}
+    with open(cache_path) as fh:
+        return json.load(fh)
+
+
+def _is_cached(stage, digest, cache):
+    entry = cache.get(stage.name)
+    if entry is None or entry['input_hash'] != digest:
+        return False
+    # The outputs must still be those written by that run
+    return all(file_hash(path) == entry['outputs'].get(path) for path in stage.outputs)
+
+
+def run(stages, cache_path, max_workers=None, force=False):
+    """Run the stages of a pipeline, in parallel where they do not depend on each other.
+
+    A stage is skipped if the hash of its inputs matches the previous run recorded in
+    `cache_path` and its outputs are unchanged since, unless `force` is True. A stage
+    whose inputs include the outputs of another stage should list that stage in `depends`;
+    it is hashed once that stage has finished. Stages that depend on a failed stage are
+    not run.
+
+    Returns a DataFrame with the status ('cached', 'run', 'failed' or 'not run') and wall
+    time of each stage.
+    """
+    stages = {stage.name: stage for stage in stages}
+    for stage in stages.values():
+        missing = set(stage.depends) - set(stages)
+        if missing:
+            raise ValueError(f'Stage "{stage.name}" depends on unknown stages: {sorted(missing)}.')
+
+    cache = _load_cache(cache_path)
+    code_hashes = _code_hashes()
+    report = {}
+    pending = dict(stages)
+    running = {}
+
+    def save_cache():
+        with open(cache_path, mode='w') as fh:
+            json.dump(cache, fh, indent=2)
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers) as executor:
+        while pending or running:
+            # Start (or skip) every stage whose dependencies have finished
+            ready = [name for name, stage in pending.items() if all(d in report for d in stage.depends)]
+            if not ready and not running:
+                raise ValueError(f'The dependencies of stages {sorted(pending)} form a cycle.')
+            for name in ready:
+                stage = pending.pop(name)
+                if any(report[d]['status'] in ('failed', 'not run') for d in stage.depends):
+                    report[name] = {'status': 'not run', 'time': 0.0, 'cache_hit': False}
+                    continue
+
+                digest = stage.input_hash(code_hashes)
+                if not force and _is_cached(stage, digest, cache):
+                    print(f'Stage "{name}" is up to date.')
+                    report[name] = {'status': 'cached', 'time': 0.0, 'cache_hit': True}
+                    continue
+
+                print(f'Running stage "{name}"...')
+                running[executor.submit(_run_stage, stage.func, stage.kwargs)] = (stage, digest)
+
+            if not running:
+                continue
+
+            done, _ = concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                stage, digest = running.pop(future)
+                try:
+                    elapsed = future.result()
+                except Exception as error:
+                    print(f'Stage "{stage.name}" failed: {error!r}')
+                    report[stage.name] = {'status': 'failed', 'time': float('nan'), 'cache_hit': False}
+                    cache.pop(stage.name, None)
+                else:
+                    print(f'Stage "{stage.name}" finished in {elapsed:.1f}s.')
+                    report[stage.name] = {'status': 'run', 'time': elapsed, 'cache_hit': False}
+                    cache[stage.name] = {
+                        'input_hash': digest,
+                        'outputs': {path: file_hash(path) for path in stage.outputs},
+                    }
+                save_cache()
+
+    df = pandas.DataFrame.from_dict(report, orient='index')
+    df.index.name = 'stage'
+    return df.loc[list(stages)]
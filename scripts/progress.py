@@ -0,0 +1,294 @@
+import json
+import struct
+import numpy as np
+import pandas as pd
+import platypus
+from scripts.archive import non_dominated
+
+# Record type, nfe, solution id, number of float64 values that follow
+RECORD = struct.Struct('<BQQI')
+HEADER, ADD, REMOVE, GENERATION = 0, 1, 2, 3
+
+
+def hypervolume(points, reference):
+    """Return the exact hypervolume dominated by `points` (minimised) and bounded by `reference`.
+
+    Two objectives are computed with a sweep; more objectives are sliced along the last
+    objective, dropping the points dominated within each slice, which is cheap for the
+    two to four objectives and archive sizes here.
+    """
+    points = np.asarray(points, dtype=np.float64)
+    reference = np.asarray(reference, dtype=np.float64)
+    if len(points) == 0:
+        return 0.0
+    points = points[np.all(points < reference, axis=1)]
+    if len(points) == 0:
+        return 0.0
+
+    if points.shape[1] == 1:
+        return float(reference[0] - points[:, 0].min())
+
+    if points.shape[1] == 2:
+        volume = 0.0
+        best = reference[1]
+        for x, y in points[np.lexsort((points[:, 1], points[:, 0]))]:
+            if y < best:
+                volume += (reference[0] - x) * (best - y)
+                best = y
+        return volume
+
+    points = points[np.argsort(points[:, -1])]
+    volume = 0.0
+    for i in range(len(points)):
+        upper = points[i + 1, -1] if i + 1 < len(points) else reference[-1]
+        if upper > points[i, -1]:
+            below = points[:i + 1, :-1]
+            volume += hypervolume(below[non_dominated(below)], reference[:-1]) * (upper - points[i, -1])
+    return volume
+
+
+def objective_signs(problem):
+    """Return the multipliers (1 or -1) that turn every objective of `problem` into one to be minimised."""
+    return np.array([-1.0 if d == platypus.Direction.MAXIMIZE else 1.0 for d in problem.directions])
+
+
+class ProgressLog:
+    """An append-only binary log of the changes to an MOEA archive.
+
+    Each generation appends an `ADD` record (with the decoded variables, objectives and
+    constraints) for every solution that entered the archive, a `REMOVE` record for every
+    solution that left it and a `GENERATION` record that may carry a small vector of
+    progress metrics. The archive at any nfe can be rebuilt by replaying the log.
+    """
+    def __init__(self, path):
+        self.path = path
+
+    def write_header(self, variables, objectives, constraints, metrics=()):
+        header = json.dumps({
+            'variables': list(variables),
+            'objectives': list(objectives),
+            'constraints': list(constraints),
+            'metrics': list(metrics),
+        }).encode('utf-8')
+        with open(self.path, mode='wb') as fh:
+            fh.write(RECORD.pack(HEADER, 0, 0, len(header)))
+            fh.write(header)
+
+    def append(self, records):
+        """Append `(record type, nfe, solution id, values)` records to the log."""
+        with open(self.path, mode='ab') as fh:
+            for record_type, nfe, solution_id, values in records:
+                values = np.asarray(values, dtype=np.float64)
+                fh.write(RECORD.pack(record_type, nfe, solution_id, values.size))
+                fh.write(values.tobytes())
+
+    def records(self):
+        """Iterate over the `(record type, nfe, solution id, values)` records of the log.
+
+        The values of the header record are its decoded JSON.
+        """
+        with open(self.path, mode='rb') as fh:
+            while True:
+                data = fh.read(RECORD.size)
+                if len(data) < RECORD.size:
+                    break
+                record_type, nfe, solution_id, n = RECORD.unpack(data)
+                if record_type == HEADER:
+                    yield record_type, nfe, solution_id, json.loads(fh.read(n).decode('utf-8'))
+                else:
+                    yield record_type, nfe, solution_id, np.frombuffer(fh.read(8 * n), dtype=np.float64)
+
+    def header(self):
+        return next(self.records())[3]
+
+    def generations(self):
+        """Return the progress metrics of each generation as a DataFrame indexed by nfe."""
+        header = None
+        rows = {}
+        for record_type, nfe, _, values in self.records():
+            if record_type == HEADER:
+                header = values
+            elif record_type == GENERATION:
+                rows[nfe] = values
+        return pd.DataFrame.from_dict(rows, orient='index', columns=header['metrics'])
+
+    def archive_at(self, nfe=None):
+        """Rebuild the archive as it was after the last generation at or before `nfe`.
+
+        Returns a DataFrame of the variables, objectives and constraints indexed by
+        solution id; the columns are a MultiIndex of (kind, name).
+        """
+        header = None
+        members = {}
+        pending = {}
+        for record_type, record_nfe, solution_id, values in self.records():
+            if record_type == HEADER:
+                header = values
+                continue
+            if nfe is not None and record_nfe > nfe:
+                break
+            if record_type == ADD:
+                pending[solution_id] = values
+            elif record_type == REMOVE:
+                pending[solution_id] = None
+            elif record_type == GENERATION:
+                # Only complete generations are applied
+                for i, v in pending.items():
+                    if v is None:
+                        members.pop(i, None)
+                    else:
+                        members[i] = v
+                pending = {}
+
+        columns = pd.MultiIndex.from_tuples(
+            [('variables', n) for n in header['variables']] +
+            [('objectives', n) for n in header['objectives']] +
+            [('constraints', n) for n in header['constraints']]
+        )
+        ids = sorted(members.keys())
+        data = np.array([members[i] for i in ids]).reshape(len(ids), len(columns))
+        return pd.DataFrame(data, index=ids, columns=columns)
+
+
+class ProgressCallback:
+    """An MOEA callback that logs the archive changes of each generation to a `ProgressLog`.
+
+    Solutions are tracked by identity so the cost of each generation depends on the size
+    of the archive and the number of changes, not on the number of generations.
+    """
+    def __init__(self, path):
+        self.log = ProgressLog(path)
+        self._members = None
+        self._next_id = 0
+
+    def generation_metrics(self, alg):
+        return {}
+
+    def __call__(self, alg):
+        problem = alg.problem
+        metrics = self.generation_metrics(alg)
+        if self._members is None:
+            self._members = {}
+            wrapper = problem.wrapper
+            self.log.write_header(
+                [f'var{i}' for i in range(problem.nvars)],
+                [o.name for o in wrapper.model_objectives],
+                [c.name for c in wrapper.model_constraints],
+                metrics=metrics.keys()
+            )
+
+        current = {id(s): s for s in alg.archive[:]}
+        records = []
+        for key in list(self._members.keys()):
+            if key not in current:
+                solution_id, _ = self._members.pop(key)
+                records.append((REMOVE, alg.nfe, solution_id, ()))
+        for key, s in current.items():
+            if key in self._members:
+                continue
+            # Keep a reference to the solution so that its id is not reused
+            self._members[key] = (self._next_id, s)
+            variables = [t.decode(v) for t, v in zip(problem.types, s.variables)]
+            values = np.concatenate([np.ravel(variables), np.ravel(s.objectives), np.ravel(s.constraints)])
+            records.append((ADD, alg.nfe, self._next_id, values))
+            self._next_id += 1
+        records.append((GENERATION, alg.nfe, 0, list(metrics.values())))
+        self.log.append(records)
+
+
+class ConvergenceCallback(ProgressCallback):
+    """A `ProgressCallback` that also logs the convergence of the archive each generation.
+
+    The metrics are the hypervolume of the feasible archive, its relative improvement on
+    the previous generation's archive, the ε-progress (the number of new ε-boxes
+    occupied since the previous generation) and the archive size. `history` holds the
+    metrics of every generation.
+
+    The objectives are normalised by `bounds`, a (minimum, maximum) pair for each
+    objective, if given. Otherwise they are normalised by the range of the current and
+    previous archives, so the improvement is always comparable but the hypervolume is
+    only comparable between generations with the same range. The hypervolume is only
+    recomputed when the archive has changed.
+    """
+    def __init__(self, path, bounds=None):
+        super().__init__(path)
+        self.bounds = bounds
+        self.history = []
+        self._previous = None
+        self._improvements = 0
+
+    @staticmethod
+    def _objectives(alg):
+        signs = objective_signs(alg.problem)
+        objectives = [np.ravel(s.objectives) * signs for s in alg.archive if s.feasible]
+        return np.array(objectives).reshape(len(objectives), alg.problem.nobjs)
+
+    def generation_metrics(self, alg):
+        current = self._objectives(alg)
+        previous = self._previous if self._previous is not None else np.empty((0, current.shape[1]))
+
+        if self.history and np.array_equal(current, previous):
+            volume, improvement = self.history[-1]['hypervolume'], 0.0
+        else:
+            if self.bounds is not None:
+                limits = np.array(self.bounds, dtype=np.float64) * objective_signs(alg.problem)[:, None]
+                lower, upper = limits.min(axis=1), limits.max(axis=1)
+            else:
+                both = np.vstack([current, previous])
+                lower = both.min(axis=0) if len(both) else np.zeros(current.shape[1])
+                upper = both.max(axis=0) if len(both) else np.ones(current.shape[1])
+            scale = np.where(upper > lower, upper - lower, 1.0)
+            reference = np.full(current.shape[1], 1.1)
+            volume = hypervolume((current - lower) / scale, reference)
+            before = hypervolume((previous - lower) / scale, reference)
+            improvement = (volume - before) / volume if volume > 0 else 0.0
+
+        improvements = getattr(alg.archive, 'improvements', 0)
+        metrics = {
+            'hypervolume': volume,
+            'hypervolume_improvement': improvement,
+            'epsilon_progress': improvements - self._improvements,
+            'archive_size': len(alg.archive),
+        }
+        self._improvements = improvements
+        self._previous = current
+        self.history.append(metrics)
+        return metrics
+
+
+class Convergence(platypus.TerminationCondition):
+    """Terminate when the archive has stopped improving or after `max_evaluations`.
+
+    The run is converged once, for `window` consecutive generations of `callback` (a
+    `ConvergenceCallback`), the hypervolume improvement has been below `threshold` and
+    the ε-progress at most `epsilon_progress`. No run stops before `min_evaluations`.
+    `reason` records why the run stopped.
+    """
+    def __init__(self, callback, max_evaluations, window=10, threshold=1e-3, epsilon_progress=0,
+                 min_evaluations=0):
+        super().__init__()
+        self.callback = callback
+        self.max_evaluations = max_evaluations
+        self.window = window
+        self.threshold = threshold
+        self.epsilon_progress = epsilon_progress
+        self.min_evaluations = min_evaluations
+        self.starting_nfe = 0
+        self.reason = None
+
+    def initialize(self, algorithm):
+        self.starting_nfe = algorithm.nfe
+
+    def shouldTerminate(self, algorithm):
+        nfe = algorithm.nfe - self.starting_nfe
+        if nfe >= self.max_evaluations:
+            self.reason = 'max_evaluations'
+            return True
+        history = self.callback.history[-self.window:]
+        if nfe < self.min_evaluations or len(history) < self.window:
+            return False
+        if all(h['hypervolume_improvement'] < self.threshold and h['epsilon_progress'] <= self.epsilon_progress
+               for h in history):
+            self.reason = 'converged'
+            return True
+        return False
@@ -0,0 +1,50 @@
+import json
+import os
+import numpy as np
+import pandas
+from pywr_model.patches import write_patched_json
+from pywr_model.run_statistics import StatisticsModel
+
+
+def _run(json_path, solver):
+    model = StatisticsModel.load(json_path, solver=solver)
+    model.run()
+    row = model.aggregated_statistics()
+    row['nodes'] = len(model.graph.nodes)
+    row['edges'] = len(model.graph.edges)
+    if hasattr(model.solver, 'routes'):
+        row['routes'] = len(model.solver.routes)
+    return row, model.to_dataframe()
+
+
+def run(json_path, csv_path, solvers=('glpk', 'glpk-edge'), repeats=3):
+    """Benchmark a model with and without its pass-through link chains merged.
+
+    For each solver the size of the network and the run time statistics of both
+    versions are recorded, together with the largest absolute difference between the
+    recorder outputs of the original and reduced models (which should be zero).
+    """
+    reduced_path = write_patched_json(json_path, os.path.dirname(csv_path), ['reduce'])
+    with open(reduced_path) as fh:
+        mapping = json.load(fh)['metadata']['reduced_nodes']
+
+    rows = []
+    for solver in solvers:
+        for repeat in range(repeats):
+            original, original_df = _run(json_path, solver)
+            reduced, reduced_df = _run(reduced_path, solver)
+            difference = np.nanmax(np.abs(original_df.values - reduced_df[original_df.columns].values))
+            for mode, row in (('original', original), ('reduced', reduced)):
+                row['mode'] = mode
+                row['repeat'] = repeat
+                row['removed_links'] = len(mapping) if mode == 'reduced' else 0
+                row['max_abs_difference'] = difference
+                rows.append(row)
+
+    df = pandas.DataFrame(rows).set_index(['solver', 'mode', 'repeat'])
+    df.to_csv(csv_path)
+    return df.groupby(level=['solver', 'mode']).mean()
+
+
+if __name__ == "__main__":
+    print(run("working_directory/inputs/run.json", "working_directory/results/reduction_benchmark.csv"))
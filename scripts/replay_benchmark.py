@@ -0,0 +1,43 @@
+import os
+import time
+import pandas
+from pywr_model import patch_model
+from pywr_model.patches import write_patched_json
+from pywr_model.run_statistics import StatisticsBisectionSearchModel
+
+
+def _run_bisection(json_path):
+    model = StatisticsBisectionSearchModel.load(json_path, solver='glpk-edge')
+    patch_model(model)
+    t0 = time.perf_counter()
+    model.run()
+    row = model.aggregated_statistics()
+    row['run_time'] = time.perf_counter() - t0
+    row['parameters'] = len(model.parameters)
+    row['do_scaling_factor'] = model.parameters[model.bisect_parameter].get_double_variables()[0]
+    row['total_demand'] = model.recorders['Total Demand Recorder'].aggregated_value()
+    return row
+
+
+def run(json_path, csv_path, repeats=3):
+    """Benchmark the deployable output bisection search with and without parameter replay."""
+    t0 = time.perf_counter()
+    replay_path = write_patched_json(json_path, os.path.dirname(csv_path), ['replay'])
+    build_time = time.perf_counter() - t0
+
+    rows = []
+    for repeat in range(repeats):
+        for mode, path in (('live', json_path), ('replay', replay_path)):
+            row = _run_bisection(path)
+            row['mode'] = mode
+            row['repeat'] = repeat
+            row['build_time'] = build_time if mode == 'replay' else 0.0
+            rows.append(row)
+
+    df = pandas.DataFrame(rows).set_index(['mode', 'repeat'])
+    df.to_csv(csv_path)
+    return df.groupby(level='mode').mean()
+
+
+if __name__ == "__main__":
+    print(run("working_directory/inputs/run_DO.json", "working_directory/results/replay_benchmark.csv"))
@@ -0,0 +1,59 @@
+import time
+import numpy as np
+import pandas
+from pywr_model import patch_model
+from pywr_model.snapshot import ResumableModel
+
+
+def run(json_path, csv_path, parameter="Nidd Group line0", snapshot_doy=213, start_doys=(240, 274, 306, 335)):
+    """Compare full runs with runs resumed from a snapshot when only late-period behaviour changes.
+
+    The `start_doy` of the flood profile parameter only affects the model from that day of
+    the year onward. A snapshot is taken at `snapshot_doy` (before the lowest allowed
+    `start_doy`) and each value of `start_doys` is then simulated twice: once from the
+    first time-step and once resumed from the snapshot.
+
+    pywr's numpy recorders can not be restored in place, so partial snapshots are allowed
+    and the comparison is of their arrays stitched together by `recorder_data`.
+    """
+    model = ResumableModel.load(json_path, solver='glpk-edge')
+    model.allow_partial_snapshots = True
+    patch_model(model)
+    model.setup()
+    snapshot_index = [ts.index for ts in model.timestepper if ts.dayofyear == snapshot_doy][0]
+    model.snapshot_timesteps = {snapshot_index}
+    model.run()
+    snapshot = model.snapshots[snapshot_index]
+
+    param = model.parameters[parameter]
+    end_doy = param.get_integer_variables()[1]
+    recorder_names = [r.name for r in model.recorders if r.name in snapshot.recorders]
+
+    rows = []
+    for start_doy in start_doys:
+        param.set_integer_variables(np.array([start_doy, end_doy], dtype=np.int32))
+
+        model.resume_snapshot = None
+        t0 = time.perf_counter()
+        model.run()
+        full_time = time.perf_counter() - t0
+        full = {name: model.recorder_data(name) for name in recorder_names}
+
+        model.resume_snapshot = snapshot
+        t0 = time.perf_counter()
+        model.run()
+        resumed_time = time.perf_counter() - t0
+        difference = max(np.abs(model.recorder_data(name) - full[name]).max() for name in recorder_names)
+
+        rows.append({
+            'start_doy': start_doy,
+            'full_time': full_time,
+            'resumed_time': resumed_time,
+            'speed_up': full_time / resumed_time,
+            'max_abs_difference': difference,
+        })
+
+    model.resume_snapshot = None
+    df = pandas.DataFrame(rows).set_index('start_doy')
+    df.to_csv(csv_path)
+    return df
@@ -0,0 +1,214 @@
+import concurrent.futures
+import gc
+import json
+import os
+import time
+import numpy as np
+import pandas
+from pywr.recorders import IndexParameterRecorder, StorageRecorder
+from pywr_model import patch_model
+from pywr_model.patches import relocate_paths
+from pywr_model.replay import check_replay_timestepper
+from pywr_model.run_statistics import StatisticsModel
+
+RESERVOIR_CONDITIONS = "working_directory/inputs/YWNetwork/reservoir_conditions.csv"
+
+
+def read_reservoir_conditions(csv_path=RESERVOIR_CONDITIONS):
+    """Return a DataFrame of the minimum, maximum and initial volume of each reservoir, indexed by reservoir."""
+    df = pandas.read_csv(csv_path, index_col=0).T
+    return df[['Min Volume', 'Max Volume', 'Initial Volume']].astype(np.float64)
+
+
+def patch_json_data_segment(data, start, end, conditions=None):
+    """Set the timestepper of `data` to run from `start` to `end`.
+
+    If `conditions` (see `read_reservoir_conditions`) are given the storage nodes they
+    list start from their initial volume. A model whose parameters have been replayed
+    can not be split (see `pywr_model.replay.check_replay_timestepper`).
+    """
+    data["timestepper"]["start"] = str(start)
+    data["timestepper"]["end"] = str(end)
+    check_replay_timestepper(data)
+    if conditions is not None:
+        for node in data["nodes"]:
+            if node["name"] not in conditions.index:
+                continue
+            volume = conditions.loc[node["name"]]
+            node["initial_volume"] = volume["Initial Volume"]
+            node["initial_volume_pc"] = volume["Initial Volume"] / volume["Max Volume"]
+    return data
+
+
+def split_timesteps(data, segments, spin_up):
+    """Split the timestepper of `data` in to `segments` and return `(spin_up_start, start, end)` of each.
+
+    Each segment after the first starts `spin_up` days early (or at the start of the
+    model), rounded to whole time-steps so that it shares its time-steps with the
+    serial run.
+    """
+    timestep = int(data["timestepper"].get("timestep", 1))
+    index = pandas.date_range(data["timestepper"]["start"], data["timestepper"]["end"], freq=f'{timestep}D')
+    steps = int(np.ceil(spin_up / timestep))
+    result = []
+    for i, positions in enumerate(np.array_split(np.arange(len(index)), segments)):
+        if len(positions) == 0:
+            continue
+        first = positions[0] if i == 0 else max(positions[0] - steps, 0)
+        result.append((index[first].date(), index[positions[0]].date(), index[positions[-1]].date()))
+    return result
+
+
+def _recorder_kinds(model):
+    kinds = {}
+    for r in model.recorders:
+        if isinstance(r, StorageRecorder):
+            kinds[r.name] = 'storage'
+        elif isinstance(r, IndexParameterRecorder):
+            kinds[r.name] = 'index'
+    return kinds
+
+
+def _dataframe(model):
+    # The daily series of every recorder that has one
+    dfs = {}
+    for r in model.recorders:
+        if hasattr(r, 'to_dataframe'):
+            df = r.to_dataframe()
+            if isinstance(df.index, pandas.PeriodIndex):
+                dfs[r.name] = df
+    df = pandas.concat(dfs, axis=1)
+    df.columns.set_names('Recorder', level=0, inplace=True)
+    return df
+
+
+def run_segment(json_path, output_path, spin_up_start, start, end, conditions=None, solver='glpk-edge', patch=True):
+    """Run the model in `json_path` from `spin_up_start` to `end` and return its results from `start`.
+
+    The segment's copy of the model is written to `output_path`, with its relative paths
+    rewritten so that they still resolve (see `pywr_model.patches.relocate_paths`).
+    Returns the DataFrame of the recorders' daily series, the kind ("storage" or "index")
+    of the recorders whose divergence is reported and the wall time.
+    """
+    with open(json_path) as fh:
+        data = json.load(fh)
+    data = relocate_paths(data, os.path.dirname(json_path), os.path.dirname(output_path))
+    data = patch_json_data_segment(data, spin_up_start, end, conditions=conditions)
+    with open(output_path, mode="w") as fh:
+        json.dump(data, fh, indent=2)
+
+    t0 = time.perf_counter()
+    model = StatisticsModel.load(output_path, solver=solver)
+    if patch:
+        patch_model(model)
+    model.run()
+    wall_time = time.perf_counter() - t0
+    df = _dataframe(model)
+    return df[df.index.start_time >= pandas.Timestamp(start)], _recorder_kinds(model), wall_time
+
+
+def join_divergence(stitched, serial, joins, kinds, window=365, tolerance=1e-6):
+    """Report how far the stitched results diverge from the serial run after each join.
+
+    For each join (the first time-step of a segment after the first) and each of the
+    `kinds` of recorder, over the following `window` time-steps: the difference at the
+    join, the maximum and mean absolute difference, the fraction of time-steps that
+    differ by more than `tolerance` and the number of time-steps until the difference
+    stays within `tolerance` (NaN if it does not within the window). Storage differences
+    are also given relative to the largest serial volume of the recorder.
+    """
+    rows = []
+    for join in joins:
+        position = stitched.index.get_loc(pandas.Period(join, freq=stitched.index.freq))
+        for name, kind in kinds.items():
+            if name not in stitched.columns.get_level_values(0):
+                continue
+            a = stitched[name].values[position:position + window]
+            b = serial[name].values[position:position + window]
+            difference = np.abs(a - b).max(axis=1)
+            within = difference <= tolerance
+            outside = np.flatnonzero(~within)
+            converged_after = 0 if len(outside) == 0 else outside[-1] + 1
+            scale = np.abs(serial[name].values).max()
+            rows.append({
+                'join': str(join),
+                'recorder': name,
+                'kind': kind,
+                'difference_at_join': difference[0],
+                'max_abs_difference': difference.max(),
+                'mean_abs_difference': difference.mean(),
+                'max_rel_difference': difference.max() / scale if kind == 'storage' and scale > 0 else np.nan,
+                'differing_fraction': 1.0 - within.mean(),
+                'converged_after': converged_after if converged_after < len(difference) else np.nan,
+            })
+    return pandas.DataFrame(rows).set_index(['join', 'recorder'])
+
+
+def run(json_path, csv_path, segments=None, spin_up=730, conditions_path=RESERVOIR_CONDITIONS, solver='glpk-edge',
+        max_workers=None, compare=True, patch=True, window=365, tolerance=1e-6):
+    """Run the model in time segments in parallel and stitch the results together.
+
+    The timestepper range is split in to `segments` (by default one per CPU). Every
+    segment after the first starts `spin_up` days early from the initial volumes in
+    `conditions_path` (`reservoir_conditions.csv`) and its spin-up is discarded; the
+    first segment starts from the model's own initial conditions. The segments run in
+    `max_workers` processes and their daily results are stitched in to `csv_path`.
+    With `patch` the TUBs and NEUBs parameters and recorders of `pywr_model.patch_model`
+    are added to each segment.
+
+    If `compare` is True the model is also run serially and the divergence of the
+    stitched storage and index (e.g. TUBs/NEUBs) recorders at each join (see
+    `join_divergence`) is written with a `_divergence` suffix. The timings of the
+    segments (and the serial run) are written with a `_segments` suffix. Returns the
+    stitched DataFrame and the divergence report (None without `compare`).
+    """
+    if segments is None:
+        segments = os.cpu_count() or 1
+    with open(json_path) as fh:
+        data = json.load(fh)
+    conditions = read_reservoir_conditions(conditions_path)
+    split = split_timesteps(data, segments, spin_up)
+
+    # The copies of the model are written next to the results
+    root, ext = os.path.splitext(os.path.join(os.path.dirname(csv_path), os.path.basename(json_path)))
+    results = [None] * len(split)
+    # The executor's threads can trigger a garbage collection and GLPK aborts if a model
+    # is freed on a different thread to the one that built it
+    gc.collect()
+    t0 = time.perf_counter()
+    with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {}
+        for i, (spin_up_start, start, end) in enumerate(split):
+            future = executor.submit(run_segment, json_path, f'{root}_segment{i}{ext}', spin_up_start, start, end,
+                                     conditions=conditions if i > 0 else None, solver=solver, patch=patch)
+            futures[future] = i
+        for future in concurrent.futures.as_completed(futures):
+            results[futures[future]] = future.result()
+    parallel_time = time.perf_counter() - t0
+
+    stitched = pandas.concat([df for df, _, _ in results])
+    kinds = results[0][1]
+    stitched.to_csv(csv_path)
+
+    out_root, out_ext = os.path.splitext(csv_path)
+    timings = pandas.DataFrame([
+        {'segment': i, 'spin_up_start': str(s), 'start': str(start), 'end': str(end), 'wall_time': wall_time}
+        for i, ((s, start, end), (_, _, wall_time)) in enumerate(zip(split, results))
+    ]).set_index('segment')
+    timings.loc['parallel', 'wall_time'] = parallel_time
+
+    divergence = None
+    if compare:
+        serial, _, serial_time = run_segment(json_path, f'{root}_serial{ext}', split[0][0], split[0][1], split[-1][2],
+                                             solver=solver, patch=patch)
+        timings.loc['serial', 'wall_time'] = serial_time
+        divergence = join_divergence(stitched, serial, [start for _, start, _ in split[1:]], kinds, window=window,
+                                     tolerance=tolerance)
+        divergence.to_csv(f'{out_root}_divergence{out_ext}')
+    timings.to_csv(f'{out_root}_segments{out_ext}')
+    return stitched, divergence
+
+
+if __name__ == "__main__":
+    for result in run("working_directory/inputs/run.json", "working_directory/results/segmented_run.csv"):
+        print(result)
@@ -0,0 +1,287 @@
+import json
+import os
+import sqlite3
+import numpy as np
+import pandas
+import platypus
+from scipy.stats import qmc
+from pywr_model.run_statistics import StatisticsBisectionSearchModel
+from pywr_model.lp_updates import FIXED_ONCE_SOLVER_ARGS
+from pywr_model.patches import compact_index_dtype, write_patched_json
+from scripts.async_moea import TimedJob
+from scripts.moea_run import YWWrapper
+
+CREATE_SAMPLES_SQL = """
+        CREATE TABLE IF NOT EXISTS sensitivity_design (
+            id INTEGER PRIMARY KEY,
+            definition JSON
+            );
+
+        CREATE TABLE IF NOT EXISTS sensitivity_samples (
+            sample INTEGER PRIMARY KEY,
+            x JSON,
+            outputs JSON
+            );
+    """
+
+
+def variable_names(wrapper):
+    """Return a name for each element of the variables of `wrapper`, in the order of `wrapper.problem.types`."""
+    names = []
+    for var in wrapper.model_variables:
+        size = var.double_size + var.integer_size
+        names.extend(var.name if size == 1 else f'{var.name}[{i}]' for i in range(size))
+    return names
+
+
+def morris_sample(nvars, trajectories, levels=4, seed=None):
+    """Return the `(trajectories * (nvars + 1), nvars)` Morris design in the unit hypercube.
+
+    Each trajectory starts from a random point of the `levels` grid and changes one
+    variable at a time, in a random order, by +/- `levels / (2 * (levels - 1))`.
+    """
+    if levels < 2 or levels % 2:
+        raise ValueError('The number of Morris levels must be even.')
+    rng = np.random.default_rng(seed)
+    delta = levels / (2 * (levels - 1))
+    x = np.empty((trajectories, nvars + 1, nvars))
+    for t in range(trajectories):
+        point = rng.integers(0, levels, nvars) / (levels - 1)
+        x[t, 0] = point
+        for k, i in enumerate(rng.permutation(nvars), start=1):
+            point[i] += delta if point[i] + delta <= 1 else -delta
+            x[t, k] = point
+    return x.reshape(-1, nvars)
+
+
+def morris_analyse(x, y):
+    """Return the Morris elementary effect statistics of each variable of the design `x`.
+
+    `y` is the `(nsamples, noutputs)` array of outputs. The effects are per unit of the
+    variable's range. Returns `(nvars, noutputs)` arrays of mu, mu_star and sigma.
+    """
+    nvars = x.shape[1]
+    x = x.reshape(-1, nvars + 1, nvars)
+    y = y.reshape(x.shape[0], nvars + 1, -1)
+    step = np.diff(x, axis=1)
+    changed = np.argmax(np.abs(step), axis=2)
+    effects = np.empty((nvars, x.shape[0], y.shape[2]))
+    for t in range(x.shape[0]):
+        for k, i in enumerate(changed[t]):
+            effects[i, t] = (y[t, k + 1] - y[t, k]) / step[t, k, i]
+    sigma = effects.std(axis=1, ddof=1) if x.shape[0] > 1 else np.full(effects.shape[::2], np.nan)
+    return effects.mean(axis=1), np.abs(effects).mean(axis=1), sigma
+
+
+def sobol_sample(nvars, samples, seed=None):
+    """Return the `(samples * (nvars + 2), nvars)` Saltelli design in the unit hypercube.
+
+    Two matrices A and B are drawn from a scrambled Sobol' sequence; the design has, for
+    each of the `samples` rows, the row of A, the row of A with each variable in turn
+    taken from B, and the row of B.
+    """
+    base = qmc.Sobol(2 * nvars, scramble=True, seed=seed).random(samples)
+    a, b = base[:, :nvars], base[:, nvars:]
+    x = np.repeat(a[:, np.newaxis, :], nvars + 2, axis=1)
+    for i in range(nvars):
+        x[:, i + 1, i] = b[:, i]
+    x[:, -1] = b
+    return x.reshape(-1, nvars)
+
+
+def _sobol_indices(ya, yab, yb):
+    variance = np.var(np.concatenate([ya, yb]), axis=0)
+    variance = np.where(variance > 0, variance, np.nan)
+    first = np.mean(yb[:, np.newaxis] * (yab - ya[:, np.newaxis]), axis=0) / variance
+    total = 0.5 * np.mean((ya[:, np.newaxis] - yab)**2, axis=0) / variance
+    return first, total
+
+
+def sobol_analyse(x, y, num_resamples=100, seed=None):
+    """Return the first order and total Sobol' indices of each variable of the design `x`.
+
+    Uses the estimators of Saltelli et al. (2010) and Jansen (1999). The confidence of
+    each index is 1.96 standard deviations over `num_resamples` bootstrap resamples.
+    Returns `(nvars, noutputs)` arrays of S1, S1_conf, ST and ST_conf.
+    """
+    nvars = x.shape[1]
+    y = y.reshape(-1, nvars + 2, y.shape[1])
+    ya, yab, yb = y[:, 0], y[:, 1:-1], y[:, -1]
+    first, total = _sobol_indices(ya, yab, yb)
+
+    rng = np.random.default_rng(seed)
+    resampled = [_sobol_indices(ya[r], yab[r], yb[r]) for r in rng.integers(0, len(ya), (num_resamples, len(ya)))]
+    first_conf = 1.96 * np.std([r[0] for r in resampled], axis=0, ddof=1)
+    total_conf = 1.96 * np.std([r[1] for r in resampled], axis=0, ddof=1)
+    return first, first_conf, total, total_conf
+
+
+class SampleSet:
+    """The design of a sensitivity analysis and the outputs of its evaluated samples.
+
+    The design and outputs are stored in the `sensitivity_design` and
+    `sensitivity_samples` tables of the archive database, so an analysis that was
+    interrupted can be resumed: only the samples without outputs are evaluated again.
+    """
+    def __init__(self, path):
+        self.path = path
+        with self.connect() as conn:
+            conn.executescript(CREATE_SAMPLES_SQL)
+
+    def connect(self):
+        return sqlite3.connect(str(self.path), timeout=60)
+
+    def definition(self):
+        with self.connect() as conn:
+            row = conn.execute("SELECT definition FROM sensitivity_design WHERE id = 1;").fetchone()
+        return None if row is None else json.loads(row[0])
+
+    def create(self, definition, x):
+        conn = self.connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE;")
+            conn.execute("DELETE FROM sensitivity_design;")
+            conn.execute("DELETE FROM sensitivity_samples;")
+            conn.execute("INSERT INTO sensitivity_design (id, definition) VALUES (1, ?);", (json.dumps(definition), ))
+            conn.executemany("INSERT INTO sensitivity_samples (sample, x) VALUES (?, ?);",
+                             [(i, json.dumps(row.tolist())) for i, row in enumerate(x)])
+            conn.commit()
+        finally:
+            conn.close()
+
+    def design(self):
+        with self.connect() as conn:
+            rows = conn.execute("SELECT x FROM sensitivity_samples ORDER BY sample;").fetchall()
+        return np.array([json.loads(r[0]) for r in rows])
+
+    def pending(self):
+        """Return the indices of the samples that have not been evaluated."""
+        with self.connect() as conn:
+            return [r[0] for r in conn.execute("SELECT sample FROM sensitivity_samples WHERE outputs IS NULL "
+                                               "ORDER BY sample;")]
+
+    def store(self, results):
+        """Store the outputs of a batch of `(sample, outputs)` in one transaction."""
+        with self.connect() as conn:
+            conn.executemany("UPDATE sensitivity_samples SET outputs = ? WHERE sample = ?;",
+                             [(json.dumps(outputs), i) for i, outputs in results])
+
+    def outputs(self):
+        """Return a DataFrame of the outputs of every sample, indexed by sample."""
+        with self.connect() as conn:
+            rows = conn.execute("SELECT sample, outputs FROM sensitivity_samples ORDER BY sample;").fetchall()
+        return pandas.DataFrame.from_dict({i: json.loads(o) for i, o in rows if o is not None}, orient='index')
+
+
+def _outputs(wrapper, solution):
+    # The objective values (without platypus' sign for maximised objectives) and constraint values
+    outputs = {}
+    for r, value in zip(wrapper.model_objectives, solution.objectives):
+        outputs[r.name] = value if r.is_objective == 'minimise' else -value
+    ic = 0
+    for c in wrapper.model_constraints:
+        outputs[c.name] = solution.constraints[ic]
+        ic += 2 if c.is_double_bounded_constraint else 1
+    return outputs
+
+
+def analyse(method, x, outputs, seed=None, num_resamples=100):
+    """Return a DataFrame of the sensitivity indices of each output and variable.
+
+    `x` is the design in the unit hypercube with named columns and `outputs` a DataFrame
+    of the outputs of every sample.
+    """
+    y = outputs.values.astype(np.float64)
+    if method == 'morris':
+        statistics = dict(zip(('mu', 'mu_star', 'sigma'), morris_analyse(x.values, y)))
+    else:
+        statistics = dict(zip(('S1', 'S1_conf', 'ST', 'ST_conf'),
+                              sobol_analyse(x.values, y, num_resamples=num_resamples, seed=seed)))
+    index = pandas.MultiIndex.from_product([outputs.columns, x.columns], names=['output', 'variable'])
+    return pandas.DataFrame({name: values.T.ravel() for name, values in statistics.items()}, index=index)
+
+
+def run(json_path, db_path, method='morris', samples=16, levels=4, seed=0, evaluator=None, batch_size=None,
+        resume=True, patches=(), fixed_once=False, num_resamples=100):
+    """Run a global sensitivity analysis of the objectives and constraints to the model's variables.
+
+    `method` is either 'morris' (elementary effects screening over `samples` trajectories
+    on a grid of `levels`) or 'sobol' (first order and total indices from `samples` base
+    rows of a Saltelli design, preferably a power of 2). The variables and their bounds
+    are those of the MOEA (`PlatypusWrapper.model_variables`) and every sample is
+    evaluated and archived as an MOEA solution, so the evaluators of `moea_run.run` (by
+    default a process pool) can be used; `patches` and `fixed_once` are as in
+    `moea_run.run`.
+
+    Samples are submitted in batches of `batch_size` (by default 4 per CPU) and their
+    outputs committed to the `sensitivity_samples` table of the archive database after
+    every batch. If `resume` is True and the database holds the design of the same
+    analysis only the samples without outputs are evaluated; otherwise the database is
+    deleted first. The indices are written to
+    `sensitivity.csv` next to the archive database and returned.
+    """
+    json_path = write_patched_json(json_path, os.path.dirname(db_path), patches)
+
+    if not resume and os.path.exists(db_path):
+        os.unlink(db_path)
+
+    model_kwargs = {'solver_args': FIXED_ONCE_SOLVER_ARGS} if fixed_once else {}
+    wrapper = YWWrapper(json_path, model_klass=StatisticsBisectionSearchModel, model_kwargs=model_kwargs,
+                        archive_fn=db_path, index_dtype=compact_index_dtype(patches))
+    names = variable_names(wrapper)
+    lower = np.array([t.min_value for t in wrapper.problem.types])
+    upper = np.array([t.max_value for t in wrapper.problem.types])
+
+    definition = {
+        'method': method,
+        'samples': samples,
+        'levels': levels if method == 'morris' else None,
+        'seed': seed,
+        'variables': names,
+        'lower': lower.tolist(),
+        'upper': upper.tolist(),
+    }
+    sample_set = SampleSet(db_path)
+    existing = sample_set.definition()
+    if existing is not None and existing != definition:
+        raise ValueError(f'The archive "{db_path}" holds the samples of a different analysis; '
+                         f'use resume=False to start again.')
+    if existing is None:
+        if method == 'morris':
+            x = morris_sample(len(names), samples, levels=levels, seed=seed)
+        elif method == 'sobol':
+            x = sobol_sample(len(names), samples, seed=seed)
+        else:
+            raise ValueError(f'Unknown sensitivity method "{method}".')
+        sample_set.create(definition, x)
+    x = sample_set.design()
+
+    if evaluator is None:
+        evaluator = platypus.ProcessPoolEvaluator()
+    elif hasattr(evaluator, 'archive') and evaluator.archive is None:
+        # Workers return their archive rows to the evaluator to be stored here
+        evaluator.archive = wrapper.archive
+    if batch_size is None:
+        batch_size = 4 * (os.cpu_count() or 1)
+
+    pending = sample_set.pending()
+    with evaluator:
+        for start in range(0, len(pending), batch_size):
+            batch = pending[start:start + batch_size]
+            jobs = []
+            for i in batch:
+                solution = platypus.Solution(wrapper.problem)
+                solution.variables[:] = (lower + x[i] * (upper - lower)).tolist()
+                jobs.append(TimedJob(solution))
+            jobs = evaluator.evaluate_all(jobs)
+            sample_set.store([(i, _outputs(wrapper, job.solution)) for i, job in zip(batch, jobs)])
+            print(f'Evaluated {start + len(batch)} of {len(pending)} remaining samples.')
+
+    df = analyse(method, pandas.DataFrame(x, columns=names), sample_set.outputs(), seed=seed,
+                 num_resamples=num_resamples)
+    df.to_csv(os.path.join(os.path.dirname(db_path), 'sensitivity.csv'))
+    return df
+
+
+if __name__ == "__main__":
+    print(run("working_directory/inputs/run_MOEA.json", "working_directory/results/sensitivity.db"))
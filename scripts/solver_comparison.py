@@ -0,0 +1,55 @@
+import argparse
+import pandas
+from pywr.solvers import solver_registry
+from pywr_model import patch_model
+from pywr_model.run_statistics import StatisticsModel, StatisticsBisectionSearchModel
+
+
+def available_solvers():
+    return [s.name for s in solver_registry]
+
+
+def run(json_path, csv_path, solvers=None, bisection=False):
+    """Run the same model with each solver and write a table of run statistics.
+
+    The recorder outputs of every solver are compared with those of the first solver
+    so that any difference in the solutions found is reported alongside the timings.
+    """
+    if solvers is None:
+        solvers = available_solvers()
+
+    rows = []
+    reference = None
+    for solver in solvers:
+        if bisection:
+            model = StatisticsBisectionSearchModel.load(json_path, solver=solver)
+            patch_model(model)
+        else:
+            model = StatisticsModel.load(json_path, solver=solver)
+        model.run()
+
+        row = model.aggregated_statistics()
+        df = model.to_dataframe()
+        if reference is None:
+            reference = df
+            row['max_abs_difference'] = 0.0
+        else:
+            row['max_abs_difference'] = float((df - reference).abs().max().max())
+        if bisection:
+            row['bisect_value'] = model.parameters[model.bisect_parameter].get_double_variables()[0]
+        rows.append(row)
+
+    df = pandas.DataFrame(rows).set_index('solver')
+    df.to_csv(csv_path)
+    return df
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the available pywr solvers on one model.")
+    parser.add_argument("json_path")
+    parser.add_argument("csv_path")
+    parser.add_argument("--solvers", nargs="+", default=None, choices=available_solvers())
+    parser.add_argument("--bisection", action="store_true",
+                        help="Run a deployable output bisection search (e.g. with run_DO.json).")
+    args = parser.parse_args()
+    print(run(args.json_path, args.csv_path, solvers=args.solvers, bisection=args.bisection))
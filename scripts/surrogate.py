@@ -0,0 +1,217 @@
+import concurrent.futures
+import random
+import threading
+import numpy as np
+import pandas
+import platypus
+from scripts.async_moea import submit_job
+from scripts.progress import objective_signs
+
+
+class GaussianProcess:
+    """A multi-output Gaussian process regression with a shared squared exponential kernel.
+
+    Inputs should be scaled to the unit hypercube. The length scale is set to the median
+    distance between the training inputs and each output is standardised before fitting.
+    """
+    def __init__(self, noise=1e-3):
+        self.noise = noise
+
+    def _kernel(self, a, b):
+        d2 = np.sum(a**2, axis=1)[:, None] + np.sum(b**2, axis=1)[None, :] - 2 * a @ b.T
+        return np.exp(-0.5 * np.maximum(d2, 0.0) / self.length_scale**2)
+
+    def fit(self, x, y):
+        self.x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        self.y_mean = y.mean(axis=0)
+        self.y_std = np.where(y.std(axis=0) > 0, y.std(axis=0), 1.0)
+
+        d = np.sqrt(np.maximum(np.sum((self.x[:, None, :] - self.x[None, :, :])**2, axis=2), 0.0))
+        self.length_scale = np.median(d[d > 0]) if np.any(d > 0) else 1.0
+
+        k = self._kernel(self.x, self.x) + self.noise * np.eye(len(self.x))
+        self._chol = np.linalg.cholesky(k)
+        self._alpha = np.linalg.solve(self._chol.T, np.linalg.solve(self._chol, (y - self.y_mean) / self.y_std))
+        return self
+
+    def predict(self, x):
+        """Return the predicted mean and standard deviation of each output."""
+        k = self._kernel(np.asarray(x, dtype=np.float64), self.x)
+        mean = k @ self._alpha
+        v = np.linalg.solve(self._chol, k.T)
+        var = np.maximum(1.0 - np.sum(v**2, axis=0), 0.0)
+        return mean * self.y_std + self.y_mean, np.sqrt(var)[:, None] * self.y_std
+
+
+class SurrogateEvaluator(platypus.Evaluator):
+    """Wrap an evaluator to pre-screen candidates with a surrogate of the simulation.
+
+    A Gaussian process is fitted to the variables, objectives and constraints of the
+    solutions that have been simulated (the most recent `max_samples`), and refitted
+    after every `refit_every` new simulations. Once there are `min_samples` of them each
+    candidate is screened out, and given its predicted objectives and constraints instead
+    of being simulated, if the surrogate is confident (by `confidence` standard
+    deviations) that the candidate is infeasible or dominated by a simulated solution.
+    Every other candidate, i.e. promising or uncertain, is simulated.
+
+    A random `audit_fraction` of the screened candidates are simulated anyway to measure
+    how often the screening is wrong. `statistics_to_dataframe` returns the log of every
+    candidate and `summary` the savings and surrogate quality over the run.
+    """
+    def __init__(self, evaluator, min_samples=64, max_samples=500, refit_every=16, confidence=2.0,
+                 audit_fraction=0.1):
+        super().__init__()
+        self.evaluator = evaluator
+        self.min_samples = min_samples
+        self.max_samples = max_samples
+        self.refit_every = refit_every
+        self.confidence = confidence
+        self.audit_fraction = audit_fraction
+        self.log = []
+        self._x = []
+        self._y = []
+        self._front = None
+        self._gp = None
+        self._fitted_at = 0
+        # Results of submitted jobs are learnt from the executor's thread
+        self._lock = threading.Lock()
+
+    def _encode(self, solution):
+        problem = solution.problem
+        x = [(v - t.min_value) / (t.max_value - t.min_value) if t.max_value > t.min_value else 0.0
+             for t, v in zip(problem.types, solution.variables)]
+        return np.array(x, dtype=np.float64)
+
+    @staticmethod
+    def _dominated(front, objectives):
+        return len(front) > 0 and bool(np.any(np.all(front <= objectives, axis=1) & np.any(front < objectives, axis=1)))
+
+    def _learn(self, solution):
+        self._x.append(self._encode(solution))
+        self._y.append(np.concatenate([np.ravel(solution.objectives), np.ravel(solution.constraints)]))
+
+        # Keep the simulated, feasible and non-dominated objectives (as minimised) up to date
+        signs = objective_signs(solution.problem)
+        if self._front is None:
+            self._front = np.empty((0, len(signs)))
+        objectives = np.ravel(solution.objectives) * signs
+        if solution.feasible and not self._dominated(self._front, objectives):
+            keep = ~(np.all(objectives <= self._front, axis=1) & np.any(objectives < self._front, axis=1))
+            self._front = np.vstack([self._front[keep], objectives])
+
+    def _model(self):
+        n = len(self._x)
+        if n < self.min_samples:
+            return None
+        if self._gp is None or n - self._fitted_at >= self.refit_every:
+            self._gp = GaussianProcess().fit(self._x[-self.max_samples:], self._y[-self.max_samples:])
+            self._fitted_at = n
+        return self._gp
+
+    def _screen(self, solutions):
+        """Return the prediction and the reason to screen out (or None) for each solution."""
+        with self._lock:
+            gp = self._model()
+            if gp is None or len(solutions) == 0:
+                return [(None, None)] * len(solutions)
+            problem = solutions[0].problem
+            signs = objective_signs(problem)
+            nobjs = problem.nobjs
+            front = self._front.copy()
+        mean, std = gp.predict([self._encode(s) for s in solutions])
+
+        results = []
+        for m, s in zip(mean, std):
+            reason = None
+            lo, hi = m - self.confidence * s, m + self.confidence * s
+            for i, constraint in enumerate(problem.constraints):
+                j = nobjs + i
+                violation = min(abs(constraint(lo[j])), abs(constraint(m[j])), abs(constraint(hi[j])))
+                if violation > 0:
+                    reason = 'infeasible'
+                    break
+            if reason is None:
+                optimistic = np.minimum(lo[:nobjs] * signs, hi[:nobjs] * signs)
+                if self._dominated(front, optimistic):
+                    reason = 'dominated'
+            results.append((m, reason))
+        return results
+
+    def _apply_prediction(self, solution, prediction):
+        problem = solution.problem
+        solution.objectives[:] = prediction[:problem.nobjs].tolist()
+        solution.constraints[:] = prediction[problem.nobjs:].tolist()
+        solution.constraint_violation = sum(abs(f(x)) for f, x in zip(problem.constraints, solution.constraints))
+        solution.feasible = solution.constraint_violation == 0.0
+        solution.evaluated = True
+
+    def _record(self, solution, prediction, reason, simulated):
+        entry = {'screened': reason is not None, 'reason': reason, 'simulated': simulated}
+        if prediction is not None and simulated:
+            actual = np.concatenate([np.ravel(solution.objectives), np.ravel(solution.constraints)])
+            for i, (p, a) in enumerate(zip(prediction, actual)):
+                entry[f'error{i}'] = p - a
+            if reason is not None:
+                # Audit of a screened candidate: was the screening right?
+                objectives = np.ravel(solution.objectives) * objective_signs(solution.problem)
+                entry['screening_correct'] = (not solution.feasible) or self._dominated(self._front, objectives)
+        self.log.append(entry)
+
+    def _finish(self, job, prediction, reason):
+        with self._lock:
+            self._record(job.solution, prediction, reason, simulated=True)
+            self._learn(job.solution)
+
+    def evaluate_all(self, jobs, **kwargs):
+        screening = self._screen([job.solution for job in jobs])
+        simulate = []
+        for job, (prediction, reason) in zip(jobs, screening):
+            if reason is None or random.random() < self.audit_fraction:
+                simulate.append((job, prediction, reason))
+            else:
+                self._apply_prediction(job.solution, prediction)
+                self._record(job.solution, prediction, reason, simulated=False)
+
+        results = self.evaluator.evaluate_all([job for job, _, _ in simulate], **kwargs)
+        results = {id(job): result for (job, _, _), result in zip(simulate, results)}
+        for job, prediction, reason in simulate:
+            self._finish(results[id(job)], prediction, reason)
+        return [results.get(id(job), job) for job in jobs]
+
+    def submit(self, job):
+        (prediction, reason), = self._screen([job.solution])
+        if reason is not None and random.random() >= self.audit_fraction:
+            self._apply_prediction(job.solution, prediction)
+            with self._lock:
+                self._record(job.solution, prediction, reason, simulated=False)
+            future = concurrent.futures.Future()
+            future.set_result(job)
+            return future
+
+        future = submit_job(self.evaluator, job)
+        future.add_done_callback(lambda f: self._finish(f.result(), prediction, reason))
+        return future
+
+    def statistics_to_dataframe(self):
+        return pandas.DataFrame(self.log)
+
+    def summary(self):
+        """The real-evaluation savings and surrogate quality over the run."""
+        df = self.statistics_to_dataframe()
+        n = len(df)
+        summary = {
+            'candidates': n,
+            'simulated': int(df['simulated'].sum()) if n else 0,
+            'screened_out': int((df['screened'] & ~df['simulated']).sum()) if n else 0,
+        }
+        summary['savings'] = summary['screened_out'] / n if n else 0.0
+        errors = [c for c in df.columns if c.startswith('error')]
+        for c in errors:
+            summary[f'rmse{c[5:]}'] = float(np.sqrt(np.nanmean(df[c]**2)))
+        if 'screening_correct' in df:
+            summary['screening_accuracy'] = float(df['screening_correct'].dropna().astype(float).mean())
+        return summary
+
+    def close(self):
+        self.evaluator.close()
@@ -0,0 +1,218 @@
+import collections
+import gc
+import http.server
+import json
+import os
+import threading
+import time
+import numpy as np
+
+
+class TelemetryWriter:
+    """Append structured events to a JSON-lines file shared by the coordinator and its workers.
+
+    The writer is pickled with the objects that hold it (e.g. the MOEA wrapper) and
+    opens the file lazily in each process. Every event is a single short line written
+    with one `write` call to a file opened in append mode, so lines from different
+    processes do not interleave. The time spent emitting is kept in `overhead` and
+    reported with each event so that the cost of the telemetry itself can be measured.
+    """
+    def __init__(self, path):
+        self.path = str(path)
+        self.overhead = 0.0
+        self._fh = None
+        self._pid = None
+
+    def __getstate__(self):
+        return {'path': self.path, 'overhead': 0.0, '_fh': None, '_pid': None}
+
+    def emit(self, event, **fields):
+        t0 = time.perf_counter()
+        if self._pid != os.getpid():
+            self._fh = open(self.path, mode='a', buffering=1)
+            self._pid = os.getpid()
+        fields.update({'event': event, 'time': time.time(), 'pid': self._pid, 'overhead': self.overhead})
+        self._fh.write(json.dumps(fields, default=float) + '\n')
+        self.overhead += time.perf_counter() - t0
+
+    def close(self):
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+            self._pid = None
+
+
+class TelemetryCallback:
+    """Wrap an MOEA callback to emit a `generation` event after calling it."""
+    def __init__(self, callback, writer):
+        self.callback = callback
+        self.writer = writer
+
+    def __call__(self, algorithm):
+        if self.callback is not None:
+            self.callback(algorithm)
+        archive = getattr(algorithm, 'archive', None)
+        self.writer.emit('generation', nfe=algorithm.nfe, archive_size=len(archive) if archive is not None else None)
+
+
+def _percentiles(values):
+    if len(values) == 0:
+        return None
+    p50, p90, p99 = np.percentile(values, [50, 90, 99])
+    return {'mean': float(np.mean(values)), 'p50': float(p50), 'p90': float(p90), 'p99': float(p99),
+            'max': float(np.max(values))}
+
+
+class TelemetryAggregator:
+    """Follow a telemetry file in a background thread and keep a rolling summary of the run.
+
+    Every `interval` seconds the new events are read and the summary (see `summary`)
+    over the last `window` seconds is written to `status_path`, if given. If `port` is
+    given the summary is also served as JSON at `http://localhost:<port>/`.
+
+    GLPK aborts the interpreter if a pywr model is freed on a different thread to the one
+    that built it, and a garbage collection runs on whichever thread happens to allocate.
+    `start` and `stop` should be called from the thread that builds the models (the main
+    thread) and collect the models that are no longer referenced before the background
+    threads start and after they end; models that are in use while the aggregator runs
+    must stay referenced until it is stopped.
+    """
+    def __init__(self, path, status_path=None, port=None, interval=1.0, window=60.0):
+        self.path = str(path)
+        self.status_path = status_path
+        self.port = port
+        self.interval = interval
+        self.window = window
+        self._events = collections.deque()
+        self._totals = collections.Counter()
+        self._overhead = {}
+        self._busy = collections.defaultdict(float)
+        self._last = {}
+        self._start = time.time()
+        self._offset = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._server = None
+
+    def _read(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path) as fh:
+            fh.seek(self._offset)
+            lines = fh.readlines()
+            # Leave a partially written line for the next read
+            if lines and not lines[-1].endswith('\n'):
+                lines.pop()
+            self._offset += sum(len(line) for line in lines)
+
+        with self._lock:
+            for line in lines:
+                event = json.loads(line)
+                kind = event['event']
+                self._totals[kind] += 1
+                self._overhead[event['pid']] = event['overhead']
+                self._last[kind] = event
+                if kind == 'evaluation':
+                    self._busy[event['pid']] += event['duration']
+                self._events.append(event)
+            cutoff = time.time() - self.window
+            while self._events and self._events[0]['time'] < cutoff:
+                self._events.popleft()
+
+    def summary(self):
+        """Return the rolling summary of the run.
+
+        Over the last `window` seconds: the evaluations per second, the evaluation and
+        archive write latencies, the bisection iterations per solution and the idle
+        fraction of each worker. Since the start: the event counts, the last generation
+        and simulation, and the time spent emitting events relative to the time spent
+        evaluating.
+        """
+        with self._lock:
+            now = time.time()
+            span = min(self.window, now - self._start)
+            evaluations = [e for e in self._events if e['event'] == 'evaluation']
+            simulations = [e for e in self._events if e['event'] == 'simulation']
+
+            workers = {}
+            for e in evaluations:
+                workers.setdefault(e['pid'], 0.0)
+                workers[e['pid']] += e['duration']
+            busy = sum(self._busy.values())
+            overhead = sum(self._overhead.values())
+            return {
+                'elapsed': now - self._start,
+                'window': span,
+                'totals': dict(self._totals),
+                'evaluations_per_second': len(evaluations) / span if span > 0 else None,
+                'evaluation_latency': _percentiles([e['duration'] for e in evaluations]),
+                'archive_write_latency': _percentiles([e['archive_write'] for e in evaluations
+                                                       if e.get('archive_write') is not None]),
+                'bisection_iterations': _percentiles([e['iterations'] for e in evaluations]),
+                'simulation_wall_time': _percentiles([e['wall_time'] for e in simulations]),
+                'worker_idle_fraction': {str(pid): max(1.0 - b / span, 0.0) for pid, b in workers.items()}
+                if span > 0 else {},
+                'last_generation': self._last.get('generation'),
+                'last_simulation': self._last.get('simulation'),
+                'telemetry_overhead': overhead,
+                'telemetry_overhead_fraction': overhead / busy if busy > 0 else None,
+            }
+
+    def write_status(self):
+        tmp = f'{self.status_path}.tmp'
+        with open(tmp, mode='w') as fh:
+            json.dump(self.summary(), fh, indent=2)
+        os.replace(tmp, self.status_path)
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            self.update()
+
+    def update(self):
+        self._read()
+        if self.status_path is not None:
+            self.write_status()
+
+    def _serve(self):
+        aggregator = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = json.dumps(aggregator.summary(), indent=2).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = http.server.ThreadingHTTPServer(('localhost', self.port), Handler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def start(self):
+        gc.collect()
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+        if self.port is not None:
+            self._serve()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+        gc.collect()
+        # Pick up the events written since the last update
+        self.update()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
@@ -0,0 +1,61 @@
+import copy
+import json
+import pytest
+
+
+TOY_MODEL = {
+    "metadata": {"title": "Toy reservoir", "minimum_version": "0.5"},
+    "timestepper": {"start": "1920-01-01", "end": "1921-12-31", "timestep": 1},
+    "nodes": [
+        {"name": "Catch", "type": "catchment", "flow": "Inflow"},
+        {"name": "Res", "type": "storage", "max_volume": 1000, "initial_volume_pc": 0.8, "cost": "Res Curve"},
+        {"name": "Spill", "type": "link", "cost": 100},
+        {"name": "L1", "type": "link"},
+        {"name": "L2", "type": "link"},
+        {"name": "Demand", "type": "output", "max_flow": "Demand Flow", "cost": -500},
+        {"name": "Sink", "type": "output"},
+    ],
+    "edges": [["Catch", "Res"], ["Res", "Spill"], ["Spill", "Sink"], ["Res", "L1"], ["L1", "L2"], ["L2", "Demand"]],
+    "parameters": {
+        "Inflow base": {"type": "monthlyprofile", "values": [20, 18, 15, 10, 5, 3, 2, 3, 6, 12, 18, 22]},
+        "Inflow factor": {"type": "constantscenario", "scenario": "climate", "values": [0.6, 1.0, 1.4]},
+        "Inflow": {"type": "aggregated", "agg_func": "product", "parameters": ["Inflow base", "Inflow factor"]},
+        "Demand Profile": {"type": "monthlyprofile", "values": [10, 10, 10, 11, 12, 13, 14, 13, 12, 11, 10, 10]},
+        "Demand Scaling Factor": {"type": "constant", "value": 0.5, "lower_bounds": 0.5, "upper_bounds": 2.0},
+        "Demand Flow": {"type": "aggregated", "agg_func": "product",
+                        "parameters": ["Demand Profile", "Demand Scaling Factor"]},
+        "Res line1": {"type": "monthlyprofile", "values": [0.5] * 12},
+        "Res Curve": {"type": "controlcurve", "storage_node": "Res", "control_curves": ["Res line1"],
+                      "values": [-10, -20]},
+    },
+    "recorders": {
+        "Demand flow": {"type": "numpyarraynoderecorder", "node": "Demand"},
+        "Res vol": {"type": "numpyarraystoragerecorder", "node": "Res"},
+        "Demand total": {"type": "totalflownoderecorder", "node": "Demand"},
+        "Res min": {"type": "minimumvolumestoragerecorder", "node": "Res", "constraint_lower_bounds": 200},
+    },
+    "scenarios": [{"name": "climate", "size": 3}],
+    "bisection": {"parameter": "Demand Scaling Factor", "epsilon": 0.01, "error_on_infeasible": False},
+}
+
+
+@pytest.fixture
+def model_data():
+    """A two year, three scenario reservoir model supplying a demand."""
+    return copy.deepcopy(TOY_MODEL)
+
+
+@pytest.fixture
+def write_model(tmp_path):
+    """Return a function that writes model data to a JSON file in `tmp_path` and returns its path."""
+    def write(data, name="model.json"):
+        path = tmp_path / name
+        with open(path, mode="w") as fh:
+            json.dump(data, fh, indent=2)
+        return str(path)
+    return write
+
+
+@pytest.fixture
+def model_path(model_data, write_model):
+    return write_model(model_data)
@@ -0,0 +1,81 @@
+import copy
+import numpy as np
+import pandas
+import pytest
+from pywr.core import Model
+from pywr_model.aggregation_recorders import (PeriodStatisticsNodeRecorder, aggregated_dataframe,
+                                              patch_json_data_aggregate, write_aggregated_results)
+from pywr_model.snapshot import ResumableModel, uncaptured_components
+
+
+def _daily_and_aggregated(model_data, period, **kwargs):
+    daily = Model.load(copy.deepcopy(model_data))
+    daily.run()
+    aggregated = Model.load(patch_json_data_aggregate(copy.deepcopy(model_data), period=period, **kwargs))
+    aggregated.run()
+    return daily, aggregated
+
+
+@pytest.mark.parametrize("period", ["M", "Y"])
+def test_period_statistics_match_pandas(model_data, period):
+    daily, aggregated = _daily_and_aggregated(model_data, period)
+    for name in ("Demand flow", "Res vol"):
+        series = daily.recorders[name].to_dataframe()
+        groups = series.groupby(series.index.asfreq(period, how='start'))
+        df = aggregated.recorders[name].to_dataframe()
+        for stat in ("mean", "min", "max", "sum"):
+            np.testing.assert_allclose(df[stat].values, groups.agg(stat).values, rtol=1e-10, atol=1e-10)
+    assert len(df) == (24 if period == "M" else 2)
+
+
+@pytest.mark.parametrize("agg_func", ["mean", "min", "max", "sum"])
+def test_values_match_numpy_recorders(model_data, agg_func):
+    model_data["recorders"]["Demand flow"]["temporal_agg_func"] = agg_func
+    daily, aggregated = _daily_and_aggregated(model_data, "M")
+    np.testing.assert_allclose(aggregated.recorders["Demand flow"].values(), daily.recorders["Demand flow"].values(),
+                               rtol=1e-12)
+
+
+def test_weekly_timestep_weighted_by_days(model_data):
+    model_data["timestepper"]["timestep"] = 7
+    model = Model.load(patch_json_data_aggregate(model_data, period="Y", stats=["mean", "sum"]))
+    model.run()
+    recorder = model.recorders["Demand flow"]
+    df = recorder.to_dataframe()
+    assert list(df.columns.get_level_values(0).unique()) == ["mean", "sum"]
+    # Every time-step is seven days, so the sum is seven times the sum of the flows
+    assert recorder._days.sum() == 7 * len(model.timestepper)
+    np.testing.assert_allclose(df["sum"].values.sum(axis=0), recorder.values() * recorder._days.sum())
+
+
+def test_invalid_statistic(model_path):
+    model = Model.load(model_path)
+    with pytest.raises(ValueError, match="median"):
+        PeriodStatisticsNodeRecorder(model, model.nodes["Demand"], stats=["median"])
+
+
+def test_write_aggregated_results(model_data, tmp_path):
+    model = Model.load(patch_json_data_aggregate(model_data, period="Y"))
+    model.run()
+    df = aggregated_dataframe(model)
+    assert df.columns.names == ["Recorder", "Statistic", "climate"]
+    assert set(df.columns.get_level_values(0)) == {"Demand flow", "Res vol"}
+
+    write_aggregated_results(model, tmp_path / "run.csv")
+    assert (tmp_path / "run.csv").exists()
+    # Only the period statistics are recorded, so there is no daily output
+    assert not (tmp_path / "run_daily.csv").exists()
+
+
+def test_resume(model_data):
+    model_data["recorders"] = {name: r for name, r in model_data["recorders"].items() if "numpyarray" in r["type"]}
+    model = ResumableModel.load(patch_json_data_aggregate(model_data))
+    model.setup()
+    assert uncaptured_components(model) == []
+
+    model.snapshot_timesteps = {400}
+    model.run()
+    full = aggregated_dataframe(model)
+    model.resume_snapshot = model.snapshots[400]
+    model.run()
+    pandas.testing.assert_frame_equal(aggregated_dataframe(model), full)
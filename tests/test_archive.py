@@ -0,0 +1,133 @@
+import numpy as np
+import pytest
+from scripts.archive import Archive, non_dominated, objective_score
+
+
+def _brute_force_front(scores):
+    n = scores.shape[0]
+    mask = np.ones(n, dtype=bool)
+    for i in range(n):
+        for j in range(n):
+            if i == j:
+                continue
+            dominates = np.all(scores[j] <= scores[i]) and np.any(scores[j] < scores[i])
+            # Of equal rows only the first is kept
+            if dominates or (np.all(scores[j] == scores[i]) and j < i):
+                mask[i] = False
+                break
+    return mask
+
+
+def _solution(rng, feasible=True):
+    objectives = {
+        'cost': {'value': float(rng.integers(0, 20)), 'direction': 'minimise'},
+        'yield': {'value': float(rng.integers(0, 20)), 'direction': 'maximise'},
+    }
+    constraints = {'storage': {'value': 1.0, 'is_constraint_violated': not feasible}}
+    return {'x': float(rng.random())}, objectives, constraints
+
+
+@pytest.fixture
+def archive(tmp_path):
+    return Archive(tmp_path / 'archive.db')
+
+
+def test_objective_score():
+    assert objective_score(2.0, 'maximise') == -2.0
+    assert objective_score(2.0, 'minimise') == 2.0
+
+
+def test_non_dominated():
+    rng = np.random.default_rng(0)
+    scores = rng.integers(0, 10, size=(200, 3)).astype(np.float64)
+    np.testing.assert_array_equal(non_dominated(scores), _brute_force_front(scores))
+
+
+def test_incremental_pareto_front(archive):
+    rng = np.random.default_rng(1)
+    rows = {}
+    for i in range(150):
+        variables, objectives, constraints = _solution(rng, feasible=i % 5 != 0)
+        solution_id = archive.insert(variables, objectives, constraints)
+        if i % 5 != 0:
+            rows[solution_id] = [objectives['cost']['value'], -objectives['yield']['value']]
+
+    ids = np.array(list(rows.keys()))
+    expected = ids[_brute_force_front(np.array(list(rows.values())))]
+    front = archive.pareto_front()
+    assert sorted(front.index) == sorted(expected)
+    assert len(archive.feasible()) == len(rows)
+
+    # Rebuilding from the JSON columns gives the same front
+    archive.rebuild()
+    assert sorted(archive.pareto_front().index) == sorted(expected)
+
+
+def test_top_k_and_solutions(archive):
+    rng = np.random.default_rng(2)
+    for i in range(20):
+        archive.insert(*_solution(rng, feasible=i % 2 == 0))
+
+    top = archive.top_k('yield', 3)
+    feasible = archive.feasible()
+    assert list(top['yield']) == sorted(feasible['yield'], reverse=True)[:3]
+
+    solutions = archive.solutions(top.index, columns=('vars', 'cons'))
+    assert set(solutions.keys()) == set(top.index)
+    assert all(not s['cons']['storage']['is_constraint_violated'] for s in solutions.values())
+    assert archive.objective_names() == ['cost', 'yield']
+
+
+def _arrays(rng):
+    metrics = {'Res min': {'value': float(rng.random()), 'type': 'MinimumVolumeStorageRecorder'},
+               'Demand total': {'value': float(rng.random()), 'type': 'TotalFlowNodeRecorder'}}
+    profiles = {'line0': rng.random(366).tolist(), 'line1': rng.random(12).tolist()}
+    return metrics, profiles
+
+
+@pytest.mark.parametrize('binary, dtype, compression', [
+    (False, 'float64', None),
+    (True, 'float64', None),
+    (True, 'float64', 'zlib'),
+    (True, 'float32', 'zlib'),
+])
+def test_metrics_and_profiles_round_trip(tmp_path, binary, dtype, compression):
+    archive = Archive(tmp_path / 'archive.db', binary=binary, dtype=dtype, compression=compression)
+    rng = np.random.default_rng(3)
+    expected = {}
+    for i in range(5):
+        variables, objectives, constraints = _solution(rng)
+        metrics, profiles = _arrays(rng)
+        expected[archive.insert(variables, objectives, constraints, metrics=metrics, profiles=profiles)] = \
+            (metrics, profiles)
+
+    rtol = 1e-6 if dtype == 'float32' else 0
+    df = archive.load_metrics()
+    profiles = archive.load_profiles()
+    for solution_id, (metrics, solution_profiles) in expected.items():
+        for name, metric in metrics.items():
+            np.testing.assert_allclose(df.loc[solution_id, name], metric['value'], rtol=rtol)
+        for name, values in solution_profiles.items():
+            np.testing.assert_allclose(profiles[name].loc[solution_id].values, values, rtol=rtol)
+
+
+def test_mixed_json_and_binary_rows(tmp_path):
+    # An archive written as JSON and appended to with binary storage
+    rng = np.random.default_rng(4)
+    ids = []
+    for binary in (False, True):
+        archive = Archive(tmp_path / 'archive.db', binary=binary)
+        variables, objectives, constraints = _solution(rng)
+        metrics, profiles = _arrays(rng)
+        ids.append(archive.insert(variables, objectives, constraints, metrics=metrics, profiles=profiles))
+
+    assert list(archive.load_metrics().index) == ids
+    assert list(archive.load_profiles()['line0'].index) == ids
+    assert list(archive.load_metrics(where=f"id = {ids[1]}").index) == ids[1:]
+
+
+def test_benchmark_binary_is_smaller(tmp_path):
+    from scripts.archive_benchmark import run
+    df = run(str(tmp_path), str(tmp_path / 'benchmark.csv'), n_solutions=50, n_metrics=20, n_days=366)
+    assert df.loc['binary', 'size_mb'] < df.loc['json', 'size_mb']
+    assert df.loc['binary-float32', 'size_mb'] < df.loc['binary', 'size_mb']
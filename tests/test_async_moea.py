@@ -0,0 +1,59 @@
+import random
+import numpy as np
+import platypus
+import pytest
+from scripts.async_moea import AsyncEpsMOEA, TimedJob, submit_job
+
+
+@pytest.fixture(autouse=True)
+def seed():
+    random.seed(0)
+
+
+def test_submit_job():
+    problem = platypus.DTLZ2(2)
+    solution = platypus.RandomGenerator().generate(problem)
+    with platypus.ProcessPoolEvaluator(2) as pool:
+        job = submit_job(pool, TimedJob(solution)).result()
+    assert job.solution.evaluated
+    assert job.end >= job.start
+
+    job = submit_job(platypus.MapEvaluator(), TimedJob(platypus.RandomGenerator().generate(problem))).result()
+    assert job.solution.evaluated
+
+
+# The default variator comes from the current platypus API, without a deprecation warning
+@pytest.mark.filterwarnings("error::DeprecationWarning")
+def test_async_eps_moea_budget_and_callbacks():
+    calls = []
+    algorithm = AsyncEpsMOEA(platypus.DTLZ2(2), epsilons=[0.05, 0.05], population_size=20, n_workers=4,
+                             callback_frequency=50)
+    algorithm.run(500, callback=lambda alg: calls.append(alg.nfe))
+
+    assert algorithm.nfe == 500
+    assert algorithm.busy_time > 0
+    # At least `callback_frequency` evaluations apart and once all evaluations are complete
+    assert calls[-1] == 500
+    assert len(calls) >= 5
+    assert np.all(np.diff([0] + calls[:-1]) >= 50)
+
+
+def test_async_eps_moea_converges():
+    problem = platypus.DTLZ2(2)
+    with platypus.ProcessPoolEvaluator(4) as evaluator:
+        algorithm = AsyncEpsMOEA(problem, epsilons=[0.02, 0.02], population_size=50, n_workers=4,
+                                 evaluator=evaluator)
+        algorithm.run(4000)
+
+    objectives = np.array([s.objectives[:] for s in algorithm.result])
+    # The Pareto front of DTLZ2 is the unit circle
+    assert len(objectives) > 10
+    assert np.abs(np.sqrt((objectives**2).sum(axis=1)) - 1).max() < 0.1
+    assert all(s.evaluated for s in algorithm.population)
+
+
+def test_async_eps_moea_termination_condition():
+    algorithm = AsyncEpsMOEA(platypus.DTLZ2(2), epsilons=[0.05, 0.05], population_size=20, n_workers=3)
+    algorithm.run(platypus.MaxEvaluations(100))
+    # Evaluations in flight when the condition is met are completed
+    assert 100 <= algorithm.nfe <= 100 + 3
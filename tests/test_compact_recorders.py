@@ -0,0 +1,121 @@
+import copy
+import warnings
+import numpy as np
+import pytest
+from pywr.core import Model
+from pywr.recorders import NumpyArrayIndexParameterRecorder
+from pywr_model.compact_recorders import (BITS, CompactArray, CompactNumpyArrayIndexParameterRecorder, array_nbytes,
+                                          patch_json_data_compact)
+from pywr_model.level_of_service import ForecastCrossingIndexParameter
+from pywr_model.memory_budget import MemoryBudgetWarning, memory_budget
+from pywr_model.snapshot import ResumableModel, uncaptured_components
+
+
+def test_compact_array():
+    rng = np.random.default_rng(0)
+    flags = rng.integers(0, 2, size=(5, 11))
+    array = CompactArray(5, 11, BITS)
+    for i, row in enumerate(flags):
+        array.set_row(i, row)
+    np.testing.assert_array_equal(array.to_array(), flags)
+    assert array.nbytes == array_nbytes((5, 11), BITS) == 10
+
+    array = CompactArray(5, 11, 'int8')
+    array.set_row(2, np.arange(11))
+    assert array.to_array()[2].tolist() == list(range(11))
+    assert array.nbytes == array_nbytes((5, 11), 'int8') == 55
+
+    other = copy.copy(array)
+    array.reset()
+    assert other.to_array()[2].tolist() == list(range(11))
+
+
+def test_patch_json_data_compact(model_data):
+    data = patch_json_data_compact(copy.deepcopy(model_data), storage_dtype=None)
+    assert data["recorders"]["Demand flow"] == {"type": "CompactNumpyArrayNodeRecorder", "node": "Demand",
+                                                "dtype": "float32"}
+    assert data["recorders"]["Res vol"] == model_data["recorders"]["Res vol"]
+    assert data["recorders"]["Demand total"] == model_data["recorders"]["Demand total"]
+
+
+def test_compact_recorders_match(model_data):
+    original = Model.load(copy.deepcopy(model_data))
+    original.run()
+    data = patch_json_data_compact(copy.deepcopy(model_data))
+    data["recorders"]["Res vol 64"] = {"type": "CompactNumpyArrayStorageRecorder", "node": "Res", "dtype": "float64"}
+    compact = Model.load(data)
+    compact.run()
+
+    for name in ("Demand flow", "Res vol"):
+        expected = original.recorders[name].data
+        assert compact.recorders[name].data.shape == expected.shape
+        np.testing.assert_allclose(compact.recorders[name].data, expected, rtol=1e-6)
+        np.testing.assert_allclose(compact.recorders[name].values(), original.recorders[name].values(), rtol=1e-6)
+    np.testing.assert_array_equal(compact.recorders["Res vol 64"].data, original.recorders["Res vol"].data)
+
+
+def _index_model(model_data, memory_dtype='float64', int32=True):
+    model_data["nodes"].append({"name": "Group", "type": "aggregatedstorage", "storage_nodes": ["Res"]})
+    model_data["parameters"]["Demand Scaling Factor"]["value"] = 0.8
+    model = ResumableModel.load(model_data)
+    param = ForecastCrossingIndexParameter(model, model.nodes["Group"], model.parameters["Res line1"],
+                                           rolling_days=30, forecast_window=60, memory_dtype=memory_dtype,
+                                           name="Forecast")
+    if int32:
+        NumpyArrayIndexParameterRecorder(model, param, name="int32")
+    for dtype in ("int8", BITS):
+        CompactNumpyArrayIndexParameterRecorder(model, param, dtype=dtype, name=dtype)
+    return model
+
+
+def test_compact_index_recorders(model_data):
+    model = _index_model(model_data)
+    model.run()
+    expected = model.recorders["int32"].data
+    assert expected.any()
+    for name in ("int8", BITS):
+        np.testing.assert_array_equal(model.recorders[name].data, expected)
+
+
+def test_forecast_memory_dtype(model_data):
+    model = _index_model(copy.deepcopy(model_data))
+    model.run()
+    float32 = _index_model(model_data, memory_dtype='float32')
+    float32.run()
+    assert float32.parameters["Forecast"]._memory.shape == (30, 3)
+    np.testing.assert_array_equal(float32.recorders["int32"].data, model.recorders["int32"].data)
+
+
+def test_memory_budget(model_data):
+    model = _index_model(model_data)
+    budget = memory_budget(model).set_index('component')
+    assert budget.loc["int32", "bytes"] == 731 * 3 * 4
+    assert budget.loc["int8", "bytes"] == 731 * 3
+    assert budget.loc[BITS, "bytes"] == 731
+    assert budget.loc["Forecast", "bytes"] == 30 * 3 * 8
+
+    model.run()
+    assert model.recorders["int8"]._array.nbytes == budget.loc["int8", "bytes"]
+    assert model.parameters["Forecast"]._memory.nbytes == budget.loc["Forecast", "bytes"]
+
+    with pytest.warns(MemoryBudgetWarning):
+        memory_budget(model, limit=1000)
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        memory_budget(model, limit=10 ** 6)
+
+
+def test_compact_recorders_resume(model_data):
+    # The compact arrays are part of a snapshot, so a resumed run records the whole period
+    model_data["recorders"] = {name: r for name, r in model_data["recorders"].items() if "numpyarray" in r["type"]}
+    model = _index_model(patch_json_data_compact(model_data), int32=False)
+    model.setup()
+    assert uncaptured_components(model) == []
+
+    model.snapshot_timesteps = {400}
+    model.run()
+    full = {r.name: r.data for r in model.recorders}
+    model.resume_snapshot = model.snapshots[400]
+    model.run()
+    for r in model.recorders:
+        np.testing.assert_array_equal(r.data, full[r.name])
@@ -0,0 +1,84 @@
+import copy
+import numpy as np
+import pytest
+from pywr.core import Model
+from pywr.utils.bisect import BisectionSearchModel
+from pywr_model.deployable_output import (ScenarioConstantParameter, VectorBisectionSearchModel,
+                                          deployable_output_distribution, deployable_output_table,
+                                          patch_json_data_vector_bisection, scenario_feasibility)
+
+
+def _separate(model_data, index):
+    model = BisectionSearchModel.load(copy.deepcopy(model_data))
+    model.scenarios.user_combinations = [[index]]
+    model.run()
+    return float(np.asarray(model.parameters[model.bisect_parameter].get_double_variables())[0])
+
+
+@pytest.fixture
+def vector_data(model_data):
+    return patch_json_data_vector_bisection(model_data)
+
+
+def test_patch_json_data_vector_bisection(model_data):
+    data = patch_json_data_vector_bisection(model_data)
+    assert data["parameters"]["Demand Scaling Factor"]["type"] == "ScenarioConstantParameter"
+    with pytest.raises(ValueError, match="must be a constant parameter"):
+        patch_json_data_vector_bisection(model_data, parameter="Demand Profile")
+
+
+def test_scenario_constant_parameter(vector_data):
+    model = Model.load(vector_data)
+    param = model.parameters["Demand Scaling Factor"]
+    assert isinstance(param, ScenarioConstantParameter)
+    model.setup()
+    param.set_scenario_values([0.5, 1.0, 1.5])
+    assert np.asarray(param.get_double_variables())[0] == pytest.approx(1.0)
+    model.run()
+    demand = np.array(model.recorders["Demand flow"].data)
+    # The demand is met in January in every scenario
+    np.testing.assert_allclose(demand[0], [5.0, 10.0, 15.0])
+
+    # Setting the variable sets every scenario
+    param.set_double_variables([0.75])
+    np.testing.assert_array_equal(param.scenario_values, 0.75)
+
+
+def test_vector_search_matches_separate_searches(model_data, vector_data):
+    model = VectorBisectionSearchModel.load(vector_data)
+    model.run()
+    expected = [_separate(model_data, i) for i in range(3)]
+    np.testing.assert_array_equal(model.deployable_output, expected)
+    # One simulation per halving of the bracket, not one per halving and scenario
+    assert len(model.bisection_history) == int(np.ceil(np.log2(1.5 / 0.01)))
+    # The recorders hold the results at the DO of each scenario
+    assert np.all(scenario_feasibility(model))
+    np.testing.assert_array_equal(model.parameters["Demand Scaling Factor"].scenario_values, expected)
+
+
+def test_infeasible_scenarios(vector_data):
+    # The driest scenario can not supply the lower bound
+    vector_data["parameters"]["Demand Scaling Factor"]["lower_bounds"] = 0.6
+    model = VectorBisectionSearchModel.load(vector_data)
+    model.run()
+    assert np.isnan(model.deployable_output[0])
+    assert np.all(model.deployable_output[1:] > 0.6)
+
+    table = deployable_output_table(model, recorders={"Total Demand": "Demand total"})
+    assert table["feasible"].tolist() == [False, True, True]
+    np.testing.assert_allclose(table["Total Demand"], model.recorders["Demand total"].values())
+    distribution = deployable_output_distribution(table)
+    assert distribution["scenarios"] == 3 and distribution["feasible"] == 2
+    assert distribution["min"] == model.deployable_output[1]
+    assert distribution["max"] == model.deployable_output[2]
+
+    vector_data["bisection"]["error_on_infeasible"] = True
+    model = VectorBisectionSearchModel.load(vector_data)
+    with pytest.raises(ValueError, match="for 1 of 3 scenarios"):
+        model.run()
+
+
+def test_vector_search_requires_scenario_parameter(model_data):
+    model = VectorBisectionSearchModel.load(model_data)
+    with pytest.raises(ValueError, match="ScenarioConstantParameter"):
+        model.run()
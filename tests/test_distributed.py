@@ -0,0 +1,116 @@
+import multiprocessing.connection
+import pickle
+import random
+import socket
+import time
+import platypus
+from platypus.core import EvaluateSolution
+import pytest
+from scripts.distributed import SocketEvaluator, LocalCluster
+
+
+class SlowDTLZ2(platypus.Problem):
+    def __init__(self):
+        super().__init__(11, 2)
+        self.types[:] = platypus.Real(0, 1)
+        self._problem = platypus.DTLZ2(2)
+
+    def evaluate(self, solution):
+        time.sleep(0.01)
+        self._problem.evaluate(solution)
+
+
+class Unpicklable(platypus.Problem):
+    def __init__(self):
+        super().__init__(1, 1)
+        self.types[:] = platypus.Real(0, 1)
+
+    def evaluate(self, solution):
+        solution.objectives[:] = [solution.variables[0]]
+        if solution.variables[0] > 0.5:
+            # The evaluated job can not be sent back to the coordinator
+            solution.callback = lambda: None
+
+
+class Exploit:
+    def __init__(self, path):
+        self.path = path
+
+    def __reduce__(self):
+        return open, (self.path, 'w')
+
+
+def _jobs(problem, n, seed=0):
+    generator = platypus.RandomGenerator()
+    random.seed(seed)
+    return [EvaluateSolution(generator.generate(problem)) for _ in range(n)]
+
+
+@pytest.fixture
+def evaluator():
+    # Tests close the evaluator before the workers so that they are told to stop
+    evaluator = SocketEvaluator(port=0, job_timeout=30, worker_timeout=5)
+    yield evaluator
+    evaluator.close()
+
+
+def test_evaluate_on_local_cluster(evaluator):
+    problem = SlowDTLZ2()
+    jobs = _jobs(problem, 60)
+    with LocalCluster(evaluator, 3, delays=[0.0, 0.02, 0.05]), evaluator:
+        results = evaluator.evaluate_all(jobs)
+
+    for job, result in zip(jobs, results):
+        problem.evaluate(job.solution)
+        assert result.solution.objectives[:] == pytest.approx(job.solution.objectives[:])
+    jobs_per_worker = {name: stats['jobs'] for name, stats in evaluator.workers.items()}
+    assert sum(jobs_per_worker.values()) == len(jobs)
+    # The fastest worker completes the most jobs
+    assert max(jobs_per_worker, key=jobs_per_worker.get).startswith('local0')
+
+
+def test_worker_loss_requeues_jobs(evaluator):
+    problem = SlowDTLZ2()
+    with LocalCluster(evaluator, 2, delays=[0.05, 0.05]) as cluster, evaluator:
+        futures = [evaluator.submit(job) for job in _jobs(problem, 40)]
+        time.sleep(0.5)
+        cluster.kill(0)
+        results = [f.result(timeout=60) for f in futures]
+    assert len(results) == 40
+    assert sum(stats['lost_jobs'] for stats in evaluator.workers.values()) == 1
+
+
+def test_pending_jobs_fail_without_workers():
+    with SocketEvaluator(port=0, worker_timeout=1) as evaluator:
+        t0 = time.time()
+        with pytest.raises(RuntimeError, match='No workers'):
+            evaluator.evaluate_all(_jobs(SlowDTLZ2(), 2))
+        assert time.time() - t0 < 10
+
+
+def test_worker_survives_unpicklable_result(evaluator):
+    problem = Unpicklable()
+    jobs = _jobs(problem, 2)
+    jobs[0].solution.variables[:] = [0.9]
+    jobs[1].solution.variables[:] = [0.1]
+    with LocalCluster(evaluator, 1), evaluator:
+        failed, ok = evaluator.submit(jobs[0]), evaluator.submit(jobs[1])
+        with pytest.raises(RuntimeError, match='Evaluation failed'):
+            failed.result(timeout=30)
+        assert ok.result(timeout=30).solution.objectives[:] == [0.1]
+
+
+def test_wrong_authkey_rejected(evaluator):
+    with pytest.raises(multiprocessing.AuthenticationError):
+        multiprocessing.connection.Client(evaluator.address, authkey=b'wrong')
+
+
+def test_messages_not_unpickled_before_authentication(evaluator, tmp_path):
+    path = tmp_path / 'exploited'
+    data = pickle.dumps(('hello', Exploit(str(path))))
+    with socket.create_connection(evaluator.address) as sock:
+        # A framed pickle in place of the reply to the challenge
+        sock.sendall(len(data).to_bytes(4, 'big') + data)
+        time.sleep(0.5)
+    assert not path.exists()
+    assert evaluator.workers == {}
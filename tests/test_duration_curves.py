@@ -0,0 +1,100 @@
+import copy
+import numpy as np
+import pytest
+from pywr.core import Model
+from pywr_model.duration_curves import (EXACT, SKETCH, DurationCurveEngine, QuantileSketch,
+                                        patch_json_data_duration_curves, percentiles_from_sorted, sketch_rows)
+from pywr_model.snapshot import ResumableModel
+
+PERCENTILES = [0, 1, 5, 10, 25, 50, 75, 90, 95, 99, 100]
+
+
+def _duration_curve_data(model_data):
+    model_data["recorders"] = {
+        "Demand FDC": {"type": "flowdurationcurve", "node": "Demand", "percentiles": PERCENTILES},
+        "Demand FDC min": {"type": "flowdurationcurve", "node": "Demand", "percentiles": [5, 50],
+                           "temporal_agg_func": "min"},
+        "Res SDC": {"type": "storagedurationcurve", "node": "Res", "percentiles": PERCENTILES},
+    }
+    return model_data
+
+
+def test_percentiles_from_sorted():
+    data = np.random.default_rng(0).normal(size=(1001, 4))
+    np.testing.assert_allclose(percentiles_from_sorted(np.sort(data, axis=0), PERCENTILES),
+                               np.percentile(data, PERCENTILES, axis=0), rtol=1e-12)
+
+
+def test_exact_matches_pywr(model_data):
+    data = _duration_curve_data(model_data)
+    pywr_model = Model.load(copy.deepcopy(data))
+    pywr_model.run()
+    shared = Model.load(patch_json_data_duration_curves(copy.deepcopy(data)))
+    shared.run()
+
+    engines = [r for r in shared.recorders if isinstance(r, DurationCurveEngine)]
+    # One engine for the flow of the demand and one for the volume of the reservoir
+    assert len(engines) == 2
+    for name in data["recorders"]:
+        np.testing.assert_array_equal(shared.recorders[name].values(), pywr_model.recorders[name].values())
+        np.testing.assert_array_equal(shared.recorders[name].to_dataframe().values,
+                                      pywr_model.recorders[name].to_dataframe().values)
+    np.testing.assert_array_equal(shared.recorders["Demand FDC"].fdc, pywr_model.recorders["Demand FDC"].fdc)
+
+
+def test_sketch_of_short_series_is_exact():
+    data = np.random.default_rng(1).normal(size=(200, 3))
+    sketch = QuantileSketch(3, size=256)
+    for row in data:
+        sketch.add(row)
+    np.testing.assert_allclose(sketch.percentiles(PERCENTILES), np.percentile(data, PERCENTILES, axis=0))
+
+
+@pytest.mark.parametrize("size", [64, 256])
+def test_sketch_rank_error(size):
+    n = 100000
+    data = np.random.default_rng(2).lognormal(size=(n, 2))
+    sketch = QuantileSketch(2, size=size)
+    for row in data:
+        sketch.add(row)
+
+    estimate = sketch.percentiles(PERCENTILES)
+    ordered = np.sort(data, axis=0)
+    for j in range(2):
+        ranks = np.searchsorted(ordered[:, j], estimate[:, j]) / n
+        error = np.abs(ranks - np.array(PERCENTILES) / 100).max()
+        assert error <= 2 * np.log2(n / size) / size
+    # The ends of the curve are the exact minimum and maximum
+    np.testing.assert_array_equal(estimate[0], data.min(axis=0))
+    np.testing.assert_array_equal(estimate[-1], data.max(axis=0))
+    assert sketch.nbytes <= sketch_rows(n, size) * 2 * 8
+
+
+def test_sketch_size():
+    with pytest.raises(ValueError):
+        QuantileSketch(1, size=3)
+
+
+def test_sketch_mode_model(model_data):
+    data = _duration_curve_data(model_data)
+    exact = Model.load(patch_json_data_duration_curves(copy.deepcopy(data)))
+    exact.run()
+    sketch = Model.load(patch_json_data_duration_curves(copy.deepcopy(data), mode=SKETCH, sketch_size=64))
+    sketch.run()
+    assert all(r.engine.mode == SKETCH for r in sketch.recorders if hasattr(r, 'engine'))
+    # The volumes range over hundreds, so a few percent of the range is a small rank error
+    scale = np.ptp(exact.recorders["Res SDC"].sdc)
+    np.testing.assert_allclose(sketch.recorders["Res SDC"].sdc, exact.recorders["Res SDC"].sdc, atol=0.05 * scale)
+
+
+@pytest.mark.parametrize("mode", [EXACT, SKETCH])
+def test_resume(model_data, mode):
+    model = ResumableModel.load(patch_json_data_duration_curves(_duration_curve_data(model_data), mode=mode,
+                                                                sketch_size=64))
+    model.snapshot_timesteps = {400}
+    model.run()
+    full = {r.name: r.values() for r in model.recorders if hasattr(r, 'engine')}
+    model.resume_snapshot = model.snapshots[400]
+    model.run()
+    for name, values in full.items():
+        np.testing.assert_array_equal(model.recorders[name].values(), values)
@@ -0,0 +1,65 @@
+import numpy as np
+import pandas
+import pytest
+from pywr.core import Model
+from pywr_model.lp_updates import FIXED_ONCE_SOLVER_ARGS, UpdateAuditModel, lp_update_nodes
+
+
+def _profile_changes(values, index):
+    # The number of time-steps at which a monthly profile differs from the previous time-step
+    series = np.array(values)[index.month - 1]
+    return int(np.count_nonzero(series[1:] != series[:-1]))
+
+
+def test_fixed_once_results_identical(model_path):
+    default = Model.load(model_path, solver='glpk-edge')
+    default.run()
+    fixed_once = Model.load(model_path, solver='glpk-edge', solver_args=FIXED_ONCE_SOLVER_ARGS)
+    fixed_once.run()
+    pandas.testing.assert_frame_equal(fixed_once.to_dataframe(), default.to_dataframe())
+    np.testing.assert_array_equal(fixed_once.recorders["Res min"].values(), default.recorders["Res min"].values())
+
+
+def test_lp_update_nodes(model_path):
+    model = Model.load(model_path, solver='glpk-edge')
+    model.setup()
+    bounds, costs = lp_update_nodes(model)
+    assert len(bounds) == 8
+    assert len(costs) == len(model.graph.nodes())
+
+    model = Model.load(model_path, solver='glpk-edge', solver_args=FIXED_ONCE_SOLVER_ARGS)
+    model.setup()
+    bounds, costs = lp_update_nodes(model)
+    # Only the catchment's inflow and the demand are parameters
+    assert sorted(n.name for n in bounds) == ["Catch", "Demand"]
+    # Only the reservoir's control curve cost is a parameter
+    assert all(n is model.nodes["Res"] or n.parent is model.nodes["Res"] for n in costs)
+
+
+@pytest.mark.parametrize("solver_args", [{}, FIXED_ONCE_SOLVER_ARGS])
+def test_audit_counts(model_data, model_path, solver_args):
+    model = UpdateAuditModel.load(model_path, solver='glpk-edge', solver_args=solver_args)
+    model.run()
+    audit = model.update_statistics()
+
+    nts, ncomb = len(model.timestepper), len(model.scenarios.combinations)
+    bounds, costs = lp_update_nodes(model)
+    assert audit.loc["bounds", "updates"] == len(bounds) * ncomb * nts
+    assert audit.loc["cost", "updates"] == len(costs) * ncomb * nts
+    assert audit.loc["bounds", "skipped"] == (8 - len(bounds)) * ncomb * nts
+
+    if solver_args:
+        # Both of the dynamic bounds follow a monthly profile, so they only change when the profile does
+        index = model.timestepper.datetime_index.to_timestamp()
+        changes = sum(_profile_changes(model_data["parameters"][name]["values"], index)
+                      for name in ("Inflow base", "Demand Profile"))
+        assert audit.loc["bounds", "unchanged"] == ncomb * (2 * (nts - 1)) - ncomb * changes
+    assert 0 < audit.loc["cost", "unchanged"] <= audit.loc["cost", "updates"]
+
+
+def test_audit_reset_between_runs(model_path):
+    model = UpdateAuditModel.load(model_path, solver='glpk-edge')
+    model.run()
+    first = model.update_statistics()
+    model.run()
+    pandas.testing.assert_frame_equal(model.update_statistics(), first)
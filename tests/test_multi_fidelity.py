@@ -0,0 +1,151 @@
+import copy
+import random
+import numpy as np
+import platypus
+import pytest
+from pywr.core import Model
+from pywr.recorders import NumpyArrayIndexParameterRecorder
+from pywr_model.coarse import patch_json_coarse
+from pywr_model.level_of_service import ForecastCrossingIndexParameter
+from scripts.multi_fidelity import MultiFidelityEvaluator
+
+
+@pytest.fixture(autouse=True)
+def seed():
+    random.seed(0)
+
+
+def _problem(bias=0.0, feasible_below=None):
+    """DTLZ2 with its objectives shifted by `bias` and a constraint that `x[0]` is below `feasible_below`."""
+    dtlz2 = platypus.DTLZ2(2)
+    problem = platypus.Problem(dtlz2.nvars, 2, 1)
+    problem.types[:] = platypus.Real(0, 1)
+    problem.constraints[:] = '<=0'
+
+    def function(x):
+        s = platypus.Solution(dtlz2)
+        s.variables[:] = x
+        s.evaluate()
+        violation = max(x[0] - feasible_below, 0.0) if feasible_below is not None else 0.0
+        return [f + bias for f in s.objectives], [violation]
+    problem.function = function
+    return problem
+
+
+def _wrapper(problem):
+    return type('Wrapper', (), {'problem': problem})()
+
+
+def _jobs(problem, n, far=False):
+    generator = platypus.RandomGenerator()
+    jobs = []
+    for _ in range(n):
+        s = generator.generate(problem)
+        if far:
+            # The distance variables of DTLZ2 at their bounds are far from the front
+            s.variables[1:] = [1.0] * (problem.nvars - 1)
+        jobs.append(platypus.core.EvaluateSolution(s))
+    return jobs
+
+
+def test_fine_simulations_until_min_fine():
+    problem = _problem()
+    evaluator = MultiFidelityEvaluator(platypus.MapEvaluator(), _wrapper(_problem(bias=0.01)), min_fine=20)
+    evaluator.evaluate_all(_jobs(problem, 20))
+    summary = evaluator.summary()
+    assert summary['candidates'] == summary['simulated'] == 20
+    assert summary['screened_out'] == 0
+
+
+def test_screening_and_agreement():
+    problem = _problem()
+    evaluator = MultiFidelityEvaluator(platypus.MapEvaluator(), _wrapper(_problem(bias=0.01)), min_fine=50,
+                                       audit_fraction=0.0)
+    evaluator.evaluate_all(_jobs(problem, 100))
+    jobs = _jobs(problem, 30, far=True)
+    evaluator.evaluate_all(jobs)
+
+    df = evaluator.statistics_to_dataframe().iloc[-30:]
+    assert (df['reason'] == 'dominated').mean() > 0.9
+    # Screened candidates keep their coarse objectives
+    coarse = 0
+    for job in jobs:
+        assert job.solution.evaluated
+        c = platypus.Solution(_problem(bias=0.01))
+        c.variables[:] = job.solution.variables[:]
+        c.evaluate()
+        coarse += np.allclose(job.solution.objectives[:], c.objectives[:])
+    assert coarse == (~df['simulated']).sum()
+
+    report = evaluator.agreement_report()
+    assert report.loc['objective0', 'bias'] == pytest.approx(0.01)
+    assert report.loc['objective0', 'pearson'] == pytest.approx(1.0)
+    assert report.loc['feasibility', 'agreement'] == 1.0
+
+
+def test_coarse_infeasible_screened():
+    problem = _problem(feasible_below=0.5)
+    evaluator = MultiFidelityEvaluator(platypus.MapEvaluator(), _wrapper(_problem(feasible_below=0.5)),
+                                       min_fine=10, audit_fraction=0.0)
+    evaluator.evaluate_all(_jobs(problem, 10))
+    jobs = _jobs(problem, 20)
+    for job in jobs:
+        job.solution.variables[0] = 0.9
+    evaluator.evaluate_all(jobs)
+    df = evaluator.statistics_to_dataframe().iloc[-20:]
+    assert (df['reason'] == 'infeasible').all()
+    assert not df['simulated'].any()
+    assert all(not job.solution.feasible for job in jobs)
+
+
+def test_audits_and_submit():
+    problem = _problem()
+    evaluator = MultiFidelityEvaluator(platypus.MapEvaluator(), _wrapper(_problem(bias=0.01)), min_fine=50,
+                                       audit_fraction=1.0)
+    evaluator.evaluate_all(_jobs(problem, 60))
+    for job in _jobs(problem, 10, far=True):
+        result = evaluator.submit(job).result()
+        assert result.solution.evaluated
+
+    summary = evaluator.summary()
+    assert summary['simulated'] == 70
+    assert summary['screening_accuracy'] == 1.0
+    assert summary['coarse_busy_time'] > 0
+
+
+def test_patch_json_coarse(model_data, write_model, tmp_path):
+    path = write_model(model_data)
+    patch_json_coarse(path, str(tmp_path / 'coarse.json'), timestep=7, end='1920-12-31')
+    model = Model.load(str(tmp_path / 'coarse.json'))
+    model.setup()
+    assert model.timestepper.delta == 7
+    assert len(model.timestepper) == 53
+    model.run()
+
+
+def _forecast_model(model_data, write_model, timestep, **kwargs):
+    model_data["timestepper"]["timestep"] = timestep
+    model_data["nodes"].append({"name": "Group", "type": "aggregatedstorage", "storage_nodes": ["Res"]})
+    model = Model.load(write_model(model_data))
+    param = ForecastCrossingIndexParameter(model, model.nodes["Group"], model.parameters["Res line1"],
+                                           forecast_window=6 * 7, name="Forecast", **kwargs)
+    recorder = NumpyArrayIndexParameterRecorder(model, param, name="Forecast recorder")
+    return model, param, recorder
+
+
+def test_forecast_rolling_days(model_data, write_model):
+    model, param, by_days = _forecast_model(copy.deepcopy(model_data), write_model, 1, rolling_days=28)
+    model.run()
+    assert param.rolling_window == 28
+
+    model, _, by_steps = _forecast_model(copy.deepcopy(model_data), write_model, 1, rolling_window=28)
+    model.run()
+    np.testing.assert_array_equal(by_days.data, by_steps.data)
+    assert by_days.data.any()
+
+    model, param, _ = _forecast_model(copy.deepcopy(model_data), write_model, 7, rolling_days=28)
+    model.run()
+    assert param.rolling_window == 4
+
+    with pytest.raises(ValueError):
+        ForecastCrossingIndexParameter(model, model.nodes["Group"], model.parameters["Res line1"], forecast_window=42)
@@ -0,0 +1,106 @@
+import json
+import os
+import numpy as np
+import pandas
+import pytest
+from pywr.core import Model
+from pywr_model.patches import compact_index_dtype, patch_options, relocate_paths, write_patched_json
+
+
+@pytest.fixture
+def inputs_path(model_data, tmp_path):
+    # The model reads its inflow from a CSV file relative to its own directory
+    inputs = tmp_path / "inputs"
+    (inputs / "data").mkdir(parents=True)
+    index = pandas.date_range("1920-01-01", "1921-12-31", name="date")
+    inflow = pandas.DataFrame({"flow": 10 + 8 * np.sin(np.arange(len(index)) * 2 * np.pi / 365)}, index=index)
+    inflow.to_csv(inputs / "data" / "inflow.csv")
+    model_data["parameters"]["Inflow base"] = {"type": "dataframe", "url": "data/inflow.csv", "column": "flow",
+                                               "index_col": "date", "parse_dates": True}
+    path = inputs / "model.json"
+    with open(path, mode="w") as fh:
+        json.dump(model_data, fh, indent=2)
+    return str(path)
+
+
+def _run(json_path):
+    model = Model.load(json_path)
+    model.run()
+    return np.array(model.recorders["Res vol"].data)
+
+
+def test_patch_options():
+    options = patch_options(["reduce", ("replay", False), ("aggregate", "Y"), ("compact", {"node_dtype": None}),
+                             ("duration_curves", True), ("vector", None)])
+    assert options == {"reduce": {}, "aggregate": {"period": "Y"}, "compact": {"node_dtype": None},
+                       "duration_curves": {}}
+    assert list(options) == ["reduce", "aggregate", "compact", "duration_curves"]
+    assert compact_index_dtype(["compact"]) == "int8"
+    assert compact_index_dtype([("compact", {"index_dtype": "bits"})]) == "bits"
+    assert compact_index_dtype(["reduce"]) is None
+    with pytest.raises(ValueError, match="Unknown model patch"):
+        patch_options(["shrink"])
+
+
+def test_relocate_paths():
+    data = {"includes": ["extra.json"],
+            "parameters": {"a": {"url": "data/a.csv"}, "b": {"url": os.path.abspath("b.csv")}},
+            "tables": {"t": {"url": "../shared/t.h5"}}}
+    data = relocate_paths(data, os.path.join("work", "inputs"), os.path.join("work", "results"))
+    assert data["includes"] == [os.path.join("..", "inputs", "extra.json")]
+    assert data["parameters"]["a"]["url"] == os.path.join("..", "inputs", "data", "a.csv")
+    assert data["parameters"]["b"]["url"] == os.path.abspath("b.csv")
+    assert data["tables"]["t"]["url"] == os.path.join("..", "shared", "t.h5")
+
+
+def test_no_patches_returns_model(inputs_path, tmp_path):
+    assert write_patched_json(inputs_path, str(tmp_path / "results"), [("reduce", False)]) == inputs_path
+    assert not (tmp_path / "results").exists()
+
+
+def test_patched_copy_written_to_output_dir(inputs_path, tmp_path):
+    results = str(tmp_path / "results")
+    before = sorted(os.listdir(os.path.dirname(inputs_path)))
+    output_path = write_patched_json(inputs_path, results, ["reduce", ("compact", {"node_dtype": None})])
+
+    assert output_path == os.path.join(results, "model_reduced_compact.json")
+    # Nothing is written next to the original model
+    assert sorted(os.listdir(os.path.dirname(inputs_path))) == before
+    with open(output_path) as fh:
+        data = json.load(fh)
+    assert data["parameters"]["Inflow base"]["url"] == os.path.join("..", "inputs", "data", "inflow.csv")
+    assert data["metadata"]["reduced_nodes"] == {"L1": "L2"}
+    assert data["recorders"]["Res vol"]["type"] == "CompactNumpyArrayStorageRecorder"
+    assert data["recorders"]["Demand flow"]["type"] == "numpyarraynoderecorder"
+
+    # The patched copy still reads its data and gives the same results
+    np.testing.assert_allclose(_run(output_path), _run(inputs_path), rtol=1e-6)
+
+
+def test_replay_in_chain(inputs_path, tmp_path):
+    # The trajectories are evaluated from the relocated and reduced model
+    output_path = write_patched_json(inputs_path, str(tmp_path / "results"), ["reduce", "replay"])
+    with open(output_path) as fh:
+        data = json.load(fh)
+    assert data["parameters"]["Inflow base"]["type"] == "arrayindexed"
+    assert data["parameters"]["Demand Scaling Factor"]["type"] == "constant"
+    np.testing.assert_array_equal(_run(output_path), _run(inputs_path))
+
+
+def test_patched_copy_name(inputs_path, tmp_path):
+    output_path = write_patched_json(inputs_path, str(tmp_path), [("coarse", {"timestep": 7})], name="weekly.json")
+    assert output_path == os.path.join(str(tmp_path), "weekly.json")
+    model = Model.load(output_path)
+    assert model.timestepper.delta == 7
+
+
+def test_coarse_before_replay(inputs_path, tmp_path):
+    # As the coarse copy of moea_run's multi-fidelity screening: the replayed trajectories
+    # are evaluated on the coarse time-steps
+    output_path = write_patched_json(inputs_path, str(tmp_path), [("coarse", {"timestep": 7}), "replay"])
+    with open(output_path) as fh:
+        data = json.load(fh)
+    assert data["parameters"]["Demand Profile"]["type"] == "arrayindexed"
+    assert len(data["parameters"]["Demand Profile"]["values"]) == len(Model.load(output_path).timestepper)
+    with pytest.raises(ValueError, match="change the timestepper before the replay"):
+        write_patched_json(inputs_path, str(tmp_path), ["replay", ("coarse", {"timestep": 7})])
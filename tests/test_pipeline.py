@@ -0,0 +1,106 @@
+import json
+import time
+import pytest
+from scripts import pipeline
+from scripts.pipeline import Stage, model_inputs
+
+
+def copy_file(src, dst, suffix=''):
+    with open(src) as fh:
+        text = fh.read()
+    with open(dst, mode='w') as fh:
+        fh.write(text + suffix)
+
+
+def fail():
+    raise RuntimeError("Stage failed")
+
+
+def sleep(seconds):
+    time.sleep(seconds)
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    # No code files under the temporary directory, so only the stages' inputs are hashed
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'input.txt').write_text('a')
+    return tmp_path
+
+
+def _stages(suffix=''):
+    return [
+        Stage('first', copy_file, dict(src='input.txt', dst='first.txt'), inputs=['input.txt'],
+              outputs=['first.txt']),
+        Stage('second', copy_file, dict(src='first.txt', dst='second.txt', suffix=suffix), inputs=['first.txt'],
+              outputs=['second.txt'], depends=['first']),
+    ]
+
+
+def _status(report):
+    return report['status'].to_dict()
+
+
+def test_cached_until_inputs_change(workdir):
+    assert _status(pipeline.run(_stages(), 'cache.json')) == {'first': 'run', 'second': 'run'}
+    assert (workdir / 'second.txt').read_text() == 'a'
+    report = pipeline.run(_stages(), 'cache.json')
+    assert _status(report) == {'first': 'cached', 'second': 'cached'}
+    assert report['cache_hit'].all()
+
+    # A changed input reruns its stage and, as its output changes, the stage that reads it
+    (workdir / 'input.txt').write_text('b')
+    assert _status(pipeline.run(_stages(), 'cache.json')) == {'first': 'run', 'second': 'run'}
+    assert (workdir / 'second.txt').read_text() == 'b'
+
+    # Changed settings only rerun their stage
+    assert _status(pipeline.run(_stages(suffix='!'), 'cache.json')) == {'first': 'cached', 'second': 'run'}
+    assert (workdir / 'second.txt').read_text() == 'b!'
+
+
+def test_changed_or_missing_outputs_rerun(workdir):
+    pipeline.run(_stages(), 'cache.json')
+    (workdir / 'second.txt').write_text('edited')
+    assert _status(pipeline.run(_stages(), 'cache.json')) == {'first': 'cached', 'second': 'run'}
+    (workdir / 'first.txt').unlink()
+    # The first stage writes the same output again, so the second is still up to date
+    assert _status(pipeline.run(_stages(), 'cache.json')) == {'first': 'run', 'second': 'cached'}
+
+
+def test_force(workdir):
+    pipeline.run(_stages(), 'cache.json')
+    assert _status(pipeline.run(_stages(), 'cache.json', force=True)) == {'first': 'run', 'second': 'run'}
+
+
+def test_failed_stage(workdir):
+    pipeline.run(_stages(), 'cache.json')
+    stages = [Stage('first', fail, inputs=['input.txt']), _stages()[1]]
+    report = pipeline.run(stages, 'cache.json')
+    assert _status(report) == {'first': 'failed', 'second': 'not run'}
+    with open('cache.json') as fh:
+        assert 'first' not in json.load(fh)
+
+
+def test_invalid_dependencies(workdir):
+    with pytest.raises(ValueError, match='unknown'):
+        pipeline.run([Stage('a', fail, depends=['b'])], 'cache.json')
+    with pytest.raises(ValueError, match='cycle'):
+        pipeline.run([Stage('a', fail, depends=['b']), Stage('b', fail, depends=['a'])], 'cache.json')
+
+
+def test_independent_stages_run_concurrently(workdir):
+    stages = [Stage(name, sleep, dict(seconds=1.0)) for name in ('a', 'b', 'c')]
+    t0 = time.perf_counter()
+    report = pipeline.run(stages, 'cache.json', max_workers=3, force=True)
+    assert time.perf_counter() - t0 < 2.5
+    assert (report['time'] >= 1.0).all()
+
+
+def test_model_inputs(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'inputs').mkdir()
+    (tmp_path / 'inputs' / 'flows.csv').write_text('')
+    data = {'parameters': {'a': {'type': 'dataframe', 'url': 'flows.csv'},
+                           'b': {'type': 'tablesarray', 'url': 'other/data.h5'}}}
+    (tmp_path / 'inputs' / 'model.json').write_text(json.dumps(data))
+    assert model_inputs('inputs/model.json') == ['inputs/model.json', 'inputs/flows.csv', 'other/data.h5']
@@ -0,0 +1,55 @@
+import numpy as np
+import pandas
+import pytest
+from pywr.core import Model
+from pywr.recorders import NumpyArrayParameterRecorder
+from pywr_model.flood_profile import FloodProfileParameter
+from pywr_model.lobwood_abstraction_licence import GrimwithCompensationRelease
+
+COMP = [15.1, 15.1, 15.1, 10.72, 3.8, 3.8, 3.8, 3.8, 3.8, 9.625, 15.1, 15.1]
+
+
+@pytest.fixture
+def profile_model(model_data):
+    model_data["parameters"]["Draw down pc"] = {"type": "constantscenario", "scenario": "climate",
+                                                "values": [0.5, 0.6, 0.7]}
+    model_data["parameters"]["Flood line"] = {"type": "floodprofile", "draw_down_pc": "Draw down pc",
+                                              "start_doy": 306, "end_doy": 91}
+    model_data["parameters"]["Gauge"] = {"type": "constantscenario", "scenario": "climate",
+                                         "values": [100.0, 300.0, 251.9]}
+    model_data["recorders"]["Flood line recorder"] = {"type": "numpyarrayparameterrecorder", "parameter": "Flood line"}
+    model = Model.load(model_data)
+    comp = GrimwithCompensationRelease(model, model.parameters["Demand Profile"], model.parameters["Gauge"],
+                                       name="Grimwith comp")
+    NumpyArrayParameterRecorder(model, comp, name="Grimwith comp recorder")
+    return model
+
+
+def _expected_flood_line(model, start_doy, end_doy):
+    doy = model.timestepper.datetime_index.dayofyear.values[:, np.newaxis]
+    in_window = (end_doy < doy) & (doy < start_doy)
+    return np.where(in_window, 1.01, np.array([[0.5, 0.6, 0.7]]))
+
+
+def test_flood_profile(profile_model):
+    profile_model.run()
+    np.testing.assert_allclose(profile_model.recorders["Flood line recorder"].data,
+                               _expected_flood_line(profile_model, 306, 91))
+
+
+def test_flood_profile_variables(profile_model):
+    param = profile_model.parameters["Flood line"]
+    param.set_integer_variables(np.array([250, 30], dtype=np.int32))
+    np.testing.assert_array_equal(param.get_integer_variables(), [250, 30])
+    profile_model.run()
+    np.testing.assert_allclose(profile_model.recorders["Flood line recorder"].data,
+                               _expected_flood_line(profile_model, 250, 30))
+
+
+def test_grimwith_compensation_release(profile_model):
+    profile_model.run()
+    month = pandas.DatetimeIndex(profile_model.timestepper.datetime_index.to_timestamp()).month.values
+    comp = np.array(COMP)[month - 1, np.newaxis]
+    # The release is increased while the gauge flow is below 252
+    expected = comp + np.array([[22.7, 0.0, 22.7]])
+    np.testing.assert_allclose(profile_model.recorders["Grimwith comp recorder"].data, expected)
@@ -0,0 +1,161 @@
+import itertools
+from types import SimpleNamespace
+import numpy as np
+import platypus
+import pytest
+from scripts.progress import (ProgressLog, ProgressCallback, ConvergenceCallback, Convergence, hypervolume,
+                              objective_signs, ADD, GENERATION)
+
+
+def _problem():
+    problem = platypus.Problem(2, 2, 1)
+    problem.types[:] = [platypus.Real(0, 1), platypus.Integer(0, 10)]
+    problem.wrapper = SimpleNamespace(
+        model_objectives=[SimpleNamespace(name='cost'), SimpleNamespace(name='yield')],
+        model_constraints=[SimpleNamespace(name='storage')],
+    )
+    return problem
+
+
+def _solution(problem, rng):
+    s = platypus.Solution(problem)
+    s.variables[:] = [problem.types[0].rand(), problem.types[1].rand()]
+    s.objectives[:] = rng.random(2)
+    s.constraints[:] = [0.0]
+    return s
+
+
+def _row(problem, s):
+    variables = [t.decode(v) for t, v in zip(problem.types, s.variables)]
+    return np.concatenate([variables, s.objectives[:], s.constraints[:]])
+
+
+def test_progress_log_round_trip(tmp_path):
+    log = ProgressLog(tmp_path / 'progress.log')
+    log.write_header(['x'], ['cost'], ['storage'], metrics=['size'])
+    log.append([(ADD, 10, 0, [0.5, 1.0, 0.0]), (GENERATION, 10, 0, [1])])
+    log.append([(ADD, 20, 1, [0.25, 2.0, 0.0]), (GENERATION, 20, 0, [2])])
+
+    assert log.header()['objectives'] == ['cost']
+    assert list(log.generations()['size']) == [1, 2]
+    assert list(log.archive_at(10).index) == [0]
+    assert list(log.archive_at().index) == [0, 1]
+    assert log.archive_at()[('objectives', 'cost')].tolist() == [1.0, 2.0]
+
+
+def test_incomplete_generation_ignored(tmp_path):
+    log = ProgressLog(tmp_path / 'progress.log')
+    log.write_header(['x'], ['cost'], [])
+    log.append([(ADD, 10, 0, [0.5, 1.0]), (GENERATION, 10, 0, [])])
+    # A generation interrupted before its GENERATION record
+    log.append([(ADD, 20, 1, [0.25, 2.0])])
+    assert list(log.archive_at().index) == [0]
+
+
+def test_callback_rebuilds_archive_at_every_generation(tmp_path):
+    rng = np.random.default_rng(0)
+    problem = _problem()
+    callback = ProgressCallback(tmp_path / 'progress.log')
+    alg = SimpleNamespace(problem=problem, archive=[], nfe=0)
+
+    pool = [_solution(problem, rng) for _ in range(30)]
+    expected = {}
+    for generation in range(8):
+        alg.nfe += 100
+        # Keep some of the archive, drop some and add some new solutions
+        keep = [s for s in alg.archive if rng.random() < 0.7]
+        alg.archive = keep + [pool.pop() for _ in range(rng.integers(0, 4))]
+        callback(alg)
+        expected[alg.nfe] = sorted(tuple(_row(problem, s)) for s in alg.archive)
+
+    for nfe, rows in expected.items():
+        df = callback.log.archive_at(nfe)
+        assert sorted(tuple(r) for r in df.values) == rows
+
+
+def _grid_hypervolume(points, reference):
+    # Count the unit cells (of integer points) dominated by any point
+    count = 0
+    for cell in itertools.product(*[range(r) for r in reference]):
+        if np.any(np.all(points <= np.array(cell), axis=1)):
+            count += 1
+    return count
+
+
+@pytest.mark.parametrize('nobjs', [1, 2, 3, 4])
+def test_hypervolume_matches_brute_force(nobjs):
+    rng = np.random.default_rng(nobjs)
+    reference = [6] * nobjs
+    for _ in range(5):
+        points = rng.integers(0, 7, size=(rng.integers(1, 12), nobjs))
+        assert hypervolume(points, reference) == _grid_hypervolume(points, reference)
+    assert hypervolume(np.empty((0, nobjs)), reference) == 0.0
+
+
+def test_hypervolume_known_values():
+    assert hypervolume([[0.5, 0.5]], [1, 1]) == 0.25
+    assert hypervolume([[0, 0.5], [0.5, 0]], [1, 1]) == 0.75
+    # Points outside the reference contribute nothing
+    assert hypervolume([[0.5, 0.5], [2, 0]], [1, 1]) == 0.25
+
+
+def test_objective_signs():
+    problem = platypus.Problem(1, 3)
+    problem.directions[:] = [platypus.Direction.MINIMIZE, platypus.Direction.MAXIMIZE, platypus.Problem.MINIMIZE]
+    assert objective_signs(problem).tolist() == [1.0, -1.0, 1.0]
+    problem.directions[:] = platypus.Problem.MAXIMIZE
+    assert objective_signs(problem).tolist() == [-1.0, -1.0, -1.0]
+
+
+def _convergence_alg(problem, objectives, nfe):
+    archive = []
+    for o in objectives:
+        s = platypus.Solution(problem)
+        s.variables[:] = [problem.types[0].rand(), problem.types[1].rand()]
+        s.objectives[:] = o
+        s.constraints[:] = [0.0]
+        s.feasible = True
+        archive.append(s)
+    return SimpleNamespace(problem=problem, archive=archive, nfe=nfe)
+
+
+def test_convergence_callback_metrics(tmp_path):
+    problem = _problem()
+    problem.directions[:] = [platypus.Direction.MINIMIZE, platypus.Direction.MAXIMIZE]
+    callback = ConvergenceCallback(tmp_path / 'progress.log', bounds=[(0, 1), (0, 1)])
+
+    # The maximised second objective is flipped before the hypervolume is computed
+    callback(_convergence_alg(problem, [[0.5, 0.5]], 100))
+    assert callback.history[-1]['hypervolume'] == pytest.approx(0.6**2)
+    assert callback.history[-1]['archive_size'] == 1
+
+    callback(_convergence_alg(problem, [[0.5, 0.5], [0.0, 0.25]], 200))
+    volume = 0.6**2 + 0.5 * 0.35
+    assert callback.history[-1]['hypervolume'] == pytest.approx(volume)
+    assert callback.history[-1]['hypervolume_improvement'] == pytest.approx((volume - 0.36) / volume)
+
+    # An unchanged archive is not recomputed and does not improve
+    callback(_convergence_alg(problem, [[0.5, 0.5], [0.0, 0.25]], 300))
+    assert callback.history[-1]['hypervolume_improvement'] == 0.0
+    assert list(callback.log.generations()['hypervolume']) == [h['hypervolume'] for h in callback.history]
+
+
+def test_convergence_stops_when_improvement_stalls():
+    callback = SimpleNamespace(history=[])
+    condition = Convergence(callback, max_evaluations=1000, window=3, threshold=1e-3, min_evaluations=100)
+    alg = SimpleNamespace(nfe=0)
+    condition.initialize(alg)
+
+    for nfe, improvement in [(50, 0.0), (100, 0.1), (150, 0.0), (200, 0.0)]:
+        alg.nfe = nfe
+        callback.history.append({'hypervolume_improvement': improvement, 'epsilon_progress': 0})
+        assert not condition.shouldTerminate(alg)
+    alg.nfe = 250
+    callback.history.append({'hypervolume_improvement': 0.0, 'epsilon_progress': 0})
+    assert condition.shouldTerminate(alg)
+    assert condition.reason == 'converged'
+
+    condition = Convergence(callback, max_evaluations=1000)
+    condition.initialize(SimpleNamespace(nfe=0))
+    assert condition.shouldTerminate(SimpleNamespace(nfe=1000))
+    assert condition.reason == 'max_evaluations'
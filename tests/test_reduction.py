@@ -0,0 +1,71 @@
+import copy
+import numpy as np
+import pandas
+from pywr.core import Model
+from pywr_model.reduction import (find_removable_links, patch_json_data_reduce, patch_json_reduce, node_flows,
+                                  expand_node_results)
+
+
+def _chain(model_data, n):
+    """Replace the two links to the demand with a chain of `n` links with a flow recorder on each."""
+    model_data["nodes"] = [node for node in model_data["nodes"] if node["name"] not in ("L1", "L2")]
+    model_data["nodes"] += [{"name": f"L{i}", "type": "link"} for i in range(1, n + 1)]
+    model_data["edges"] = [e for e in model_data["edges"] if "L1" not in e and "L2" not in e]
+    names = ["Res"] + [f"L{i}" for i in range(1, n + 1)] + ["Demand"]
+    model_data["edges"] += [[a, b] for a, b in zip(names[:-1], names[1:])]
+    for i in range(1, n + 1):
+        model_data["recorders"][f"L{i} flow"] = {"type": "numpyarraynoderecorder", "node": f"L{i}"}
+    return model_data
+
+
+def test_find_removable_links(model_data):
+    assert find_removable_links(model_data) == {"L1", "L2"}
+    assert find_removable_links(_chain(copy.deepcopy(model_data), 2), exclude=("L1",)) == {"L2"}
+    # Links with a cost or referenced by a parameter or a non-flow recorder are kept
+    model_data["nodes"][3]["cost"] = 1.0
+    model_data["recorders"]["L2 vol"] = {"type": "numpyarraystoragerecorder", "node": "L2"}
+    assert find_removable_links(model_data) == set()
+
+
+def test_chain_merged_to_one_link(model_data):
+    data, mapping = patch_json_data_reduce(_chain(model_data, 4))
+    assert mapping == {"L1": "L4", "L2": "L4", "L3": "L4"}
+    assert [n["name"] for n in data["nodes"] if n["type"] == "link"] == ["Spill", "L4"]
+    assert ["Res", "L4"] in data["edges"] and ["L4", "Demand"] in data["edges"]
+    assert data["metadata"]["reduced_nodes"] == mapping
+    # Flow recorders keep their names but record the remaining link
+    assert all(data["recorders"][f"L{i} flow"]["node"] == "L4" for i in range(1, 5))
+
+
+def test_branches_not_merged(model_data):
+    # L1 splits between L2 and a second demand, so it does not carry the same flow as either
+    model_data["nodes"].append({"name": "Demand2", "type": "output", "max_flow": 2, "cost": -400})
+    model_data["edges"].append(["L1", "Demand2"])
+    data, mapping = patch_json_data_reduce(model_data)
+    assert mapping == {}
+    assert len(data["nodes"]) == len(model_data["nodes"])
+
+
+def test_reduced_results_identical(model_data, write_model, tmp_path):
+    path = write_model(_chain(model_data, 3))
+    mapping = patch_json_reduce(path, str(tmp_path / "reduced.json"))
+    assert len(mapping) == 2
+
+    original = Model.load(path)
+    original.run()
+    reduced = Model.load(str(tmp_path / "reduced.json"))
+    reduced.run()
+    assert len(reduced.nodes) == len(original.nodes) - 2
+
+    df = original.to_dataframe()
+    pandas.testing.assert_frame_equal(reduced.to_dataframe()[df.columns], df)
+    for name in ("Demand total", "Res min"):
+        np.testing.assert_array_equal(reduced.recorders[name].values(), original.recorders[name].values())
+
+    flows = node_flows(reduced, mapping)
+    for node in original.nodes:
+        np.testing.assert_array_equal(flows[node.name], node.flow)
+
+    table = pandas.DataFrame({name: [1.0, 2.0] for name in set(mapping.values())})
+    expanded = expand_node_results(table, mapping)
+    assert sorted(expanded.columns) == sorted(set(mapping) | set(mapping.values()))
@@ -0,0 +1,85 @@
+import copy
+import datetime
+import numpy as np
+import pytest
+from pywr.core import Model
+from pywr_model.coarse import patch_json_data_coarse
+from pywr_model.replay import find_data_parameters, evaluate_trajectories, patch_json_data_replay, \
+    patch_json_replay
+from scripts.segmented_run import patch_json_data_segment
+
+
+@pytest.fixture
+def replay_data(model_data):
+    # A data-only parameter only used by another data-only parameter
+    model_data["parameters"]["Spill base"] = {"type": "constant", "value": 50}
+    model_data["parameters"]["Spill cost"] = {"type": "aggregated", "agg_func": "sum",
+                                              "parameters": ["Spill base", "Spill base"]}
+    model_data["nodes"][2]["cost"] = "Spill cost"
+    return model_data
+
+
+def test_find_data_parameters(replay_data):
+    model = Model.load(replay_data)
+    names = find_data_parameters(model, exclude=("Demand Scaling Factor",))
+    assert sorted(names) == ["Demand Profile", "Inflow", "Inflow base", "Inflow factor", "Res line1",
+                             "Spill base", "Spill cost"]
+
+
+def test_evaluate_trajectories(replay_data):
+    model = Model.load(replay_data)
+    trajectories = evaluate_trajectories(model, ["Inflow"])
+    month = model.timestepper.datetime_index.month.values
+    base = np.array([20, 18, 15, 10, 5, 3, 2, 3, 6, 12, 18, 22])[month - 1]
+    np.testing.assert_allclose(trajectories["Inflow"], base[:, np.newaxis] * np.array([[0.6, 1.0, 1.4]]))
+
+
+def test_patch_json_data_replay(replay_data):
+    model = Model.load(replay_data)
+    data = patch_json_data_replay(replay_data, model, exclude=("Demand Scaling Factor",))
+    parameters = data["parameters"]
+
+    for name in ("Demand Profile", "Res line1", "Spill cost", "Inflow base"):
+        assert parameters[name]["type"] == "arrayindexed"
+    # Only used by a replayed parameter
+    assert "Spill base" not in parameters
+    # Vary by scenario or depend on the bisection parameter
+    assert parameters["Inflow factor"]["type"] == "constantscenario"
+    assert parameters["Demand Flow"]["type"] == "aggregated"
+    assert parameters["Demand Scaling Factor"]["type"] == "constant"
+
+
+def test_replay_results_identical(replay_data, write_model, tmp_path):
+    input_fn = write_model(replay_data)
+    output_fn = str(tmp_path / "model_replay.json")
+    patch_json_replay(input_fn, output_fn)
+
+    results = []
+    for fn in (input_fn, output_fn):
+        model = Model.load(fn)
+        model.run()
+        results.append(np.array(model.recorders["Res vol"].data))
+    np.testing.assert_array_equal(results[0], results[1])
+
+
+def test_replay_records_timestepper(replay_data):
+    data = patch_json_data_replay(replay_data, Model.load(replay_data), exclude=("Demand Scaling Factor",))
+    assert data["metadata"]["replay_timestepper"] == {"start": "1920-01-01", "end": "1921-12-31", "timestep": 1}
+    assert len(data["parameters"]["Demand Profile"]["values"]) == 731
+
+    # The replayed trajectories do not match another timestepper
+    with pytest.raises(ValueError, match="change the timestepper before the replay"):
+        patch_json_data_coarse(copy.deepcopy(data), timestep=7)
+    with pytest.raises(ValueError, match="change the timestepper before the replay"):
+        patch_json_data_segment(copy.deepcopy(data), datetime.date(1921, 1, 1), datetime.date(1921, 12, 31))
+    # Unless the timestepper is unchanged
+    patch_json_data_coarse(copy.deepcopy(data), timestep=1)
+
+
+def test_replay_after_coarse(replay_data):
+    # Replaying the coarse model evaluates the trajectories on its time-steps
+    data = patch_json_data_coarse(replay_data, timestep=7)
+    model = Model.load(copy.deepcopy(data))
+    data = patch_json_data_replay(data, model, exclude=("Demand Scaling Factor",))
+    assert data["metadata"]["replay_timestepper"]["timestep"] == 7
+    assert len(data["parameters"]["Demand Profile"]["values"]) == len(model.timestepper)
@@ -0,0 +1,55 @@
+import pandas
+import pytest
+from pywr_model.run_statistics import StatisticsModel, StatisticsBisectionSearchModel, write_statistics
+
+TIMINGS = ['python_parameters', 'lp_update', 'lp_solve', 'python_recorders']
+
+
+def test_simulation_statistics(model_path):
+    model = StatisticsModel.load(model_path)
+    model.run()
+
+    assert len(model.simulation_statistics) == 1
+    summary = model.simulation_statistics[0]
+    assert summary['timesteps'] == len(model.timestepper)
+    assert summary['scenarios'] == 3
+    assert summary['feasible']
+    for key in TIMINGS:
+        assert summary[key] >= 0.0
+    assert sum(summary[k] for k in TIMINGS) + summary['other'] == pytest.approx(summary['wall_time'])
+
+    assert list(model.timestep_statistics.columns) == TIMINGS
+    assert len(model.timestep_statistics) == len(model.timestepper)
+
+
+def test_statistics_reset_per_run(model_path):
+    model = StatisticsModel.load(model_path)
+    model.run()
+    model.run()
+    assert len(model.simulation_statistics) == 1
+
+
+def test_bisection_statistics(model_path):
+    model = StatisticsBisectionSearchModel.load(model_path)
+    model.run()
+
+    df = model.statistics_to_dataframe()
+    # The final row is the re-run at the best feasible value
+    assert len(df) > 2
+    assert df['bisect_value'].iloc[-1] == pytest.approx(
+        model.parameters['Demand Scaling Factor'].get_double_variables()[0])
+    assert df['feasible'].iloc[-1]
+
+    data = model.aggregated_statistics()
+    assert data['simulations'] == len(df)
+    assert data['infeasible_simulations'] == int((~df['feasible']).sum())
+    assert data['timesteps'] == len(df) * len(model.timestepper)
+
+
+def test_write_statistics(model_path, tmp_path):
+    model = StatisticsModel.load(model_path)
+    model.run()
+    write_statistics(model, tmp_path / 'stats.csv')
+
+    assert len(pandas.read_csv(tmp_path / 'stats.csv')) == 1
+    assert len(pandas.read_csv(tmp_path / 'stats_timesteps.csv')) == len(model.timestepper)
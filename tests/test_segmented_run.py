@@ -0,0 +1,117 @@
+import datetime
+import os
+import numpy as np
+import pandas
+import pytest
+from scripts.segmented_run import join_divergence, patch_json_data_segment, read_reservoir_conditions, run, \
+    split_timesteps
+
+
+@pytest.fixture
+def conditions_path(tmp_path):
+    path = tmp_path / "reservoir_conditions.csv"
+    pandas.DataFrame({"Res": {"Min Volume": 0, "Max Volume": 1000, "Initial Volume": 500}}).to_csv(path)
+    return str(path)
+
+
+@pytest.fixture
+def segment_data(model_data):
+    # Six years, so that a two year spin-up includes the reservoir refilling
+    model_data["timestepper"]["end"] = "1925-12-31"
+    model_data["parameters"]["Res index"] = {"type": "controlcurveindex", "storage_node": "Res",
+                                             "control_curves": ["Res line1"]}
+    model_data["recorders"]["Res band"] = {"type": "numpyarrayindexparameterrecorder", "parameter": "Res index"}
+    return model_data
+
+
+def test_split_timesteps(model_data):
+    split = split_timesteps(model_data, 3, 30)
+    # 731 days in to segments of 244, 244 and 243 days
+    assert split == [
+        (datetime.date(1920, 1, 1), datetime.date(1920, 1, 1), datetime.date(1920, 8, 31)),
+        (datetime.date(1920, 8, 2), datetime.date(1920, 9, 1), datetime.date(1921, 5, 2)),
+        (datetime.date(1921, 4, 3), datetime.date(1921, 5, 3), datetime.date(1921, 12, 31)),
+    ]
+    # A spin-up longer than the preceding segments starts at the start of the model
+    assert split_timesteps(model_data, 3, 400)[1][0] == datetime.date(1920, 1, 1)
+
+    # Weekly time-steps: the spin-up is rounded up to whole time-steps
+    model_data["timestepper"]["timestep"] = 7
+    for spin_up_start, start, end in split_timesteps(model_data, 2, 10)[1:]:
+        assert (start - spin_up_start).days == 14
+
+    # No empty segments
+    model_data["timestepper"]["end"] = "1920-01-03"
+    model_data["timestepper"]["timestep"] = 1
+    assert len(split_timesteps(model_data, 5, 0)) == 3
+
+
+def test_patch_json_data_segment(model_data, conditions_path):
+    conditions = read_reservoir_conditions(conditions_path)
+    assert conditions.loc["Res", "Initial Volume"] == 500.0
+
+    data = patch_json_data_segment(model_data, datetime.date(1921, 1, 1), datetime.date(1921, 6, 30),
+                                   conditions=conditions)
+    assert data["timestepper"]["start"] == "1921-01-01"
+    assert data["timestepper"]["end"] == "1921-06-30"
+    res = next(n for n in data["nodes"] if n["name"] == "Res")
+    assert res["initial_volume"] == 500.0
+    assert res["initial_volume_pc"] == 0.5
+    # Nodes without conditions are unchanged
+    assert "initial_volume" not in data["nodes"][0]
+
+
+def test_join_divergence():
+    index = pandas.period_range("2000-01-01", periods=10, freq="D")
+    columns = pandas.MultiIndex.from_product([["Vol"], [0, 1]])
+    serial = pandas.DataFrame(np.full((10, 2), 100.0), index=index, columns=columns)
+    stitched = serial.copy()
+    # The segment starting on day 4 differs for three time-steps in one scenario
+    stitched.iloc[4:7, 1] += [20.0, 10.0, 5.0]
+
+    df = join_divergence(stitched, serial, ["2000-01-05"], {"Vol": "storage", "Missing": "index"}, window=5)
+    row = df.loc[("2000-01-05", "Vol")]
+    assert row["difference_at_join"] == 20.0
+    assert row["max_abs_difference"] == 20.0
+    assert row["mean_abs_difference"] == pytest.approx(35.0 / 5)
+    assert row["max_rel_difference"] == pytest.approx(0.2)
+    assert row["differing_fraction"] == pytest.approx(0.6)
+    assert row["converged_after"] == 3
+    # Recorders that are not in the results are skipped
+    assert len(df) == 1
+
+    # Not converged within the window
+    df = join_divergence(stitched, serial, ["2000-01-05"], {"Vol": "index"}, window=2)
+    assert np.isnan(df.loc[("2000-01-05", "Vol"), "converged_after"])
+    assert np.isnan(df.loc[("2000-01-05", "Vol"), "max_rel_difference"])
+
+
+@pytest.mark.parametrize("spin_up, diverges", [(0, True), (730, False)])
+def test_segmented_run(segment_data, write_model, conditions_path, tmp_path, spin_up, diverges):
+    json_path = write_model(segment_data)
+    results = tmp_path / "results"
+    results.mkdir()
+    csv_path = str(results / "segmented.csv")
+    stitched, divergence = run(json_path, csv_path, segments=2, spin_up=spin_up, conditions_path=conditions_path,
+                               max_workers=2, patch=False)
+
+    # The segments are stitched together without gaps or overlaps
+    assert len(stitched) == 6 * 365 + 2
+    assert stitched.index.is_unique and stitched.index.is_monotonic_increasing
+    assert sorted(set(divergence.index.get_level_values("recorder"))) == ["Res band", "Res vol"]
+    assert divergence.loc[("1923-01-01", "Res vol"), "kind"] == "storage"
+    assert divergence.loc[("1923-01-01", "Res band"), "kind"] == "index"
+    if diverges:
+        # The second segment starts from the initial volume in the conditions
+        assert divergence.loc[("1923-01-01", "Res vol"), "difference_at_join"] > 0
+        assert divergence.loc[("1923-01-01", "Res vol"), "converged_after"] > 0
+    else:
+        # The spin-up includes the reservoir refilling, after which the runs agree
+        np.testing.assert_array_equal(divergence["max_abs_difference"], 0.0)
+
+    timings = pandas.read_csv(str(results / "segmented_segments.csv"), index_col=0)
+    assert list(timings.index) == ["0", "1", "parallel", "serial"]
+    # The copies of the model are written next to the results, not the model
+    assert sorted(os.listdir(os.path.dirname(json_path))) == ["model.json", "reservoir_conditions.csv", "results"]
+    assert sorted(f for f in os.listdir(results) if f.endswith(".json")) == [
+        "model_segment0.json", "model_segment1.json", "model_serial.json"]
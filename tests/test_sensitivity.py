@@ -0,0 +1,162 @@
+import numpy as np
+import pandas
+import platypus
+import pytest
+from scripts import sensitivity_run
+from scripts.moea_run import YWWrapper
+from scripts.sensitivity_run import (SampleSet, analyse, morris_analyse, morris_sample, run, sobol_analyse,
+                                     sobol_sample)
+
+
+def _ishigami(x, a=7.0, b=0.1):
+    u = -np.pi + 2 * np.pi * x
+    return (np.sin(u[:, 0]) + a * np.sin(u[:, 1])**2 + b * u[:, 2]**4 * np.sin(u[:, 0]))[:, np.newaxis]
+
+
+def test_morris_sample_moves_one_variable_at_a_time():
+    levels = 4
+    x = morris_sample(3, 10, levels=levels, seed=0)
+    assert x.shape == (10 * 4, 3)
+    assert x.min() >= 0 and x.max() <= 1
+    delta = levels / (2 * (levels - 1))
+    for trajectory in x.reshape(10, 4, 3):
+        step = np.diff(trajectory, axis=0)
+        assert np.all(np.count_nonzero(step, axis=1) == 1)
+        np.testing.assert_allclose(np.abs(step).sum(axis=1), delta)
+        # Every variable is moved once
+        assert sorted(np.argmax(np.abs(step), axis=1)) == [0, 1, 2]
+
+    with pytest.raises(ValueError):
+        morris_sample(3, 10, levels=3)
+
+
+def test_morris_linear_effects_are_exact():
+    coefficients = np.array([2.0, -3.0, 0.0])
+    x = morris_sample(3, 8, seed=1)
+    y = np.column_stack([x @ coefficients, x[:, 0]**2])
+    mu, mu_star, sigma = morris_analyse(x, y)
+    np.testing.assert_allclose(mu[:, 0], coefficients, atol=1e-12)
+    np.testing.assert_allclose(mu_star[:, 0], np.abs(coefficients), atol=1e-12)
+    np.testing.assert_allclose(sigma[:, 0], 0.0, atol=1e-12)
+    # The variables a non-linear output does not depend on have no effect
+    assert mu_star[0, 1] > 0
+    np.testing.assert_allclose(mu_star[1:, 1], 0.0)
+
+
+def test_sobol_sample_structure():
+    x = sobol_sample(3, 8, seed=0).reshape(8, 5, 3)
+    a, b = x[:, 0], x[:, -1]
+    for i in range(3):
+        expected = a.copy()
+        expected[:, i] = b[:, i]
+        np.testing.assert_array_equal(x[:, i + 1], expected)
+
+
+def test_sobol_ishigami_indices():
+    # The analytic indices of the Ishigami function with a = 7 and b = 0.1
+    first = [0.3139, 0.4424, 0.0]
+    total = [0.5576, 0.4424, 0.2437]
+    x = sobol_sample(3, 4096, seed=0)
+    s1, s1_conf, st, st_conf = sobol_analyse(x, _ishigami(x), seed=0)
+    np.testing.assert_allclose(s1[:, 0], first, atol=0.03)
+    np.testing.assert_allclose(st[:, 0], total, atol=0.03)
+    assert np.all(s1_conf > 0) and np.all(st_conf > 0)
+    assert np.all(s1_conf < 0.1) and np.all(st_conf < 0.1)
+
+
+def test_analyse_frame():
+    x = sobol_sample(2, 64, seed=0)
+    outputs = pandas.DataFrame({'a': x[:, 0], 'b': x[:, 0] + x[:, 1]})
+    df = analyse('sobol', pandas.DataFrame(x, columns=['p', 'q']), outputs, seed=0)
+    assert list(df.index) == [('a', 'p'), ('a', 'q'), ('b', 'p'), ('b', 'q')]
+    assert list(df.columns) == ['S1', 'S1_conf', 'ST', 'ST_conf']
+    assert df.loc[('a', 'p'), 'S1'] == pytest.approx(1.0, abs=0.05)
+    assert df.loc[('a', 'q'), 'ST'] == pytest.approx(0.0, abs=1e-12)
+
+
+def test_sample_set_round_trip(tmp_path):
+    samples = SampleSet(tmp_path / 'sensitivity.db')
+    assert samples.definition() is None
+    x = np.array([[0.0, 0.5], [1.0, 0.25], [0.5, 0.5]])
+    samples.create({'method': 'morris'}, x)
+    assert samples.definition() == {'method': 'morris'}
+    np.testing.assert_array_equal(samples.design(), x)
+    assert samples.pending() == [0, 1, 2]
+
+    samples.store([(0, {'cost': 1.0}), (2, {'cost': 3.0})])
+    assert samples.pending() == [1]
+    assert samples.outputs()['cost'].to_dict() == {0: 1.0, 2: 3.0}
+
+    # Creating a new design discards the previous samples
+    samples.create({'method': 'sobol'}, x[:1])
+    assert samples.pending() == [0]
+
+
+class _ToyWrapper(YWWrapper):
+    # `patch_model` adds the Yorkshire Water network's own parameters
+    def customise_model(self, model):
+        pass
+
+
+class _CountingEvaluator(platypus.MapEvaluator):
+    def __init__(self, fail_after=None):
+        super().__init__()
+        self.evaluated = 0
+        self.fail_after = fail_after
+
+    def evaluate_all(self, jobs, **kwargs):
+        if self.fail_after is not None and self.evaluated >= self.fail_after:
+            raise RuntimeError('Interrupted')
+        self.evaluated += len(jobs)
+        return super().evaluate_all(jobs, **kwargs)
+
+
+@pytest.fixture
+def sensitivity_model(model_data, write_model, monkeypatch):
+    monkeypatch.setattr(sensitivity_run, 'YWWrapper', _ToyWrapper)
+    model_data['parameters']['Inflow scale'] = {'type': 'constant', 'value': 1.0, 'lower_bounds': 0.5,
+                                                'upper_bounds': 1.5, 'is_variable': True}
+    model_data['parameters']['Inflow']['parameters'].append('Inflow scale')
+    model_data['recorders']['Demand total']['is_objective'] = 'maximise'
+    return write_model(model_data)
+
+
+def test_run_resumes_pending_samples(sensitivity_model, tmp_path):
+    db_path = str(tmp_path / 'sensitivity.db')
+    kwargs = {'method': 'morris', 'samples': 3, 'batch_size': 2}
+
+    with pytest.raises(RuntimeError):
+        run(sensitivity_model, db_path, evaluator=_CountingEvaluator(fail_after=2), **kwargs)
+    samples = SampleSet(db_path)
+    assert samples.pending() == [2, 3, 4, 5]
+    first = samples.outputs()
+
+    evaluator = _CountingEvaluator()
+    df = run(sensitivity_model, db_path, evaluator=evaluator, **kwargs)
+    assert evaluator.evaluated == 4
+    assert samples.pending() == []
+    pandas.testing.assert_frame_equal(samples.outputs().loc[first.index], first)
+    assert list(df.index) == [('Demand total', 'Inflow scale'), ('Res min', 'Inflow scale')]
+    # More inflow allows a larger deployable output
+    assert df.loc[('Demand total', 'Inflow scale'), 'mu'] > 0
+    pandas.testing.assert_frame_equal(pandas.read_csv(tmp_path / 'sensitivity.csv', index_col=[0, 1]), df)
+
+    # A completed analysis is not evaluated again
+    evaluator = _CountingEvaluator()
+    run(sensitivity_model, db_path, evaluator=evaluator, **kwargs)
+    assert evaluator.evaluated == 0
+
+
+def test_run_rejects_a_different_analysis(sensitivity_model, tmp_path):
+    db_path = str(tmp_path / 'sensitivity.db')
+    run(sensitivity_model, db_path, method='morris', samples=2, evaluator=_CountingEvaluator())
+    with pytest.raises(ValueError, match='different analysis'):
+        run(sensitivity_model, db_path, method='morris', samples=3, evaluator=_CountingEvaluator())
+
+    evaluator = _CountingEvaluator()
+    run(sensitivity_model, db_path, method='morris', samples=3, evaluator=evaluator, resume=False)
+    assert evaluator.evaluated == 6
+    assert SampleSet(db_path).definition()['samples'] == 3
+
+    with pytest.raises(ValueError, match='Unknown sensitivity method'):
+        run(sensitivity_model, db_path, method='fast', resume=False, evaluator=_CountingEvaluator())
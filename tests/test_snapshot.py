@@ -0,0 +1,111 @@
+import numpy as np
+import pytest
+from pywr.model import ModelResult
+from pywr_model.level_of_service import ForecastCrossingIndexParameter, StickyIndexParameter, \
+    EventCountIndexParameterRecorder
+from pywr_model.aggregation_recorders import PeriodStatisticsStorageRecorder
+from pywr_model.snapshot import ResumableBisectionSearchModel, ResumableModel, uncaptured_components
+
+SNAPSHOT_INDEX = 400
+
+
+@pytest.fixture
+def level_of_service_model(model_data):
+    # Only components whose state a snapshot captures
+    model_data["nodes"].append({"name": "Group", "type": "aggregatedstorage", "storage_nodes": ["Res"]})
+    model_data["recorders"] = {}
+    model_data["parameters"]["Demand Scaling Factor"]["value"] = 0.8
+    model = ResumableModel.load(model_data)
+    forecast = ForecastCrossingIndexParameter(model, model.nodes["Group"], model.parameters["Res line1"],
+                                              rolling_days=30, forecast_window=60, name="Forecast")
+    sticky = StickyIndexParameter(model, forecast, minimum_days=14, name="Sticky")
+    EventCountIndexParameterRecorder(model, sticky, 1, name="Events")
+    return model
+
+
+def _state(model):
+    return {
+        'volume': np.array(model.nodes["Res"].volume),
+        'events': model.recorders["Events"].values(),
+        'memory': np.array(model.parameters["Forecast"]._memory),
+        'timestep_off': np.array(model.parameters["Sticky"]._timestep_off),
+    }
+
+
+def test_resume_matches_full_run(level_of_service_model):
+    model = level_of_service_model
+    model.snapshot_timesteps = {SNAPSHOT_INDEX}
+    model.run()
+    full = _state(model)
+    assert full['events'].sum() > 0
+
+    model.resume_snapshot = model.snapshots[SNAPSHOT_INDEX]
+    result = model.run()
+    resumed = _state(model)
+
+    assert isinstance(result, ModelResult)
+    assert result.timesteps == len(model.timestepper)
+    for key, value in full.items():
+        np.testing.assert_array_equal(resumed[key], value)
+
+
+def test_uncaptured_components_raise(model_data):
+    model = ResumableModel.load(model_data)
+    model.setup()
+    assert sorted(uncaptured_components(model)) == ["Demand flow", "Demand total", "Res min", "Res vol"]
+
+    model.snapshot_timesteps = {SNAPSHOT_INDEX}
+    with pytest.raises(TypeError, match="Demand total"):
+        model.run()
+
+
+def test_partial_snapshot_recorder_data(model_data):
+    model = ResumableModel.load(model_data)
+    model.snapshot_timesteps = {SNAPSHOT_INDEX}
+    model.allow_partial_snapshots = True
+    with pytest.warns(UserWarning):
+        model.run()
+    full = model.recorder_data("Res vol")
+
+    model.resume_snapshot = model.snapshots[SNAPSHOT_INDEX]
+    model.run()
+    np.testing.assert_allclose(model.recorder_data("Res vol"), full)
+
+
+@pytest.fixture
+def late_demand_model(model_data):
+    # The bisection only scales the demand of the second year, after the snapshot
+    model_data["parameters"].update({
+        "First year": {"type": "arrayindexed", "values": [0.5] * 366 + [0.0] * 365},
+        "Second year": {"type": "arrayindexed", "values": [0.0] * 366 + [1.0] * 365},
+        "Late Scaling": {"type": "aggregated", "agg_func": "product",
+                         "parameters": ["Demand Scaling Factor", "Second year"]},
+        "Scaling": {"type": "aggregated", "agg_func": "sum", "parameters": ["First year", "Late Scaling"]},
+    })
+    model_data["parameters"]["Demand Flow"]["parameters"] = ["Demand Profile", "Scaling"]
+    model_data["recorders"] = {}
+    model = ResumableBisectionSearchModel.load(model_data)
+    # A constraint whose state a snapshot captures
+    PeriodStatisticsStorageRecorder(model, model.nodes["Res"], period="Y", temporal_agg_func="min", agg_func="min",
+                                    constraint_lower_bounds=200, name="Res min")
+    return model
+
+
+def test_bisection_resumes_every_iteration(late_demand_model, monkeypatch):
+    model = late_demand_model
+    model.snapshot_timesteps = {365}
+    model.run()
+    full = np.asarray(model.parameters["Demand Scaling Factor"].get_double_variables())[0]
+    full_min = model.recorders["Res min"].values()
+    assert 0.5 < full < 2.0
+
+    runs = []
+    run_from = model._run_from
+    monkeypatch.setattr(model, "_run_from", lambda snapshot: runs.append(snapshot) or run_from(snapshot))
+    model.resume_snapshot = model.snapshots[365]
+    model.run()
+
+    assert np.asarray(model.parameters["Demand Scaling Factor"].get_double_variables())[0] == full
+    np.testing.assert_allclose(model.recorders["Res min"].values(), full_min, rtol=1e-12)
+    # Every bisection iteration and the final run resumed from the snapshot
+    assert len(runs) == int(np.ceil(np.log2(1.5 / 0.01))) + 1
@@ -0,0 +1,122 @@
+import random
+import numpy as np
+import platypus
+import pytest
+from scripts.surrogate import GaussianProcess, SurrogateEvaluator
+
+
+@pytest.fixture(autouse=True)
+def seed():
+    random.seed(0)
+
+
+def _solutions(problem, n):
+    generator = platypus.RandomGenerator()
+    return [generator.generate(problem) for _ in range(n)]
+
+
+def test_gaussian_process_interpolates():
+    rng = np.random.default_rng(0)
+    x = rng.uniform(size=(40, 2))
+    y = np.column_stack([np.sin(3 * x[:, 0]) + x[:, 1], x[:, 0] * x[:, 1]])
+    gp = GaussianProcess(noise=1e-8).fit(x, y)
+
+    mean, std = gp.predict(x)
+    np.testing.assert_allclose(mean, y, atol=1e-4)
+    assert np.all(std < 1e-2)
+
+    # Far from the training inputs the prediction reverts to the mean with the full spread
+    mean, std = gp.predict([[10.0, 10.0]])
+    np.testing.assert_allclose(mean[0], y.mean(axis=0), atol=1e-6)
+    np.testing.assert_allclose(std[0], y.std(axis=0), rtol=1e-6)
+
+
+def test_no_screening_before_min_samples():
+    problem = platypus.DTLZ2(2)
+    evaluator = SurrogateEvaluator(platypus.MapEvaluator(), min_samples=20)
+    jobs = [platypus.core.EvaluateSolution(s) for s in _solutions(problem, 20)]
+    evaluator.evaluate_all(jobs)
+
+    summary = evaluator.summary()
+    assert summary['candidates'] == summary['simulated'] == 20
+    assert summary['screened_out'] == 0
+    assert all(job.solution.evaluated for job in jobs)
+
+
+def test_dominated_candidates_are_screened_out():
+    problem = platypus.DTLZ2(2)
+    evaluator = SurrogateEvaluator(platypus.MapEvaluator(), min_samples=50, audit_fraction=0.0)
+    evaluator.evaluate_all([platypus.core.EvaluateSolution(s) for s in _solutions(problem, 200)])
+
+    # Candidates far from the front of DTLZ2 (the distance variables at their bounds) are clearly dominated
+    candidates = _solutions(problem, 50)
+    for s in candidates:
+        s.variables[1:] = [1.0] * (problem.nvars - 1)
+    jobs = [platypus.core.EvaluateSolution(s) for s in candidates]
+    evaluator.evaluate_all(jobs)
+
+    df = evaluator.statistics_to_dataframe().iloc[-50:]
+    assert (df['reason'] == 'dominated').mean() > 0.9
+    assert not df.loc[df['screened'], 'simulated'].any()
+    # Screened candidates are given their predicted objectives
+    assert all(job.solution.evaluated for job in jobs)
+
+
+def test_audits_measure_screening_accuracy():
+    problem = platypus.DTLZ2(2)
+    evaluator = SurrogateEvaluator(platypus.MapEvaluator(), min_samples=50, audit_fraction=1.0)
+    evaluator.evaluate_all([platypus.core.EvaluateSolution(s) for s in _solutions(problem, 100)])
+    candidates = _solutions(problem, 30)
+    for s in candidates:
+        s.variables[1:] = [1.0] * (problem.nvars - 1)
+    evaluator.evaluate_all([platypus.core.EvaluateSolution(s) for s in candidates])
+
+    summary = evaluator.summary()
+    # Every screened candidate is simulated anyway and checked against the real front
+    assert summary['screened_out'] == 0
+    assert summary['simulated'] == 130
+    assert summary['screening_accuracy'] >= 0.9
+    df = evaluator.statistics_to_dataframe()
+    assert df.loc[df['screened'], 'screening_correct'].notna().all()
+    # The surrogate predicts better than the mean of the simulated objectives
+    objectives = np.array(evaluator._y)[:, 0]
+    assert summary['rmse0'] < objectives.std()
+
+
+def test_submit_screens_without_simulating():
+    problem = platypus.DTLZ2(2)
+    evaluator = SurrogateEvaluator(platypus.MapEvaluator(), min_samples=50, audit_fraction=0.0)
+    evaluator.evaluate_all([platypus.core.EvaluateSolution(s) for s in _solutions(problem, 100)])
+
+    candidate, = _solutions(problem, 1)
+    candidate.variables[1:] = [1.0] * (problem.nvars - 1)
+    job = evaluator.submit(platypus.core.EvaluateSolution(candidate)).result()
+    assert job.solution.evaluated
+    assert evaluator.log[-1] == {'screened': True, 'reason': 'dominated', 'simulated': False}
+
+
+def test_maximised_objectives_are_screened():
+    # DTLZ2 with its objectives negated and maximised has the same front as the original
+    problem = platypus.Problem(11, 2)
+    problem.types[:] = platypus.Real(0, 1)
+    problem.directions[:] = platypus.Direction.MAXIMIZE
+    dtlz2 = platypus.DTLZ2(2)
+
+    def function(x):
+        s = platypus.Solution(dtlz2)
+        s.variables[:] = x
+        s.evaluate()
+        return [-f for f in s.objectives]
+    problem.function = function
+
+    evaluator = SurrogateEvaluator(platypus.MapEvaluator(), min_samples=50, audit_fraction=0.0)
+    evaluator.evaluate_all([platypus.core.EvaluateSolution(s) for s in _solutions(problem, 200)])
+    # The front is kept as the minimised (i.e. DTLZ2's own, non-negative) objectives
+    assert np.all(evaluator._front >= 0)
+
+    candidates = _solutions(problem, 50)
+    for s in candidates:
+        s.variables[1:] = [1.0] * (problem.nvars - 1)
+    evaluator.evaluate_all([platypus.core.EvaluateSolution(s) for s in candidates])
+    df = evaluator.statistics_to_dataframe().iloc[-50:]
+    assert (df['reason'] == 'dominated').mean() > 0.9
@@ -0,0 +1,119 @@
+import json
+import multiprocessing
+import pickle
+import socket
+import urllib.request
+from types import SimpleNamespace
+import pytest
+from pywr_model.run_statistics import StatisticsBisectionSearchModel
+from scripts.telemetry import TelemetryAggregator, TelemetryCallback, TelemetryWriter
+
+
+def _events(path):
+    with open(path) as fh:
+        return [json.loads(line) for line in fh]
+
+
+def _emit_many(path, n):
+    writer = TelemetryWriter(path)
+    for i in range(n):
+        writer.emit('evaluation', duration=0.001, iterations=i, archive_write=None, padding='x' * 500)
+    writer.close()
+
+
+def test_writer(tmp_path):
+    writer = TelemetryWriter(tmp_path / 'events.jsonl')
+    writer.emit('evaluation', duration=0.5, iterations=3)
+    writer.emit('generation', nfe=10)
+    assert writer.overhead > 0
+
+    # A pickled writer opens its own file handle and counts its own overhead
+    copy = pickle.loads(pickle.dumps(writer))
+    assert copy.overhead == 0.0
+    copy.emit('generation', nfe=20)
+    writer.close()
+    copy.close()
+
+    events = _events(tmp_path / 'events.jsonl')
+    assert [e['event'] for e in events] == ['evaluation', 'generation', 'generation']
+    assert events[0]['duration'] == 0.5 and events[2]['nfe'] == 20
+    assert events[0]['overhead'] == 0.0 < events[1]['overhead']
+
+
+def test_processes_do_not_interleave(tmp_path):
+    path = str(tmp_path / 'events.jsonl')
+    processes = [multiprocessing.Process(target=_emit_many, args=(path, 200)) for _ in range(4)]
+    for p in processes:
+        p.start()
+    for p in processes:
+        p.join()
+    events = _events(path)
+    assert len(events) == 800
+    assert len(set(e['pid'] for e in events)) == 4
+
+
+def test_simulation_events(model_path, tmp_path):
+    model = StatisticsBisectionSearchModel.load(model_path)
+    model.telemetry = TelemetryWriter(tmp_path / 'events.jsonl')
+    model.run()
+    model.telemetry.close()
+    events = _events(tmp_path / 'events.jsonl')
+    assert len(events) == len(model.simulation_statistics)
+    assert [e['bisect_value'] for e in events] == [s['bisect_value'] for s in model.simulation_statistics]
+
+
+def test_callback_emits_generation(tmp_path):
+    calls = []
+    writer = TelemetryWriter(tmp_path / 'events.jsonl')
+    callback = TelemetryCallback(calls.append, writer)
+    algorithm = SimpleNamespace(nfe=100, archive=[1, 2, 3])
+    callback(algorithm)
+    writer.close()
+    assert calls == [algorithm]
+    event, = _events(tmp_path / 'events.jsonl')
+    assert event['event'] == 'generation' and event['nfe'] == 100 and event['archive_size'] == 3
+
+
+def test_aggregator_summary(tmp_path):
+    path = tmp_path / 'events.jsonl'
+    writer = TelemetryWriter(path)
+    for i in range(10):
+        writer.emit('evaluation', duration=0.1 * (i + 1), iterations=i, archive_write=0.01)
+    writer.emit('simulation', wall_time=2.0)
+    writer.close()
+    # A partially written line is left for the next read
+    with open(path, mode='a') as fh:
+        fh.write('{"event": "evaluation", "du')
+
+    aggregator = TelemetryAggregator(path, status_path=str(tmp_path / 'status.json'), window=3600)
+    aggregator.update()
+    summary = aggregator.summary()
+    assert summary['totals'] == {'evaluation': 10, 'simulation': 1}
+    assert summary['evaluation_latency']['max'] == pytest.approx(1.0)
+    assert summary['evaluation_latency']['p50'] == pytest.approx(0.55)
+    assert summary['bisection_iterations']['mean'] == pytest.approx(4.5)
+    assert summary['simulation_wall_time']['mean'] == 2.0
+    assert summary['telemetry_overhead_fraction'] < 0.01
+    with open(tmp_path / 'status.json') as fh:
+        assert json.load(fh)['totals'] == summary['totals']
+
+    with open(path, mode='a') as fh:
+        fh.write('ration": 0.2, "iterations": 1, "time": 0, "pid": 1, "overhead": 0.0}\n')
+    aggregator.update()
+    assert aggregator.summary()['totals']['evaluation'] == 11
+
+
+def test_aggregator_serves_summary(tmp_path):
+    with socket.socket() as s:
+        s.bind(('localhost', 0))
+        port = s.getsockname()[1]
+    path = tmp_path / 'events.jsonl'
+    writer = TelemetryWriter(path)
+    writer.emit('generation', nfe=5, archive_size=2)
+    writer.close()
+
+    with TelemetryAggregator(path, port=port, interval=0.05) as aggregator:
+        aggregator.update()
+        with urllib.request.urlopen(f'http://localhost:{port}/') as response:
+            summary = json.load(response)
+    assert summary['last_generation']['nfe'] == 5